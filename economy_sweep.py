@@ -0,0 +1,282 @@
+"""
+钓鱼小游戏经济数值扫描（多进程）
+用法：
+    python ./economy_sweep.py --grid "FISH_PRICE_PER_KG.杂鱼~=8,12,16" --grid "ROD_CONFIG.竞赛竿.price=400,600"
+    python ./economy_sweep.py --random "LEVEL_UP_EXP.6=600:1000" --samples 50 --out sweep.jsonl
+
+参数用点号路径指向 fishing_game 里的配置表（FISH_PRICE_PER_KG、BAIT_CONFIG、ROD_CONFIG、
+LEVEL_UP_EXP、FISH_EXP_BASE ……）。每个参数点用无界面引擎从新存档开始钓鱼若干个种子，
+结果每完成一个点就追加一行到 --out（JSONL）；中断后用同样的参数重跑会跳过已完成的点。
+
+目标：
+    afford_rod  —— 钓到（鱼袋估价 + 金币）买得起竞赛竿所用的钓鱼分钟数
+    level_7     —— 升到 7 级（解锁湖泊）所用的钓鱼分钟数与天数
+模拟的玩家：总在已解锁的最高级地点用普通鱼饵、木质竿钓鱼，不买东西；
+当天升过级就睡觉（之后的经验当天拿不到）；QTE 每键反应时间按 fg.QTE_REACTION_RANGE 均匀抽取。
+"""
+import argparse
+import copy
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fishing_game as fg
+
+TARGET_ROD = "竞赛竿"
+TARGET_LEVEL = 7
+MAX_CASTS = 20000     # 单个种子的上限，防止参数离谱时跑不完
+
+
+# ==========================
+# 参数
+# ==========================
+def _parse_value(text: str):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def parse_grid(specs) -> dict:
+    """'路径=v1,v2,...' -> {路径: [值, ...]}"""
+    grid = {}
+    for spec in specs or []:
+        path, _, values = spec.partition("=")
+        grid[path.strip()] = [_parse_value(v.strip()) for v in values.split(",")]
+    return grid
+
+def parse_ranges(specs) -> dict:
+    """'路径=下限:上限' -> {路径: (下限, 上限)}"""
+    ranges = {}
+    for spec in specs or []:
+        path, _, bounds = spec.partition("=")
+        low, _, high = bounds.partition(":")
+        ranges[path.strip()] = (float(low), float(high))
+    return ranges
+
+def _resolve(path: str):
+    """返回 (所在的字典, 键)。数字键（如 LEVEL_UP_EXP.6）按整数处理"""
+    table_name, *keys = path.split(".")
+    if not keys:
+        raise ValueError(f"参数需要指向配置表里的某一项：{path}")
+    container = getattr(fg, table_name)
+    for key in keys[:-1]:
+        container = container[_table_key(container, key)]
+    return container, _table_key(container, keys[-1])
+
+def _table_key(container, key: str):
+    if key not in container and key.lstrip("-").isdigit() and int(key) in container:
+        return int(key)
+    if key not in container:
+        raise KeyError(key)
+    return key
+
+def generate_points(grid: dict, ranges: dict, samples: int, search_seed: int) -> list:
+    """网格的笛卡尔积，再为每个网格点随机抽 samples 组区间参数（固定种子，重跑时点集不变）"""
+    names = list(grid)
+    base_points = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if not ranges:
+        return base_points
+    rng = random.Random(search_seed)
+    points = []
+    for base in base_points:
+        for _ in range(samples):
+            point = dict(base)
+            for path, (low, high) in ranges.items():
+                container, key = _resolve(path)
+                value = rng.uniform(low, high)
+                point[path] = round(value) if isinstance(container[key], int) else round(value, 3)
+            points.append(point)
+    return points
+
+def point_key(point: dict) -> str:
+    return json.dumps(point, ensure_ascii=False, sort_keys=True)
+
+
+# ==========================
+# 单个参数点（在工作进程里运行）
+# ==========================
+def _apply(point: dict):
+    """改写配置表，返回恢复用的原始表副本"""
+    saved = {}
+    for path in point:
+        table_name = path.split(".")[0]
+        if table_name not in saved:
+            saved[table_name] = copy.deepcopy(getattr(fg, table_name))
+    for path, value in point.items():
+        container, key = _resolve(path)
+        container[key] = value
+    fg.invalidate_fish_samplers()
+    return saved
+
+def _restore(saved: dict):
+    for table_name, table in saved.items():
+        current = getattr(fg, table_name)
+        current.clear()
+        current.update(table)
+    fg.invalidate_fish_samplers()
+
+def _best_location(game_state):
+    unlocked = [loc for loc in fg.LOCATION_FISH_CONFIG if game_state.is_location_unlocked(loc)]
+    return max(unlocked, key=lambda loc: fg.LOCATION_UNLOCK_LEVEL.get(loc, 1))
+
+def run_career(seed: int, max_casts: int = MAX_CASTS, reaction_range=fg.QTE_REACTION_RANGE) -> dict:
+    """从新存档开始钓到两个目标都达成（或达到 max_casts），返回各目标的钓鱼分钟数、竿数与天数"""
+    player = random.Random(seed ^ 0x5EED)
+    storage = fg.SqliteStorage(":memory:")
+    game_state = fg.GameState(storage=storage, write_behind=False, seed=seed)
+    engine = fg.FishingEngine(game_state, persist=False)
+    price = fg.ROD_CONFIG[TARGET_ROD]['price']
+    low, high = reaction_range
+    now = 0.0
+    result = {'afford_rod': None, 'level_7': None}
+    for cast in range(1, max_casts + 1):
+        game_state.current_location = _best_location(game_state)
+        engine.cast(now)
+        now = engine.bite_at
+        engine.tick(now)
+        deadline = engine.qte_deadline
+        for key in list(engine.qte_sequence):
+            now += player.uniform(low, high)
+            if engine.press(key, now) != 'progress':
+                break
+        now = min(now, deadline) + fg.SIMULATED_CAST_OVERHEAD
+        mark = {'minutes': now / 60, 'casts': cast, 'day': game_state.get_day()}
+        if result['afford_rod'] is None and game_state.get_money() + game_state.quote_fish_sale() >= price:
+            result['afford_rod'] = mark
+        if result['level_7'] is None and game_state.get_level() >= TARGET_LEVEL:
+            result['level_7'] = mark
+        if all(result.values()):
+            break
+        if game_state.inventory.get('last_level_up_day', 0) >= game_state.get_day():
+            game_state.add_day(1)
+    storage.close()
+    return result
+
+def _summary(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda q: values[int(q * (len(values) - 1))]
+    return {'mean': round(sum(values) / len(values), 3), 'p10': pick(0.1), 'p50': pick(0.5), 'p90': pick(0.9)}
+
+def evaluate_point(point: dict, seeds: int, base_seed: int) -> dict:
+    """在当前进程里改写配置、跑完所有种子并恢复配置"""
+    start = time.perf_counter()
+    saved = _apply(point)
+    try:
+        careers = [run_career(base_seed + i) for i in range(seeds)]
+    finally:
+        _restore(saved)
+    objectives = {}
+    for name in ('afford_rod', 'level_7'):
+        reached = [c[name] for c in careers if c[name]]
+        objectives[name] = {
+            'reached': len(reached) / seeds,
+            'minutes': _summary([round(m['minutes'], 2) for m in reached]),
+            'casts': _summary([m['casts'] for m in reached]),
+            'days': _summary([m['day'] for m in reached]),
+        }
+    return {'params': point, 'seeds': seeds, 'objectives': objectives,
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+# ==========================
+# 调度
+# ==========================
+def load_done(path: str) -> set:
+    """已完成的参数点；写了一半的最后一行视为未完成"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            done.add(point_key(record['params']))
+    return done
+
+def _truncate_partial_line(path: str):
+    """上次中断时可能留下没有换行结尾的半行，续写前截掉"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.seek(end)
+            f.truncate()
+
+def run_sweep(points, out_path: str, seeds: int, base_seed: int, workers: int):
+    done = load_done(out_path)
+    pending = [p for p in points if point_key(p) not in done]
+    print(f"共 {len(points)} 个参数点，已完成 {len(points) - len(pending)}，待运行 {len(pending)}（{workers} 个进程）")
+    if not pending:
+        return []
+    _truncate_partial_line(out_path)
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(out_path, "a", encoding="utf-8") as out:
+        futures = {pool.submit(evaluate_point, p, seeds, base_seed): p for p in pending}
+        for finished, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            results.append(record)
+            elapsed = time.perf_counter() - start
+            print(f"[{finished}/{len(pending)}] {elapsed:.1f} s，{finished / elapsed:.2f} 点/秒  {_describe(record)}")
+    return results
+
+def _describe(record) -> str:
+    parts = [f"{k}={v}" for k, v in record['params'].items()]
+    for name, label in (('afford_rod', '买竞赛竿'), ('level_7', '7级')):
+        minutes = record['objectives'][name]['minutes']
+        days = record['objectives'][name]['days']
+        parts.append(f"{label} {minutes['p50']:.0f} 分钟/{days['p50']} 天" if minutes else f"{label} 未达成")
+    return "  ".join(parts)
+
+def report(out_path: str, points):
+    """按买得起竞赛竿的中位用时输出本次参数点的结果"""
+    wanted = {point_key(p) for p in points}
+    records = []
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if point_key(record['params']) in wanted:
+                records.append(record)
+    never = float('inf')
+    records.sort(key=lambda r: (r['objectives']['afford_rod']['minutes'] or {}).get('p50', never))
+    print("\n按买得起竞赛竿的中位用时排序：")
+    for record in records:
+        print("  " + _describe(record))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="钓鱼小游戏经济数值扫描")
+    parser.add_argument("--grid", action="append", help="路径=值1,值2,...（可重复，取笛卡尔积）")
+    parser.add_argument("--random", action="append", help="路径=下限:上限（可重复，随机搜索）")
+    parser.add_argument("--samples", type=int, default=20, help="每个网格点的随机搜索次数")
+    parser.add_argument("--search-seed", type=int, default=0)
+    parser.add_argument("--seeds", type=int, default=16, help="每个参数点模拟多少个玩家")
+    parser.add_argument("--base-seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="economy_sweep.jsonl")
+    args = parser.parse_args(argv)
+
+    grid = parse_grid(args.grid)
+    ranges = parse_ranges(args.random)
+    for path in list(grid) + list(ranges):
+        _resolve(path)  # 尽早报出拼错的参数路径
+    points = generate_points(grid, ranges, args.samples, args.search_seed)
+    run_sweep(points, args.out, args.seeds, args.base_seed, args.workers)
+    report(args.out, points)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1654 @@
+"""
+钓鱼小游戏基准测试
+用法：python ./fishing_bench.py <项目> [参数]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import fishing_game as fg
+
+
+# ==========================
+# 工具函数
+# ==========================
+def _simulate_catch(engine: fg.FishingEngine):
+    """不经过 UI 与真实等待，用无界面引擎走一次完整的成功钓鱼流程"""
+    engine.cast(0.0)
+    engine.tick(engine.bite_at)
+    for key in list(engine.qte_sequence):
+        engine.press(key, engine.bite_at)
+
+
+# ==========================
+# 存档写入
+# ==========================
+def bench_persistence(catches: int, tick_every: int):
+    """对比每次修改都写文件（旧行为）与合并写入的落盘次数和字节数"""
+    print(f"模拟 {catches} 次成功钓鱼，合并写入每 {tick_every} 次钓鱼一个节拍")
+    for label, write_behind in (("逐次写入", False), ("合并写入", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            game_state = fg.GameState(storage=fg.JsonFileStorage(tmp), write_behind=write_behind)
+            game_state.persister.interval = 0.0
+            engine = fg.FishingEngine(game_state, persist=False)
+            start = time.perf_counter()
+            for i in range(catches):
+                _simulate_catch(engine)
+                if (i + 1) % tick_every == 0:
+                    game_state.tick_stats()
+            main_thread = time.perf_counter() - start
+            game_state.flush_stats()
+            persister = game_state.persister
+            print(
+                f"{label}: 落盘 {persister.flush_count} 次"
+                f"（{persister.flush_count / catches:.2f} 次/条鱼），"
+                f"写入 {persister.bytes_written / 1024:.1f} KB"
+                f"（{persister.bytes_written / catches:.0f} 字节/条鱼），"
+                f"主线程耗时 {main_thread * 1000:.1f} ms"
+            )
+
+
+def bench_journal(bag_sizes, catches: int):
+    """鱼袋越大，整档重写越贵；日志追加的每次写入量应当保持不变"""
+    for size in bag_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, fg.STATS_FILE)
+            game_state = fg.GameState(storage=fg.JsonFileStorage(tmp), write_behind=False)
+            game_state.persister.compact_bytes = float('inf')
+            game_state.inventory['fish_bag'] = fg.FishBag.from_records(
+                {'name': '小鲫鱼', 'weight': 0.25, 'rarity': fg.RARITY_COMMON} for _ in range(size)
+            )
+            full = fg.save_statistics(game_state.fish_statistics, game_state.inventory,
+                                      game_state.student_state, path=path)
+            engine = fg.FishingEngine(game_state, persist=False)
+            before = game_state.persister.bytes_written
+            start = time.perf_counter()
+            for _ in range(catches):
+                _simulate_catch(engine)
+            elapsed = time.perf_counter() - start
+            journal = (game_state.persister.bytes_written - before) / catches
+            print(
+                f"鱼袋 {size:>7} 条：整档重写 {full / 1024:8.1f} KB/次，"
+                f"日志追加 {journal:6.0f} 字节/条鱼，{elapsed / catches * 1e6:7.0f} µs/条鱼"
+            )
+
+
+def _make_storage(backend: str, directory: str):
+    if backend == "sqlite":
+        return fg.SqliteStorage(os.path.join(directory, "fishing_stats.sqlite3"))
+    return fg.JsonFileStorage(directory)
+
+
+def bench_storage(profile_counts, bag_size: int, catches: int):
+    """对比 JSON 与 SQLite 后端在不同档案数量下的导入、单次钓鱼写入与加载耗时"""
+    rng = random.Random(42)
+    template = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False)
+    template.inventory['fish_bag'] = fg.FishBag.from_records(
+        {'name': '小鲫鱼', 'weight': round(rng.uniform(0.1, 0.4), 2), 'rarity': fg.RARITY_COMMON}
+        for _ in range(bag_size)
+    )
+    snapshot = {name: fg._snapshot_value(data) for name, data in template._stats_sections().items()}
+    print(f"每个档案鱼袋 {bag_size} 条，随机抽取档案各钓 {catches} 条鱼")
+    for backend in ("json", "sqlite"):
+        for count in profile_counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                storage = _make_storage(backend, tmp)
+                start = time.perf_counter()
+                for i in range(count):
+                    storage.write_snapshot(f"p{i}", snapshot, 0)
+                populate = time.perf_counter() - start
+
+                profiles = [f"p{rng.randrange(count)}" for _ in range(catches)]
+                load_time = 0.0
+                write_time = 0.0
+                for profile in profiles:
+                    start = time.perf_counter()
+                    game_state = fg.GameState(storage=storage, profile=profile, write_behind=False)
+                    load_time += time.perf_counter() - start
+                    game_state.persister.compact_bytes = float('inf')
+                    engine = fg.FishingEngine(game_state, persist=False)
+                    start = time.perf_counter()
+                    _simulate_catch(engine)
+                    write_time += time.perf_counter() - start
+                storage.close()
+                print(
+                    f"{backend:>6} | {count:>6} 个档案：导入 {populate:7.2f} s，"
+                    f"加载 {load_time / catches * 1000:7.2f} ms/档案，"
+                    f"钓鱼写入 {write_time / catches * 1000:7.2f} ms/条鱼"
+                )
+
+
+def bench_bag(size: int):
+    """列式鱼袋：每条鱼的内存占用、整袋估价、汇总与序列化耗时"""
+    rng = random.Random(7)
+    fish_pool = [info for fish_list in fg.LOCATION_FISH_CONFIG.values() for info in fish_list]
+    bag = fg.FishBag()
+    start = time.perf_counter()
+    for _ in range(size):
+        name, rarity, min_weight, max_weight, _, _ = rng.choice(fish_pool)
+        bag.append(name, round(rng.uniform(min_weight, max_weight), 2), rarity)
+    fill = time.perf_counter() - start
+    records = bag.to_records()
+    print(f"鱼袋 {size} 条：列式 {bag.nbytes() / size:.1f} 字节/条鱼，"
+          f"字典列表约 {_records_size(records[:1000]) / min(size, 1000):.0f} 字节/条鱼，填充 {fill:.2f} s")
+    for label, func in (
+        ("整袋估价", lambda: bag.sale_value()),
+        ("字典列表估价", lambda: sum(fg.FISH_PRICE_PER_KG.get(f['rarity'], 10) * f['weight'] for f in records)),
+        ("按鱼种汇总", bag.summary),
+        ("全量核对汇总", bag.check_consistency),
+        ("列式序列化", bag.to_json),
+        ("复制快照", bag.copy),
+    ):
+        start = time.perf_counter()
+        func()
+        print(f"  {label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+    removals = min(10000, size // 4)
+    for policy in fg.FISH_POLICIES:
+        start = time.perf_counter()
+        for i in range(removals):
+            bag.pop_species(fg.FISH_SPECIES[i % len(fg.FISH_SPECIES)], policy)
+        elapsed = time.perf_counter() - start
+        print(f"  按鱼种取鱼（{policy}）: {elapsed / removals * 1e6:.1f} µs/条")
+    start = time.perf_counter()
+    for _ in range(removals):
+        bag.pop_oldest()
+    print(f"  取最早一条: {(time.perf_counter() - start) / removals * 1e6:.1f} µs/条")
+    legacy_bag = records[:100000]
+    start = time.perf_counter()
+    for i in range(100):
+        name = fg.FISH_SPECIES[i % len(fg.FISH_SPECIES)]
+        idx = next((k for k, fish in enumerate(legacy_bag) if fish['name'] == name), None)
+        if idx is not None:
+            legacy_bag.pop(idx)
+        legacy_bag.pop(0)
+    print(f"  字典列表（10 万条）扫描取鱼 + pop(0): {(time.perf_counter() - start) / 100 * 1e6:.1f} µs/次")
+    text = json.dumps(bag.to_json())
+    legacy = json.dumps(records, ensure_ascii=False)
+    print(f"  JSON 大小：列式 {len(text) / 1024:.0f} KB，字典列表 {len(legacy.encode('utf-8')) / 1024:.0f} KB")
+    print(f"  numpy {'可用' if fg.np is not None else '不可用（纯 Python 路径）'}")
+
+
+def bench_startup(bag_size: int, rounds: int):
+    """启动加载：当前版本存档应接近裸 json.load，旧版本存档只在第一次启动时迁移"""
+    rng = random.Random(3)
+    fish_pool = [info for fish_list in fg.LOCATION_FISH_CONFIG.values() for info in fish_list]
+    bag = fg.FishBag()
+    for _ in range(bag_size):
+        name, rarity, min_weight, max_weight, _, _ = rng.choice(fish_pool)
+        bag.append(name, round(rng.uniform(min_weight, max_weight), 2), rarity)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, fg.STATS_FILE)
+        legacy = {
+            'fish_statistics': {'小鲫鱼': {'count': 3, 'max_weight': 0.3}},
+            'inventory': {'money': 50, 'fish_bag': bag.to_records()},
+            'student_state': {'affinity': 12},
+        }
+
+        def write_legacy():
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(legacy, f, ensure_ascii=False)
+
+        def bare_load():
+            with open(path, 'r', encoding='utf-8') as f:
+                json.load(f)
+
+        def game_load():
+            fg.GameState(storage=fg.JsonFileStorage(tmp), write_behind=False).flush_stats()
+
+        write_legacy()
+        start = time.perf_counter()
+        game_load()
+        migrate = time.perf_counter() - start
+        with open(path, 'r', encoding='utf-8') as f:
+            version = json.load(f).get('schema_version')
+        print(f"鱼袋 {bag_size} 条：旧版存档首次启动（迁移并写回）{migrate * 1000:.1f} ms，写回后版本 {version}")
+        for label, func in (("裸 json.load", bare_load), ("当前版本启动", game_load)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                func()
+            print(f"  {label}: {(time.perf_counter() - start) / rounds * 1000:.2f} ms/次")
+
+
+def bench_slots(count: int, bag_size: int):
+    """存档列表：从槽位索引读取摘要 vs 逐个加载完整存档"""
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = fg.JsonFileStorage(tmp)
+        template = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False)
+        template.inventory['fish_bag'] = fg.FishBag.from_records(
+            {'name': '小鲫鱼', 'weight': round(rng.uniform(0.1, 0.4), 2), 'rarity': fg.RARITY_COMMON}
+            for _ in range(bag_size)
+        )
+        snapshot = {name: fg._snapshot_value(data) for name, data in template._stats_sections().items()}
+        for i in range(count):
+            storage.write_snapshot(f"slot{i}", snapshot, 0)
+            storage.update_slot(f"slot{i}", fg.slot_summary(snapshot['inventory'], snapshot['student_state']))
+        index_size = os.path.getsize(os.path.join(tmp, fg.SLOT_INDEX_FILE))
+        print(f"{count} 个存档，每个鱼袋 {bag_size} 条，索引文件 {index_size / 1024:.1f} KB")
+        for label, func in (
+            ("读取槽位索引", lambda: fg.JsonFileStorage(tmp).list_slots()),
+            ("逐个加载完整存档", lambda: [storage.load(p) for p in storage.list_profiles()]),
+        ):
+            start = time.perf_counter()
+            func()
+            print(f"  {label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def bench_sync(catches: int, sync_every: int, bag_size: int, fail_rate: float):
+    """增量同步：上传字节数与吞吐量，对比每批都上传整个存档"""
+    import sync_server
+
+    server = sync_server.make_server(port=0, fail_rate=fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = fg.JsonFileStorage(tmp)
+            game_state = fg.GameState(storage=storage, write_behind=False)
+            game_state.inventory['fish_bag'] = fg.FishBag.from_records(
+                {'name': '小鲫鱼', 'weight': 0.25, 'rarity': fg.RARITY_COMMON} for _ in range(bag_size)
+            )
+            make_client = lambda: fg.SyncClient(game_state._stats_sections, url=url, device_id="bench",
+                                                backoff=0.01, background=False, storage=storage,
+                                                apply=game_state.apply_sync_ops)
+            client = make_client()
+            client.sync()
+            initial = client.bytes_sent
+            engine = fg.FishingEngine(game_state, persist=False)
+            full_bytes = 0
+            start = time.perf_counter()
+            for i in range(catches):
+                _simulate_catch(engine)
+                if (i + 1) % sync_every == 0:
+                    client.sync()
+                    full_bytes += len(json.dumps(game_state._stats_sections(), ensure_ascii=False,
+                                                 separators=(',', ':'), default=fg._json_default).encode('utf-8'))
+            client.sync()
+            elapsed = time.perf_counter() - start
+            batches = client.batches - 1
+            delta_bytes = client.bytes_sent - initial
+            print(
+                f"鱼袋 {bag_size} 条，{catches} 次钓鱼，每 {sync_every} 次同步一批：首次全量 {initial / 1024:.1f} KB，"
+                f"之后 {batches} 批增量共 {delta_bytes / 1024:.1f} KB（{delta_bytes / max(batches, 1):.0f} 字节/批），"
+                f"整档上传约 {full_bytes / 1024:.1f} KB"
+            )
+            print(
+                f"  {catches / elapsed:.0f} 条鱼/秒，{client.requests / elapsed:.0f} 请求/秒，"
+                f"重试 {client.retries} 次，失败 {client.failures} 批"
+            )
+
+            # 重新启动：确认的版本向量与快照随存档保存，第一批直接是增量
+            client = make_client()
+            for _ in range(sync_every):
+                _simulate_catch(engine)
+            client.sync()
+            print(f"  重新启动后第一批：{client.bytes_sent} 字节，冲突 {client.conflicts} 次")
+            assert client.conflicts == 0 and client.bytes_sent < initial
+
+            # 另一台设备写入后，本机下一批会遇到冲突：取回服务器存档，与本机改动合并
+            def fetch():
+                with urllib.request.urlopen(f"{url}/sync/{fg.DEFAULT_PROFILE}") as response:
+                    return json.loads(response.read())
+            remote = fetch()
+            other = {'device': 'other', 'vector': remote['vector'], 'ops': [
+                ['set', 'inventory', 'money', remote['state']['inventory']['money'] + 50],
+                ['bag+', '草鱼', 1.5, fg.RARITY_COMMON],
+            ]}
+            urllib.request.urlopen(urllib.request.Request(
+                f"{url}/sync/{fg.DEFAULT_PROFILE}", data=json.dumps(other).encode('utf-8'), method="POST"
+            )).close()
+            game_state.add_money(1)
+            _simulate_catch(engine)
+            expected_money = game_state.get_money() + 50
+            expected_fish = len(game_state.inventory['fish_bag']) + 1
+            sent = client.bytes_sent
+            client.sync()
+            game_state.add_money(2)  # 合并结果应用之前本机又有的改动
+            client.sync()
+            local = json.loads(json.dumps(game_state._stats_sections(), default=fg._json_default))
+            match = fetch()['state'] == local
+            print(f"  冲突 {client.conflicts} 次（合并后上传 {client.bytes_sent - sent} 字节），"
+                  f"最终版本向量 {client.vector}，金币 {game_state.get_money()}（预期 {expected_money + 2}），"
+                  f"鱼袋 {len(game_state.inventory['fish_bag'])} 条（预期 {expected_fish}），"
+                  f"远端与本机{'一致' if match else '不一致'}")
+            assert match and game_state.get_money() == expected_money + 2
+            assert len(game_state.inventory['fish_bag']) == expected_fish
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_format(sizes, codecs):
+    """存档格式：旧版字典列表 JSON、当前列式 JSON 与紧凑格式的文件大小、保存与加载耗时"""
+    rng = random.Random(11)
+    fish_pool = [info for fish_list in fg.LOCATION_FISH_CONFIG.values() for info in fish_list]
+    for size in sizes:
+        game_state = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False)
+        bag = game_state.inventory['fish_bag']
+        for _ in range(size):
+            name, rarity, min_weight, max_weight, _, _ = rng.choice(fish_pool)
+            weight = round(rng.uniform(min_weight, max_weight), 2)
+            bag.append(name, weight, rarity)
+            stat = game_state.fish_statistics[name]
+            stat['count'] += 1
+            stat['max_weight'] = max(stat['max_weight'], weight)
+        sections = (game_state.fish_statistics, game_state.inventory, game_state.student_state)
+        print(f"{size} 次钓鱼（鱼袋 {size} 条）：")
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy_path = os.path.join(tmp, "legacy.json")
+            legacy_inventory = dict(game_state.inventory, fish_bag=bag.to_records())
+            start = time.perf_counter()
+            with open(legacy_path, 'w', encoding='utf-8') as f:
+                json.dump({'fish_statistics': sections[0], 'inventory': legacy_inventory,
+                           'student_state': sections[2]}, f, ensure_ascii=False, indent=2)
+            saved = time.perf_counter() - start
+            variants = [("旧版 JSON（indent=2，字典列表）", legacy_path, saved)]
+
+            json_path = os.path.join(tmp, fg.STATS_FILE)
+            start = time.perf_counter()
+            fg.save_statistics(*sections, path=json_path)
+            variants.append(("列式 JSON", json_path, time.perf_counter() - start))
+            for codec in codecs:
+                path = os.path.join(tmp, f"{codec}{fg.COMPACT_SUFFIX}")
+                start = time.perf_counter()
+                fg.save_compact(*sections, path=path, codec=codec)
+                variants.append((f"紧凑格式（{codec}）", path, time.perf_counter() - start))
+
+            for label, path, saved in variants:
+                start = time.perf_counter()
+                loaded = fg.load_save(path)
+                load_time = time.perf_counter() - start
+                assert len(loaded.inventory['fish_bag']) == size
+                line = (f"  {label:<24} {os.path.getsize(path) / 1024:10.1f} KB，"
+                        f"保存 {saved * 1000:8.1f} ms，加载 {load_time * 1000:8.1f} ms")
+                if path.endswith(fg.COMPACT_SUFFIX):
+                    start = time.perf_counter()
+                    fg.read_save_header(path)
+                    line += f"，只读头部 {(time.perf_counter() - start) * 1000:.2f} ms"
+                print(line)
+
+
+def bench_engine(sessions: int, casts: int, miss_rate: float):
+    """无界面引擎：一个进程里跑大量会话（共用一个内存 SQLite 存档库）"""
+    rng = random.Random(13)
+    storage = fg.SqliteStorage(":memory:")
+    outcomes = {'caught': 0, 'failed': 0, 'timeout': 0}
+    start = time.perf_counter()
+    for i in range(sessions):
+        game_state = fg.GameState(storage=storage, profile=f"s{i}", write_behind=False)
+        engine = fg.FishingEngine(game_state)
+        now = 0.0
+        for _ in range(casts):
+            engine.cast(now)
+            now = engine.bite_at
+            engine.tick(now)
+            if rng.random() < miss_rate / 2:
+                # 玩家走神，没有按键
+                result = engine.tick(engine.qte_deadline + 0.01)
+            else:
+                for key in list(engine.qte_sequence):
+                    now += rng.uniform(0.05, 0.4)
+                    result = engine.press('x' if rng.random() < miss_rate / 2 else key, now)
+                    if result != 'progress':
+                        break
+            outcomes[result] += 1
+            now += 1.0
+        game_state.flush_stats()
+    elapsed = time.perf_counter() - start
+    total = sessions * casts
+    storage.close()
+    print(f"{sessions} 个会话 × {casts} 竿：{elapsed:.2f} s，{sessions / elapsed:.0f} 会话/秒，"
+          f"{total / elapsed:.0f} 竿/秒；结果 {outcomes}")
+
+
+def bench_day(hours: float, days: int):
+    """手动步进时钟：模拟整天钓鱼与多日心情衰减，不占用真实等待时间"""
+    rng = random.Random(17)
+    clock = fg.ManualClock()
+    game_state = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False, clock=clock)
+    engine = fg.FishingEngine(game_state)
+    results = {'caught': 0, 'failed': 0, 'timeout': 0}
+    end = clock.now() + hours * 3600
+    start = time.perf_counter()
+    while clock.now() < end:
+        engine.cast()
+        clock.advance_to(engine.bite_at)
+        engine.tick()
+        result = None
+        for key in list(engine.qte_sequence):
+            clock.advance(rng.uniform(0.1, 0.8))
+            result = engine.press(key)
+            if result != 'progress':
+                break
+        results[result] += 1
+        clock.advance(rng.uniform(1.0, 5.0))  # 收线、重新挂饵
+    elapsed = time.perf_counter() - start
+    print(f"游戏内 {hours:g} 小时钓鱼：{sum(results.values())} 竿 {results}，真实耗时 {elapsed * 1000:.0f} ms")
+
+    student = game_state.student_state
+    student.update(met=True, trust=30)
+    game_state._set_gift_timestamp()
+    clock.advance(days * 86400)
+    decay = game_state.apply_mood_decay()
+    print(f"  {days} 天没送礼：信任 -{decay}（{clock.today()}），每日委托 {game_state.ensure_daily_request()}")
+
+    # 加速时钟：真实 0.05 秒约等于游戏内 5 秒
+    scaled = fg.ScaledClock(100.0)
+    before = scaled.now()
+    scaled.sleep(5.0)
+    print(f"  100 倍加速时钟：sleep(5) 后游戏内经过 {scaled.now() - before:.1f} 秒")
+
+
+# ==========================
+# 多竿钓鱼
+# ==========================
+def _run_multi_line(players: int, lines: int, minutes: float, trace: bool = False):
+    """players 个钓手各放 lines 根线，共用一个调度器钓 minutes 分钟（游戏内），返回统计"""
+    import tracemalloc
+
+    clock = fg.ManualClock()
+    scheduler = fg.TimerScheduler(clock)
+    storage = fg.SqliteStorage(":memory:")
+    end = minutes * 60
+    stats = {'caught': 0, 'failed': 0, 'casts': 0, 'peak_lines': 0, 'peak_timers': 0}
+
+    def start_player(i):
+        game_state = fg.GameState(storage=storage, profile=f"m{i}", clock=clock, seed=i)
+        player = random.Random(i)
+        busy = [False]
+
+        def step():
+            # 玩家一次只拉一根线：按当前这根线的下一个键，按完再看下一根
+            line = fishing.active()
+            if line is None:
+                busy[0] = False
+                return
+            busy[0] = True
+            scheduler.call_later(player.uniform(0.1, 0.4), press, line)
+
+        def press(line):
+            if fishing.active() is line:
+                fishing.press(line.sequence[line.index])
+            step()
+
+        def on_bite(line):
+            if not busy[0]:
+                step()
+
+        def on_end(line, success, *result):
+            stats['caught' if success else 'failed'] += 1
+            if clock.now() < end:
+                scheduler.call_later(fg.SIMULATED_CAST_OVERHEAD, recast)
+
+        def recast():
+            if fishing.cast():
+                stats['casts'] += 1
+
+        fishing = fg.MultiLineFishing(game_state, scheduler, max_lines=lines, on_bite=on_bite, on_end=on_end,
+                                      persist=False)
+        for _ in range(lines):
+            fishing.cast()
+        stats['casts'] += lines
+        return fishing
+
+    if trace:
+        tracemalloc.start()
+    anglers = [start_player(i) for i in range(players)]
+    fired = 0
+    while len(scheduler):
+        clock.advance_to(scheduler.next_deadline())
+        fired += scheduler.run_due()
+        if fired % 4096 < 64:
+            stats['peak_lines'] = max(stats['peak_lines'], sum(len(a) for a in anglers))
+            stats['peak_timers'] = max(stats['peak_timers'], len(scheduler))
+    if trace:
+        stats['memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    stats['fired'] = fired
+    storage.close()
+    return stats
+
+def bench_lines(players: int, lines: int, minutes: float):
+    """多竿：大量钓手各放几十根线，全部挂在一个调度器上，没有线程"""
+    baseline = threading.active_count()
+    start = time.perf_counter()
+    stats = _run_multi_line(players, lines, minutes)
+    elapsed = time.perf_counter() - start
+    print(f"{players} 个钓手 × {lines} 根线，游戏内 {minutes:g} 分钟：{elapsed:.2f} s，{stats['casts']} 竿"
+          f"（{stats['casts'] / elapsed:.0f} 竿/秒），{stats['fired']} 个定时事件")
+    print(f"  成功 {stats['caught']}，失败/跑鱼 {stats['failed']}；同时在水里的线峰值 {stats['peak_lines']}，"
+          f"挂起事件峰值 {stats['peak_timers']}，新增线程 {threading.active_count() - baseline}")
+    assert threading.active_count() == baseline
+    for count in (1, lines):
+        small = _run_multi_line(50, count, 2.0, trace=True)
+        print(f"  50 个钓手 × {count} 根线：内存峰值 {small['memory'] / 1024 / 50:.1f} KB/钓手")
+
+# ==========================
+# 单写者命令队列
+# ==========================
+def _reward(game_state):
+    """一条命令：同时改两处（金币 +1、高级蚯蚓 +1），读者应看到两者始终同步"""
+    game_state.add_money(1)
+    game_state.acquire_item('高级蚯蚓', 1)
+
+def bench_commands(producers: int, commands: int, readers: int):
+    """多个线程同时修改 GameState：直接修改、粗粒度锁与单写者命令队列对比"""
+    total = producers * commands
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # 频繁切换线程，让竞争更容易暴露
+    try:
+        for mode in ("直接修改", "粗粒度锁", "命令队列"):
+            game_state = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False, seed=1)
+            queue = fg.GameCommandQueue(game_state) if mode == "命令队列" else None
+            lock = threading.RLock()
+            done = threading.Event()
+            seen = {'reads': 0, 'torn': 0, 'backwards': 0, 'errors': 0}
+
+            def read():
+                if queue is not None:
+                    snap = queue.snapshot
+                    return snap.version, snap.money, snap.bait_items.get('高级蚯蚓', 0)
+                if mode == "粗粒度锁":
+                    with lock:
+                        return 0, game_state.get_money(), game_state.inventory['bait_items']['高级蚯蚓']
+                return 0, game_state.get_money(), game_state.inventory['bait_items']['高级蚯蚓']
+
+            def reader():
+                last = -1
+                while not done.is_set():
+                    version, money, bait = read()
+                    seen['reads'] += 1
+                    if money != bait:
+                        seen['torn'] += 1
+                    if version < last:
+                        seen['backwards'] += 1
+                    last = version
+
+            def producer():
+                for _ in range(commands):
+                    if queue is not None:
+                        queue.submit(_reward)
+                    elif mode == "粗粒度锁":
+                        with lock:
+                            _reward(game_state)
+                    else:
+                        try:
+                            _reward(game_state)
+                        except RuntimeError:
+                            seen['errors'] += 1  # 写入器在别的线程里遍历脏键时被改动
+
+            flushes = game_state.persister.flush_count
+            watchers = [threading.Thread(target=reader) for _ in range(readers)]
+            workers = [threading.Thread(target=producer) for _ in range(producers)]
+            start = time.perf_counter()
+            if queue is not None:
+                queue.start(interval=0.002)
+            for thread in watchers + workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            if queue is not None:
+                queue.stop()
+            elapsed = time.perf_counter() - start
+            done.set()
+            for thread in watchers:
+                thread.join()
+            money = game_state.get_money()
+            bait = game_state.inventory['bait_items']['高级蚯蚓']
+            lost = 2 * total - money - bait
+            batches = f"，{queue.batches} 批" if queue is not None else ""
+            errors = f"，异常 {seen['errors']} 次" if seen['errors'] else ""
+            print(f"{mode}：{producers} 个线程 × {commands} 条命令 {elapsed:.2f} s（{total / elapsed:.0f} 条/秒）"
+                  f"，落盘 {game_state.persister.flush_count - flushes} 次{batches}；丢失更新 {lost:.0f}{errors}，"
+                  f"读者 {seen['reads']} 次读取中看到半截状态 {seen['torn']} 次、版本倒退 {seen['backwards']} 次")
+            if queue is not None:
+                assert lost == 0 and seen['torn'] == 0 and seen['backwards'] == 0
+                assert queue.snapshot.money == money and queue.applied == total
+    finally:
+        sys.setswitchinterval(previous)
+
+# ==========================
+# asyncio 驱动
+# ==========================
+def _run_async_anglers(anglers: int, casts: int, idle_rate: float, trace: bool):
+    """在虚拟时间事件循环里跑 anglers 个钓手，返回 (结果, 统计)"""
+    import asyncio
+    import tracemalloc
+
+    loop = fg.VirtualTimeLoop()
+    clock = loop.clock
+    storage = fg.SqliteStorage(":memory:")
+    results = {'caught': 0, 'failed': 0, 'timeout': 0}
+    stats = {'events': 0, 'peak_tasks': 0, 'per_angler': None}
+
+    async def angler(manager, player):
+        async def react():
+            async for event in manager.events():
+                stats['events'] += 1
+                if event.kind == 'bite' and player.random() >= idle_rate:
+                    for key in event.data:
+                        await asyncio.sleep(player.uniform(0.15, 0.7))
+                        if manager.press(key) != 'progress':
+                            break
+        reader = asyncio.create_task(react())
+        for _ in range(casts):
+            result = await manager.start_fishing()
+            if result.success:
+                results['caught'] += 1
+            elif manager.engine.qte_index:
+                results['failed'] += 1
+            else:
+                results['timeout'] += 1
+            await asyncio.sleep(fg.SIMULATED_CAST_OVERHEAD)
+        manager.close()
+        await reader
+
+    async def main():
+        managers = [fg.AsyncFishingManager(fg.GameState(storage=storage, profile=f"a{i}", write_behind=False,
+                                                        clock=clock, seed=i)) for i in range(anglers)]
+        if trace:
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+        tasks = [asyncio.create_task(angler(m, random.Random(i))) for i, m in enumerate(managers)]
+
+        async def watch():
+            while not all(t.done() for t in tasks):
+                stats['peak_tasks'] = max(stats['peak_tasks'], len(asyncio.all_tasks()))
+                await asyncio.sleep(5.0)
+        await asyncio.gather(watch(), *tasks)
+        if trace:
+            stats['per_angler'] = (tracemalloc.get_traced_memory()[1] - before) / anglers
+            tracemalloc.stop()
+
+    loop.run_until_complete(main())
+    stats['minutes'] = clock.now() / 60
+    loop.close()
+    storage.close()
+    return results, stats
+
+def bench_async(anglers: int, casts: int, idle_rate: float):
+    """一个事件循环（虚拟时间）里跑大量钓手：每竿的 await、事件流与 QTE 计时 Task"""
+    baseline = threading.active_count()
+    start = time.perf_counter()
+    results, stats = _run_async_anglers(anglers, casts, idle_rate, trace=False)
+    elapsed = time.perf_counter() - start
+    total = anglers * casts
+    print(f"{anglers} 个钓手 × {casts} 竿（游戏内 {stats['minutes']:.0f} 分钟）：{elapsed:.2f} s，"
+          f"{total / elapsed:.0f} 竿/秒（每次状态变化同步写存档），{stats['events']} 个事件；结果 {results}")
+    print(f"  同时存在的 Task 峰值 {stats['peak_tasks']}，新增线程 {threading.active_count() - baseline}")
+    assert sum(results.values()) == total and threading.active_count() == baseline
+    sample = min(anglers, 200)
+    _, traced = _run_async_anglers(sample, casts, idle_rate, trace=True)
+    print(f"  {sample} 个钓手的内存峰值（tracemalloc）：每个钓手约 {traced['per_angler'] / 1024:.1f} KB")
+
+
+# ==========================
+# 定时调度
+# ==========================
+def _drain(clock, scheduler) -> int:
+    """把手动时钟一路推进到调度器清空，返回触发的事件数"""
+    fired = 0
+    while len(scheduler):
+        clock.advance_to(scheduler.next_deadline())
+        fired += scheduler.run_due()
+    return fired
+
+def bench_timers(pending: int, cancel_rate: float, sessions: int, session_casts: int, threads: int):
+    """单线程定时调度：大量同时挂起的抛竿、O(log n) 取消，以及与每竿一个线程的对比"""
+    rng = random.Random(21)
+    clock = fg.ManualClock()
+    scheduler = fg.TimerScheduler(clock)
+    outcomes = {'bite': 0, 'deadline': 0}
+
+    def deadline():
+        outcomes['deadline'] += 1
+
+    def bite():
+        # 咬钩后再挂一个 QTE 超时事件，与 FishingManager 相同
+        outcomes['bite'] += 1
+        scheduler.call_later(2.0 + fg.QTE_TIMEOUT_SLACK, deadline)
+
+    start = time.perf_counter()
+    handles = [scheduler.call_at(rng.uniform(3.0, 60.0), bite) for _ in range(pending)]
+    scheduled = time.perf_counter() - start
+    peak = len(scheduler)
+    victims = rng.sample(handles, int(pending * cancel_rate))
+    start = time.perf_counter()
+    for handle in victims:
+        scheduler.cancel(handle)
+    cancelled = time.perf_counter() - start
+    start = time.perf_counter()
+    fired = _drain(clock, scheduler)
+    elapsed = time.perf_counter() - start
+    print(f"{pending} 竿同时挂起（一个线程）：登记 {scheduled / pending * 1e6:.2f} µs/个，"
+          f"取消 {len(victims)} 个 {cancelled / max(1, len(victims)) * 1e6:.2f} µs/个，堆峰值 {peak}")
+    print(f"  触发 {fired} 个事件（咬钩 {outcomes['bite']}，QTE 超时 {outcomes['deadline']}）"
+          f"{elapsed:.2f} s，{fired / elapsed / 1000:.0f} k 事件/秒；剩余 {len(scheduler)} 个")
+    assert outcomes['bite'] == pending - len(victims) == outcomes['deadline'] and not len(scheduler)
+
+    # 对照：旧做法每竿一个睡眠线程（只开 threads 个，按比例估算）
+    baseline = threading.active_count()
+    stop = threading.Event()
+    start = time.perf_counter()
+    workers = [threading.Thread(target=stop.wait, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    spawned = time.perf_counter() - start
+    alive = threading.active_count() - baseline
+    stop.set()
+    for worker in workers:
+        worker.join()
+    print(f"  对照：每竿一个线程，开 {alive} 个睡眠线程 {spawned * 1000:.0f} ms"
+          f"（{spawned / threads * 1e6:.0f} µs/个），{pending} 竿约需 {spawned / threads * pending:.1f} s 和 {pending} 个线程")
+
+    # 端到端：大量会话的 FishingManager 共用一个调度器，玩家按键也是调度器里的事件
+    clock = fg.ManualClock()
+    scheduler = fg.TimerScheduler(clock)
+    storage = fg.SqliteStorage(":memory:")
+    results = {'caught': 0, 'failed': 0}
+    baseline = threading.active_count()
+
+    def start_session(i):
+        game_state = fg.GameState(storage=storage, profile=f"s{i}", write_behind=False, clock=clock, seed=i)
+        manager = fg.FishingManager(game_state, None, scheduler)
+        player = random.Random(i)
+        remaining = [session_casts]
+
+        def on_bite(sequence):
+            at = clock.now()
+            for key in sequence:
+                at += player.uniform(0.15, 0.7)
+                scheduler.call_at(at, manager.press, key)
+
+        def on_end(success, *result):
+            results['caught' if success else 'failed'] += 1
+            remaining[0] -= 1
+            if remaining[0]:
+                scheduler.call_later(fg.SIMULATED_CAST_OVERHEAD, manager.start_fishing)
+
+        manager.set_callbacks(on_bite, on_end)
+        manager.start_fishing()
+
+    start = time.perf_counter()
+    for i in range(sessions):
+        start_session(i)
+    peak = len(scheduler)
+    fired = _drain(clock, scheduler)
+    elapsed = time.perf_counter() - start
+    storage.close()
+    print(f"  {sessions} 个会话 × {session_casts} 竿共用一个调度器：{elapsed:.2f} s，{fired} 个事件，"
+          f"结果 {results}，挂起峰值 {peak}，新增线程 {threading.active_count() - baseline}")
+    assert sum(results.values()) == sessions * session_casts and threading.active_count() == baseline
+
+
+# ==========================
+# 取消钓鱼
+# ==========================
+def _legacy_cast_cancel(cycles: int):
+    """对照：旧做法每竿一个睡眠线程，取消只清标志；返回 (线程峰值, 串到新一竿上的咬钩次数)"""
+    state = {'fishing': False, 'cast': 0}
+    stale = [0]
+    baseline = threading.active_count()
+    peak = 0
+    workers = []
+
+    def wait_for_bite(cast_id, wait):
+        time.sleep(wait)
+        if state['fishing'] and state['cast'] != cast_id:
+            stale[0] += 1  # 旧线程醒来时新的一竿正在等咬钩，误触发
+
+    for i in range(cycles):
+        state['fishing'] = True
+        state['cast'] = i
+        worker = threading.Thread(target=wait_for_bite, args=(i, 0.05 + 0.001 * (i % 50)), daemon=True)
+        worker.start()
+        workers.append(worker)
+        peak = max(peak, threading.active_count() - baseline)
+        state['fishing'] = False  # cancel_fishing
+        state['fishing'] = True   # 立刻重新抛竿
+    for worker in workers:
+        worker.join()
+    return peak, stale[0]
+
+def bench_cancel(cycles: int, lines: int):
+    """快速抛竿/取消：取消后调度器里立即没有这一竿的事件，旧事件不会串到新的一竿，线程与定时器数量不增长"""
+    import asyncio
+
+    rng = random.Random(25)
+    baseline = threading.active_count()
+
+    # FishingManager：取消后马上重新抛竿，期间时间随机前进（有时已经咬钩）
+    clock = fg.ManualClock()
+    scheduler = fg.TimerScheduler(clock)
+    storage = fg.SqliteStorage(":memory:")
+    game_state = fg.GameState(storage=storage, write_behind=False, clock=clock, seed=25)
+    manager = fg.FishingManager(game_state, None, scheduler)
+    current = [None]
+    seen = {'bites': 0, 'stale': 0, 'ended': 0}
+
+    def on_bite(sequence):
+        seen['bites'] += 1
+        if not current[0].active:
+            seen['stale'] += 1
+
+    def on_end(success, *result):
+        seen['ended'] += 1
+
+    manager.set_callbacks(on_bite, on_end)
+    peak_heap = peak_live = 0
+    start = time.perf_counter()
+    for i in range(cycles):
+        previous = current[0]
+        current[0] = manager.start_fishing()
+        assert current[0] is not None and not (previous and previous.active)
+        clock.advance(rng.uniform(0.0, 8.0))
+        scheduler.run_due()
+        peak_live = max(peak_live, len(scheduler))
+        peak_heap = max(peak_heap, len(scheduler._heap))
+        if current[0].active:
+            assert (current[0].cancel() if i % 2 else manager.cancel_fishing())
+        assert not len(scheduler) and not current[0].cancel()  # 取消立即撤销事件；旧句柄再取消是空操作
+    elapsed = time.perf_counter() - start
+    storage.close()
+    print(f"FishingManager：{cycles} 次抛竿/取消 {elapsed:.2f} s（{elapsed / cycles * 1e6:.1f} µs/次），"
+          f"咬钩 {seen['bites']} 次（串竿 {seen['stale']}），自然结束 {seen['ended']} 次；"
+          f"挂起事件峰值 {peak_live}，堆峰值 {peak_heap}（惰性删除 {scheduler.cancelled} 个），"
+          f"新增线程 {threading.active_count() - baseline}")
+    assert seen['stale'] == 0 and peak_live <= 1 and peak_heap <= 2 * fg.TIMER_COMPACT_MIN + 1
+    assert threading.active_count() == baseline
+
+    # AsyncFishingManager：取消后 Task 立即结束，事件循环里的定时器不堆积
+    loop = fg.VirtualTimeLoop()
+    storage = fg.SqliteStorage(":memory:")
+    async_manager = fg.AsyncFishingManager(fg.GameState(storage=storage, write_behind=False,
+                                                        clock=loop.clock, seed=25))
+    counts = {'tasks': 0, 'timers': 0, 'cancelled': 0}
+
+    async def churn():
+        tasks = len(asyncio.all_tasks())
+        for _ in range(cycles):
+            cast = async_manager.start_fishing()
+            await asyncio.sleep(rng.uniform(0.0, 8.0))
+            if async_manager.cancel_fishing():
+                try:
+                    await cast
+                except asyncio.CancelledError:
+                    counts['cancelled'] += 1
+            else:
+                await cast
+            await asyncio.sleep(0)
+            counts['tasks'] = max(counts['tasks'], len(asyncio.all_tasks()) - tasks)
+            counts['timers'] = max(counts['timers'], len(loop._scheduled))
+        async_manager.close()
+
+    start = time.perf_counter()
+    loop.run_until_complete(churn())
+    elapsed = time.perf_counter() - start
+    loop.close()
+    storage.close()
+    print(f"AsyncFishingManager：{cycles} 次抛竿/取消 {elapsed:.2f} s，取消 {counts['cancelled']} 次，"
+          f"事件丢弃 {async_manager.dropped}；取消后残留 Task 峰值 {counts['tasks']}，"
+          f"事件循环定时器峰值 {counts['timers']}，新增线程 {threading.active_count() - baseline}")
+    assert counts['tasks'] == 0 and threading.active_count() == baseline
+
+    # MultiLineFishing：每轮随机收回一半的线再补满
+    clock = fg.ManualClock()
+    scheduler = fg.TimerScheduler(clock)
+    storage = fg.SqliteStorage(":memory:")
+    game_state = fg.GameState(storage=storage, write_behind=False, clock=clock, seed=25)
+    line_stale = [0]
+
+    def line_bite(line):
+        if multi.lines.get(line.line_id) is not line:
+            line_stale[0] += 1
+
+    multi = fg.MultiLineFishing(game_state, scheduler, lines, on_bite=line_bite, persist=False)
+    peak_heap = 0
+    start = time.perf_counter()
+    rounds = max(1, cycles // lines)
+    for _ in range(rounds):
+        while multi.cast() is not None:
+            pass
+        clock.advance(rng.uniform(0.0, 3.0))
+        scheduler.run_due()
+        for line in rng.sample(list(multi.lines.values()), len(multi) // 2):
+            multi.cancel(line)
+        assert len(scheduler) == len(multi)
+        peak_heap = max(peak_heap, len(scheduler._heap))
+    multi.cancel_all()
+    elapsed = time.perf_counter() - start
+    storage.close()
+    print(f"MultiLineFishing：{rounds} 轮 × {lines} 根线 {elapsed:.2f} s，误触发 {line_stale[0]}，"
+          f"收回后挂起 {len(scheduler)} 个，堆峰值 {peak_heap}，新增线程 {threading.active_count() - baseline}")
+    assert line_stale[0] == 0 and not len(scheduler) and peak_heap <= 2 * max(lines, fg.TIMER_COMPACT_MIN) + 1
+    assert threading.active_count() == baseline
+
+    legacy = min(cycles, 500)
+    peak, stale = _legacy_cast_cancel(legacy)
+    print(f"  对照：每竿一个睡眠线程，{legacy} 次抛竿/取消时线程峰值 {peak}，旧线程误触发新一竿的咬钩 {stale} 次")
+
+
+def _session_trace(seed: int, casts: int, skip_qte: bool = False):
+    """用给定种子跑一个会话，返回每竿的 (鱼种, 等待, 按键序列, 重量)"""
+    game_state = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False, seed=seed)
+    weights = []
+    engine = fg.FishingEngine(game_state, persist=False, on_end=lambda ok, *r: weights.append(r[1] if ok else None))
+    if skip_qte:
+        # 模拟 QTE 子系统多消耗了随机数（例如按键规则改了），其他子系统不应受影响
+        generate = engine._generate_qte_sequence
+
+        def noisy_generate(rarity):
+            game_state.rng.qte.random()
+            return generate(rarity)
+        engine._generate_qte_sequence = noisy_generate
+    trace = []
+    for _ in range(casts):
+        engine.cast(0.0)
+        engine.tick(engine.bite_at)
+        trace.append((engine.current_selected_fish[0], round(engine.bite_at, 6), tuple(engine.qte_sequence)))
+        for key in list(engine.qte_sequence):
+            engine.press(key, engine.bite_at)
+    return [entry + (weight,) for entry, weight in zip(trace, weights)]
+
+def bench_rng(sessions: int, casts: int):
+    """每个会话独立的随机数流：同种子可复现，多线程并行与顺序执行结果一致，子系统互不干扰"""
+    start = time.perf_counter()
+    sequential = [_session_trace(seed, casts) for seed in range(sessions)]
+    elapsed = time.perf_counter() - start
+    threaded = [None] * sessions
+
+    def worker(seed):
+        threaded[seed] = _session_trace(seed, casts)
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"{sessions} 个会话 × {casts} 竿：顺序 {elapsed:.2f} s；{sessions} 个线程并行的结果"
+          f"{'与顺序执行完全一致' if threaded == sequential else '与顺序执行不一致！'}")
+    assert threaded == sequential
+
+    again = _session_trace(0, casts)
+    assert again == sequential[0], "同一种子两次运行结果不同"
+    print("  同一种子重跑：结果相同")
+    perturbed = _session_trace(0, casts, skip_qte=True)
+    same = all(a[0] == b[0] and a[1] == b[1] and a[3] == b[3] for a, b in zip(sequential[0], perturbed))
+    print(f"  QTE 流多抽一次：鱼种/等待/重量{'不受影响' if same else '被打乱了！'}")
+    assert same
+    distinct = len({tuple(t) for t in sequential})
+    print(f"  {sessions} 个种子得到 {distinct} 种不同的结果")
+
+
+def _record_bot_session(seed: int, steps: int, directory: str) -> str:
+    """让一个随机玩家在录制中玩一局（钓鱼、卖鱼、买东西、送礼、睡觉），返回录像路径"""
+    bot = random.Random(seed)
+    clock = fg.ManualClock(1000.0)
+    game_state = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=True, clock=clock, seed=seed)
+    recorder = fg.SessionRecorder(game_state)
+    engine = fg.FishingEngine(game_state, persist=False)
+    recorder.attach_engine(engine)
+    for _ in range(steps):
+        roll = bot.random()
+        if roll < 0.8:
+            game_state.current_location = bot.choice(
+                [loc for loc in fg.LOCATION_FISH_CONFIG if game_state.is_location_unlocked(loc)])
+            engine.cast(clock.now())
+            clock.advance_to(engine.bite_at)
+            engine.tick(clock.now())
+            if bot.random() < 0.05:
+                clock.advance_to(engine.qte_deadline + 0.01)  # 走神没按键
+                engine.tick(clock.now())
+            for key in list(engine.qte_sequence):
+                clock.advance(bot.uniform(0.1, 0.7))
+                if engine.press(key if bot.random() > 0.03 else 'x', clock.now()) != 'progress':
+                    break
+            if engine.phase != engine.IDLE:
+                clock.advance_to(engine.qte_deadline + 0.01)
+                engine.tick(clock.now())
+            if game_state.current_location != "小溪" and not game_state.student_state.get('met'):
+                game_state.roll_drift_bottle()
+        elif roll < 0.85:
+            game_state.sell_all_fish()
+        elif roll < 0.9:
+            bait = bot.choice(list(fg.BAIT_CONFIG))
+            if game_state.spend_money(fg.BAIT_CONFIG[bait]['price']):
+                game_state.acquire_item(bait, 3)
+            game_state.select_bait(bait)
+        elif roll < 0.93:
+            game_state.add_day(1)
+            clock.advance(8 * 3600)
+            game_state.apply_mood_decay()
+            game_state.ensure_daily_request()
+        elif roll < 0.97 and game_state.inventory['fish_bag']:
+            fish = game_state.remove_one_fish(game_state.inventory['fish_bag'].to_records()[0]['name'],
+                                              fg.FISH_POLICY_HEAVIEST)
+            if fish:
+                game_state.gift_to_student(fish['name'], tags=['生鱼', '鱼肉'], weight=fish['weight'])
+        else:
+            for rod in fg.ROD_CONFIG:
+                if rod not in game_state.get_owned_rods() and game_state.spend_money(fg.ROD_CONFIG[rod]['price']):
+                    game_state.add_rod(rod)
+                    game_state.equip_rod(rod)
+        clock.advance(bot.uniform(1, 5))
+    path = os.path.join(directory, f"session-{seed}.rec")
+    recorder.save(path)
+    return path
+
+def bench_replay(sessions: int, steps: int):
+    """录制大量随机会话，再全速回放并核对最终存档"""
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        paths = [_record_bot_session(seed, steps, tmp) for seed in range(sessions)]
+        record_time = time.perf_counter() - start
+        size = sum(os.path.getsize(p) for p in paths)
+        recordings = [fg.load_recording(p) for p in paths]
+    actions = sum(len(r['actions']) for r in recordings)
+    print(f"{sessions} 局 × {steps} 步：共 {actions} 个操作，录像 {size / 1024:.0f} KB"
+          f"（{size / actions:.1f} 字节/操作），录制 {record_time:.2f} s")
+
+    start = time.perf_counter()
+    finals = [fg.replay_session(r) for r in recordings]
+    replay_time = time.perf_counter() - start
+    mismatched = [i for i, (r, g) in enumerate(zip(recordings, finals))
+                  if fg.diff_session_state(r['final'], fg._state_json(g))]
+    print(f"回放：{replay_time:.2f} s，{actions / replay_time / 1000:.0f} k 操作/秒；"
+          f"最终存档不一致 {len(mismatched)} 局")
+    if mismatched:
+        bad = recordings[mismatched[0]]
+        print(f"  第 {mismatched[0]} 局不一致的字段：{fg.verify_recording(bad)}")
+    assert not mismatched
+
+
+def _linear_select(game_state, location):
+    """旧版抽鱼：每次重建权重列表再线性累加（基准对照）"""
+    fish_list = fg.LOCATION_FISH_CONFIG.get(location, fg.LOCATION_FISH_CONFIG["小溪"])
+    weighted_list = []
+    total_weight = 0
+    for fish_info in fish_list:
+        adjusted = fish_info[4] * game_state.get_rarity_weight_multiplier(fish_info[1])
+        weighted_list.append((fish_info, adjusted))
+        total_weight += adjusted
+    rand = random.uniform(0, total_weight)
+    cumulative = 0
+    for fish_info, adj_weight in weighted_list:
+        cumulative += adj_weight
+        if rand <= cumulative:
+            return fish_info
+    return weighted_list[0][0]
+
+
+def bench_select(draws: int):
+    """抽鱼：线性扫描 vs 缓存的别名表，并核对抽样频率"""
+    game_state = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False)
+    engine = fg.FishingEngine(game_state)
+    for location in fg.LOCATION_FISH_CONFIG:
+        for bait in fg.BAIT_CONFIG:
+            game_state.inventory['selected_bait'] = bait
+            game_state.roll_environment()
+            fg.invalidate_fish_samplers()
+            start = time.perf_counter()
+            sampler = fg.fish_sampler(location, bait, game_state.current_weather, game_state.current_time_slot)
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(draws):
+                _linear_select(game_state, location)
+            linear = time.perf_counter() - start
+            counts = {}
+            start = time.perf_counter()
+            for _ in range(draws):
+                fish = engine._select_fish_by_probability(location)
+                counts[fish[0]] = counts.get(fish[0], 0) + 1
+            alias = time.perf_counter() - start
+            worst = max(abs(counts.get(fish[0], 0) / draws - sampler.probability(i))
+                        for i, fish in enumerate(sampler.items))
+            print(f"{location} + {bait}：线性 {linear / draws * 1e9:5.0f} ns/次，"
+                  f"别名表 {alias / draws * 1e9:5.0f} ns/次（含计数），建表 {build * 1e6:.0f} µs，"
+                  f"频率最大偏差 {worst:.4f}")
+
+
+# ==========================
+# 统计容差（模拟结果核对共用）
+# ==========================
+TOLERANCE_SIGMAS = 5.0  # 允许的偏差为几个标准误；一次核对上千个量也几乎不会误报
+TOLERANCE_FLOOR = 1e-9  # 没有抽样误差的量（成功率恰为 1 等）只留浮点舍入的余量
+
+def _cv(values) -> float:
+    """变异系数（标准差 / 均值）"""
+    n = len(values)
+    mean = sum(values) / n
+    if not mean:
+        return 0.0
+    return math.sqrt(max(0.0, sum(v * v for v in values) / n - mean * mean)) / abs(mean)
+
+def proportion_tolerance(p: float, *sizes) -> float:
+    """比例（鱼种频率、成功率）的绝对容差；两边都是抽样时把各自的样本量都传进来"""
+    p = min(max(p, 0.0), 1.0)  # 解析计算的概率可能带浮点误差
+    return TOLERANCE_SIGMAS * math.sqrt(p * (1 - p) * sum(1 / n for n in sizes)) + TOLERANCE_FLOOR
+
+def mean_tolerance(values, *sizes) -> float:
+    """每竿均值的相对容差，按逐竿样本 values 估计变异系数"""
+    return TOLERANCE_SIGMAS * _cv(values) * math.sqrt(sum(1 / n for n in sizes)) + TOLERANCE_FLOOR
+
+def ratio_tolerance(values, seconds, *sizes) -> float:
+    """「总收益 / 总耗时」这种比值的相对容差（values 与 seconds 为逐竿配对的样本）
+    比值的相对误差按一阶展开近似为 收益/平均收益 − 耗时/平均耗时 的均值，用它的变异估计标准误。
+    """
+    n = len(values)
+    mean_value = sum(values) / n
+    mean_seconds = sum(seconds) / n
+    terms = [v / mean_value - t / mean_seconds for v, t in zip(values, seconds)]
+    spread = math.sqrt(sum(d * d for d in terms) / n)
+    return TOLERANCE_SIGMAS * spread * math.sqrt(sum(1 / n for n in sizes)) + TOLERANCE_FLOOR
+
+def _cast_samples(location, bait, rod, weather, casts=2000, seed=0,
+                  reaction_range=fg.QTE_REACTION_RANGE, cast_overhead=0.0) -> dict:
+    """按 simulate_catches 的模型逐竿抽一小批样本，用来估计每竿收益与耗时的离散程度"""
+    time_slot = fg.FIXED_TIME_SLOT[0]
+    sampler, table = fg._loadout_tables(location, bait, weather, time_slot)
+    wait_mult = fg.wait_multiplier_for(bait, fg.environment_wait_for(weather, time_slot), None)
+    window = fg.catch_window_for(rod, False)
+    rng = random.Random(seed)
+    samples = {key: [] for key in ('wait', 'seconds', 'kg', 'gold', 'exp')}
+    for _ in range(casts):
+        idx, wait, seconds, caught, weight, exp = fg._cast_python(rng, sampler, table, wait_mult, window,
+                                                                  reaction_range)
+        samples['wait'].append(wait)
+        samples['seconds'].append(seconds + cast_overhead)
+        samples['kg'].append(weight if caught else 0.0)
+        samples['gold'].append(weight * table['price'][idx] if caught else 0.0)
+        samples['exp'].append(exp if caught else 0)
+    return samples
+
+
+# ==========================
+# 蒙特卡洛模拟
+# ==========================
+MC_LOADOUTS = [
+    # (地点, 鱼饵, 鱼竿, 天数) —— 天数决定当天天气
+    ("小溪", "普通鱼饵", "木质竿", 1),
+    ("河流", "高级蚯蚓", "碳素竿", 2),
+    ("湖泊", "路亚假饵", "竞赛竿", 3),
+]
+
+def _engine_catches(location, bait, rod, day, casts, seed):
+    """用标量引擎逐竿钓鱼（与 simulate_catches 相同的玩家反应模型），汇总成同样的指标"""
+    player = random.Random(seed + 1)
+    game_state = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False, seed=seed)
+    game_state.inventory.update(day=day, selected_bait=bait, equipped_rod=rod)
+    game_state.inventory['bait_items'][bait] = casts
+    game_state.current_location = location
+    results = []
+    engine = fg.FishingEngine(game_state, persist=False, on_end=lambda ok, *r: results.append(r if ok else None))
+    low, high = fg.QTE_REACTION_RANGE
+    now = 0.0
+    seconds = []
+    for _ in range(casts):
+        started = now
+        engine.cast(now)
+        now = engine.bite_at
+        engine.tick(now)
+        deadline = engine.qte_deadline
+        for key in list(engine.qte_sequence):
+            now += player.uniform(low, high)
+            if engine.press(key, now) != 'progress':
+                break
+        now = min(now, deadline)
+        seconds.append(now - started)
+    counts = {}
+    weights = {}
+    gold = []
+    exp = []
+    for result in results:
+        if result is None:
+            gold.append(0.0)
+            exp.append(0)
+            continue
+        name, weight, exp_gain, _ = result
+        counts[name] = counts.get(name, 0) + 1
+        weights.setdefault(name, []).append(weight)
+        gold.append(weight * fg.FISH_PRICE_PER_KG.get(_rarity_of(location, name), 10))
+        exp.append(exp_gain)
+    hours = now / 3600
+    return {
+        'weather': game_state.current_weather,
+        'catches': sum(counts.values()),
+        'gold_per_hour': sum(gold) / hours,
+        'exp_per_hour': sum(exp) / hours,
+        'counts': counts,
+        'mean_weight': {name: sum(ws) / len(ws) for name, ws in weights.items()},
+        'samples': {'seconds': seconds, 'gold': gold, 'exp': exp},  # 逐竿样本（估计容差用）
+    }
+
+def _rarity_of(location, name):
+    for fish in fg.LOCATION_FISH_CONFIG[location]:
+        if fish[0] == name:
+            return fish[1]
+    return None
+
+def bench_mc(casts: int, engine_casts: int, seed: int):
+    """批量蒙特卡洛：numpy 与纯 Python 的吞吐量，并与标量引擎逐竿结果核对"""
+    numpy_module = fg.np
+    for location, bait, rod, day in MC_LOADOUTS:
+        engine = _engine_catches(location, bait, rod, day, engine_casts, seed)
+        weather = engine['weather']
+        print(f"{location} + {bait} + {rod}（{weather}）")
+        if numpy_module is not None:
+            start = time.perf_counter()
+            result = fg.simulate_catches(location, bait, rod, weather, casts=casts, seed=seed)
+            elapsed = time.perf_counter() - start
+            print(f"  numpy：{casts} 竿 {elapsed:.2f} s（{casts / elapsed / 1e6:.2f} M 竿/s）")
+        fg.np = None
+        try:
+            python_casts = max(1, casts // 20)
+            start = time.perf_counter()
+            fallback = fg.simulate_catches(location, bait, rod, weather, casts=python_casts, seed=seed)
+            elapsed = time.perf_counter() - start
+        finally:
+            fg.np = numpy_module
+        print(f"  纯 Python：{python_casts} 竿 {elapsed:.2f} s（{python_casts / elapsed / 1e6:.3f} M 竿/s）")
+        if numpy_module is None:
+            result = fallback
+
+        sizes = (engine_casts, result['casts'])
+        worst = 0.0  # 鱼种频率偏差与容差之比的最大值
+        worst_share = 0.0
+        weight_error = 0.0
+        for name, entry in result['species'].items():
+            share = engine['counts'].get(name, 0) / engine_casts
+            expected = entry['count'] / result['casts']
+            worst_share = max(worst_share, abs(share - expected))
+            tolerance = proportion_tolerance(max(expected, 1 / engine_casts), *sizes)
+            worst = max(worst, abs(share - expected) / tolerance)
+            if name in engine['mean_weight'] and entry['count']:
+                weight_error = max(weight_error, abs(engine['mean_weight'][name] / entry['mean_weight'] - 1))
+        samples = engine['samples']
+        gold_error = engine['gold_per_hour'] / result['gold_per_hour'] - 1
+        exp_error = engine['exp_per_hour'] / result['exp_per_hour'] - 1
+        gold_tolerance = ratio_tolerance(samples['gold'], samples['seconds'], *sizes)
+        exp_tolerance = ratio_tolerance(samples['exp'], samples['seconds'], *sizes)
+        print(f"  模拟：成功率 {result['success_rate']:.3f}，{result['gold_per_hour']:.0f} 金币/小时，"
+              f"{result['exp_per_hour']:.0f} 经验/小时")
+        print(f"  引擎 {engine_casts} 竿：成功率 {engine['catches'] / engine_casts:.3f}，"
+              f"{engine['gold_per_hour']:.0f} 金币/小时，{engine['exp_per_hour']:.0f} 经验/小时")
+        print(f"  核对：鱼种频率最大偏差 {worst_share:.4f}（容差的 {worst:.0%}），平均重量最大相对误差 "
+              f"{weight_error:.1%}，金币 {gold_error:+.1%}（容差 ±{gold_tolerance:.1%}），"
+              f"经验 {exp_error:+.1%}（容差 ±{exp_tolerance:.1%}）")
+        assert worst < 1 and abs(gold_error) < gold_tolerance and abs(exp_error) < exp_tolerance, \
+            "模拟与引擎结果不一致"
+
+
+# ==========================
+# 期望值计算
+# ==========================
+def bench_ev(casts: int, seed: int, reaction_ranges):
+    """解析期望值的耗时，并与蒙特卡洛结果逐装备核对"""
+    fg.invalidate_fish_samplers()
+    loadouts = [(location, bait, rod, weather)
+                for location in fg.LOCATION_FISH_CONFIG for bait in fg.BAIT_CONFIG
+                for rod in fg.ROD_CONFIG for weather, _, _ in fg.WEATHER_OPTIONS]
+    for location, bait, rod, weather in loadouts:
+        fg.fish_sampler(location, bait, weather, fg.FIXED_TIME_SLOT[0])
+    start = time.perf_counter()
+    for location, bait, rod, weather in loadouts:
+        fg.loadout_expectation(location, bait, rod, weather)
+    cold = (time.perf_counter() - start) / len(loadouts)
+    start = time.perf_counter()
+    for location, bait, rod, weather in loadouts:
+        fg.loadout_expectation(location, bait, rod, weather)
+    warm = (time.perf_counter() - start) / len(loadouts)
+    print(f"{len(loadouts)} 套装备：首次计算 {cold * 1e6:.1f} µs/套，缓存命中 {warm * 1e6:.2f} µs/套")
+
+    keys = ('success_rate', 'mean_wait', 'kg_per_hour', 'gold_per_hour', 'exp_per_hour')
+    for reaction_range in reaction_ranges:
+        worst = dict.fromkeys(keys, 0.0)
+        ratio = dict.fromkeys(keys + ('species',), 0.0)  # 偏差与容差之比的最大值
+        worst_species = 0.0
+        lowest = 1.0
+        start = time.perf_counter()
+        for location, bait, rod, weather in loadouts:
+            expected = fg.loadout_expectation(location, bait, rod, weather, reaction_range=reaction_range)
+            sampled = fg.simulate_catches(location, bait, rod, weather, casts=casts, seed=seed,
+                                          reaction_range=reaction_range)
+            samples = _cast_samples(location, bait, rod, weather, seed=seed, reaction_range=reaction_range)
+            p = expected['success_rate']
+            lowest = min(lowest, p)
+            tolerances = {
+                'success_rate': proportion_tolerance(p, casts) / p,
+                'mean_wait': mean_tolerance(samples['wait'], casts),
+                'kg_per_hour': ratio_tolerance(samples['kg'], samples['seconds'], casts),
+                'gold_per_hour': ratio_tolerance(samples['gold'], samples['seconds'], casts),
+                'exp_per_hour': ratio_tolerance(samples['exp'], samples['seconds'], casts),
+            }
+            for key in keys:
+                error = abs(expected[key] / sampled[key] - 1)
+                worst[key] = max(worst[key], error)
+                ratio[key] = max(ratio[key], error / tolerances[key])
+            for name, entry in sampled['species'].items():
+                probability = expected['species'][name]['catch_probability']
+                error = abs(entry['count'] / casts - probability)
+                worst_species = max(worst_species, error)
+                tolerance = proportion_tolerance(max(probability, 1 / casts), casts)
+                ratio['species'] = max(ratio['species'], error / tolerance)
+        elapsed = time.perf_counter() - start
+        print(f"反应时间 {reaction_range[0]}~{reaction_range[1]} 秒/键（最低成功率 {lowest:.3f}），"
+              f"每套模拟 {casts} 竿，共 {elapsed:.1f} s")
+        print("  最大相对误差：" + "，".join(f"{key} {value:.2%}" for key, value in worst.items())
+              + f"；鱼种捕获概率最大偏差 {worst_species:.4f}")
+        print(f"  最大偏差占容差（{TOLERANCE_SIGMAS:g} 个标准误）："
+              + "，".join(f"{key} {value:.0%}" for key, value in ratio.items()))
+        assert max(ratio.values()) < 1, "期望值与蒙特卡洛结果不一致"
+
+
+# ==========================
+# 升级进度
+# ==========================
+def bench_progression(seeds: int):
+    """快速进度模拟与引擎逐竿跑整局（economy_sweep.run_career）的升到 7 级用时对比"""
+    import economy_sweep
+    import progression_sim
+
+    policy = progression_sim.POLICIES["greedy"]
+    start = time.perf_counter()
+    careers = progression_sim._simulate_chunk(policy, range(seeds), progression_sim.MAX_DAYS, fg.QTE_REACTION_RANGE)
+    fast = time.perf_counter() - start
+    fast_casts = sum(max(c[level][1] for level in c) for c in careers)
+    start = time.perf_counter()
+    engine_runs = [economy_sweep.run_career(seed) for seed in range(seeds)]
+    slow = time.perf_counter() - start
+    print(f"{seeds} 局：进度模拟 {fast:.2f} s（{fast_casts / fast / 1000:.0f} k 竿/s），"
+          f"引擎逐竿 {slow:.2f} s（只跑到买得起竞赛竿且升到 7 级）")
+
+    level = economy_sweep.TARGET_LEVEL
+    mean = lambda values: sum(values) / len(values)
+    fast_7 = [c[level] for c in careers]
+    engine_7 = [r['level_7'] for r in engine_runs]
+    for label, index, key in (("天数", 0, 'day'), ("竿数", 1, 'casts'), ("钓鱼分钟", 2, 'minutes')):
+        a = mean([m[index] for m in fast_7])
+        b = mean([m[key] for m in engine_7])
+        print(f"  升到 {level} 级的平均{label}：进度模拟 {a:.2f}，引擎 {b:.2f}（{a / b - 1:+.1%}）")
+        assert abs(a / b - 1) < 0.05, "进度模拟与引擎结果不一致"
+
+
+
+# ==========================
+# 离线挂机结算
+# ==========================
+def _idle_state(seed, location="湖泊", bait="路亚假饵", bait_stock=50, rod="竞赛竿"):
+    game_state = fg.GameState(storage=fg.SqliteStorage(":memory:"), write_behind=False, seed=seed)
+    game_state.inventory.update(level=fg.LOCATION_UNLOCK_LEVEL[location], selected_bait=bait,
+                                equipped_rod=rod, owned_rods=['木质竿', rod])
+    game_state.inventory['bait_items'][bait] = bait_stock
+    game_state.current_location = location
+    return game_state
+
+def _idle_engine_loop(game_state, fishing_seconds, seed):
+    """对照：用标量引擎逐竿钓满同样的钓鱼时间（每竿落盘一次）"""
+    player = random.Random(seed + 1)
+    engine = fg.FishingEngine(game_state, persist=False)
+    low, high = fg.QTE_REACTION_RANGE
+    now = 0.0
+    casts = 0
+    while now < fishing_seconds:
+        engine.cast(now)
+        now = engine.bite_at
+        engine.tick(now)
+        deadline = engine.qte_deadline
+        for key in list(engine.qte_sequence):
+            now += player.uniform(low, high)
+            if engine.press(key, now) != 'progress':
+                break
+        now = min(now, deadline) + fg.SIMULATED_CAST_OVERHEAD
+        casts += 1
+    return casts
+
+def bench_idle(hours: float, sessions: int, seed: int):
+    """离线挂机：批量结算与引擎逐竿的耗时、落盘次数对比，并与期望值、逐条经验结算核对"""
+    offline = hours * 3600
+    fishing_seconds = min(offline, fg.IDLE_MAX_SECONDS) * fg.IDLE_RATE
+    game_state = _idle_state(seed)
+    flushes = game_state.persister.flush_count
+    start = time.perf_counter()
+    result = game_state.resolve_idle(offline)
+    bulk = time.perf_counter() - start
+    bulk_flushes = game_state.persister.flush_count - flushes
+    print(f"离线 {hours:g} 小时（折算钓鱼 {fishing_seconds / 3600:.1f} 小时）：批量结算 {result['casts']} 竿 "
+          f"{bulk * 1000:.1f} ms，落盘 {bulk_flushes} 次；钓到 {result['catches']} 条，"
+          f"用掉鱼饵 {result['bait_used']}，经验 +{result['exp_added']}/{result['exp_gained']}，"
+          f"金币 +{result['money']:.0f}")
+    assert bulk_flushes == 1, "离线结算应只落盘一次"
+    game_state = _idle_state(seed)
+    flushes = game_state.persister.flush_count
+    start = time.perf_counter()
+    casts = _idle_engine_loop(game_state, fishing_seconds, seed)
+    slow = time.perf_counter() - start
+    print(f"  引擎逐竿：{casts} 竿 {slow * 1000:.0f} ms，落盘 {game_state.persister.flush_count - flushes} 次"
+          f"（批量快 {slow / bulk:.0f} 倍）")
+
+    # 期望值核对（普通鱼饵、木质竿，逐会话累计每钓鱼小时的产出）
+    numpy_module = fg.np
+    for label, module, count in (("numpy", numpy_module, sessions), ("纯 Python", None, max(1, sessions // 10))):
+        if label == "numpy" and numpy_module is None:
+            continue
+        fg.np = module
+        try:
+            totals = dict(casts=0, catches=0, seconds=0.0, money=0.0, exp=0)
+            start = time.perf_counter()
+            for i in range(count):
+                game_state = _idle_state(seed + i, "小溪", "普通鱼饵", 0, "木质竿")
+                result = game_state.resolve_idle(offline)
+                totals['casts'] += result['casts']
+                totals['catches'] += result['catches']
+                totals['seconds'] += result['fishing_seconds']
+                totals['money'] += result['money']
+                totals['exp'] += result['exp_gained']
+            elapsed = time.perf_counter() - start
+        finally:
+            fg.np = numpy_module
+        weather = fg.weather_for_day(1)
+        expected = fg.loadout_expectation("小溪", "普通鱼饵", "木质竿", weather,
+                                          cast_overhead=fg.SIMULATED_CAST_OVERHEAD)
+        fishing_hours = totals['seconds'] / 3600
+        samples = _cast_samples("小溪", "普通鱼饵", "木质竿", weather, seed=seed,
+                                cast_overhead=fg.SIMULATED_CAST_OVERHEAD)
+        n = totals['casts']
+        tolerances = {
+            'seconds_per_cast': mean_tolerance(samples['seconds'], n),
+            'success_rate': proportion_tolerance(expected['success_rate'], n) / expected['success_rate'],
+            'gold_per_hour': ratio_tolerance(samples['gold'], samples['seconds'], n),
+            'exp_per_hour': ratio_tolerance(samples['exp'], samples['seconds'], n),
+        }
+        errors = {
+            'seconds_per_cast': totals['seconds'] / totals['casts'] / expected['seconds_per_cast'] - 1,
+            'success_rate': totals['catches'] / totals['casts'] / expected['success_rate'] - 1,
+            'gold_per_hour': totals['money'] / fishing_hours / expected['gold_per_hour'] - 1,
+            'exp_per_hour': totals['exp'] / fishing_hours / expected['exp_per_hour'] - 1,
+        }
+        print(f"  {label}：{count} 次结算 {elapsed:.2f} s，共 {n} 竿；与期望值相比 "
+              + "，".join(f"{key} {value:+.2%}（±{tolerances[key]:.2%}）" for key, value in errors.items()))
+        assert all(abs(errors[key]) < tolerances[key] for key in errors), "离线结算与期望值不一致"
+
+    # 每天最多升一级：批量结算与逐条 settle_exp 一致
+    rng = random.Random(seed)
+    for _ in range(20000):
+        level = rng.randint(1, fg.MAX_LEVEL)
+        exp = rng.randint(0, fg.LEVEL_UP_EXP.get(level, 1))
+        day = rng.randint(1, 5)
+        last = rng.choice((0, day - 1, day))
+        amounts = [rng.randint(1, 80) for _ in range(rng.randint(0, 60))]
+        expected = (level, exp, False, 0)
+        state = (level, exp, last)
+        for amount in amounts:
+            settled = fg.settle_exp(state[0], state[1], amount, day, state[2])
+            if settled is None:
+                break
+            added = expected[3] + amount
+            expected = (settled[0], settled[1], expected[2] or settled[2], added)
+            state = (settled[0], settled[1], day if settled[2] else state[2])
+        assert fg.settle_exp_batch(level, exp, amounts, day, last) == expected, (level, exp, amounts, day, last)
+    print("  经验结算：20000 组随机序列与逐条 settle_exp 结果一致")
+
+def _records_size(records) -> int:
+    return sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r.values()) for r in records) \
+        + sys.getsizeof(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="钓鱼小游戏基准测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("persistence", help="存档写入次数与字节数")
+    p.add_argument("--catches", type=int, default=200)
+    p.add_argument("--tick-every", type=int, default=1, help="每多少次钓鱼触发一个写入节拍")
+
+    p = sub.add_parser("journal", help="不同存档大小下每次钓鱼的写入量")
+    p.add_argument("--bag-sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    p.add_argument("--catches", type=int, default=100)
+
+    p = sub.add_parser("storage", help="JSON 与 SQLite 存档后端对比")
+    p.add_argument("--profiles", type=int, nargs="+", default=[1, 100, 10000])
+    p.add_argument("--bag-size", type=int, default=50)
+    p.add_argument("--catches", type=int, default=50)
+
+    p = sub.add_parser("bag", help="列式鱼袋的内存与批量操作耗时")
+    p.add_argument("--size", type=int, default=1000000)
+
+    p = sub.add_parser("startup", help="启动时加载与存档迁移耗时")
+    p.add_argument("--bag-size", type=int, default=10000)
+    p.add_argument("--rounds", type=int, default=20)
+
+    p = sub.add_parser("slots", help="存档列表的读取耗时")
+    p.add_argument("--count", type=int, default=300)
+    p.add_argument("--bag-size", type=int, default=200)
+
+    p = sub.add_parser("sync", help="增量同步的上传字节数与吞吐量（自动启动本地替身服务器）")
+    p.add_argument("--catches", type=int, default=500)
+    p.add_argument("--sync-every", type=int, default=10, help="每多少次钓鱼同步一批")
+    p.add_argument("--bag-size", type=int, default=1000)
+    p.add_argument("--fail-rate", type=float, default=0.0, help="服务器随机返回 503 的比例")
+
+    p = sub.add_parser("format", help="JSON 与紧凑存档格式的大小与加载耗时")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    p.add_argument("--codecs", nargs="+", default=["zlib", "lzma"], choices=sorted(fg.COMPACT_CODECS))
+
+    p = sub.add_parser("engine", help="无界面引擎的会话吞吐量")
+    p.add_argument("--sessions", type=int, default=1000)
+    p.add_argument("--casts", type=int, default=20)
+    p.add_argument("--miss-rate", type=float, default=0.1, help="每次按键按错的概率")
+
+    p = sub.add_parser("day", help="用手动时钟模拟整天钓鱼")
+    p.add_argument("--hours", type=float, default=24.0)
+    p.add_argument("--days", type=int, default=5, help="模拟多少天不送礼后的心情衰减")
+
+    p = sub.add_parser("lines", help="多竿钓鱼：大量钓手各放几十根线")
+    p.add_argument("--players", type=int, default=1000)
+    p.add_argument("--lines", type=int, default=24)
+    p.add_argument("--minutes", type=float, default=3.0)
+
+    p = sub.add_parser("commands", help="多线程修改存档：直接修改、粗粒度锁与单写者命令队列")
+    p.add_argument("--producers", type=int, default=4)
+    p.add_argument("--commands", type=int, default=5000)
+    p.add_argument("--readers", type=int, default=2)
+
+    p = sub.add_parser("async", help="asyncio 驱动：一个事件循环里的大量钓手")
+    p.add_argument("--anglers", type=int, default=2000)
+    p.add_argument("--casts", type=int, default=10)
+    p.add_argument("--idle-rate", type=float, default=0.1, help="咬钩后不按键（等超时）的比例")
+
+    p = sub.add_parser("timers", help="单线程定时调度：大量挂起的抛竿与取消")
+    p.add_argument("--pending", type=int, default=100000)
+    p.add_argument("--cancel-rate", type=float, default=0.2)
+    p.add_argument("--sessions", type=int, default=1000)
+    p.add_argument("--casts", type=int, default=20)
+    p.add_argument("--threads", type=int, default=1000, help="对照组开多少个睡眠线程")
+
+    p = sub.add_parser("cancel", help="快速抛竿/取消：线程与定时器数量不增长，旧事件不串竿")
+    p.add_argument("--cycles", type=int, default=20000)
+    p.add_argument("--lines", type=int, default=fg.MAX_LINES)
+
+    p = sub.add_parser("select", help="抽鱼：线性扫描与别名表对比")
+    p.add_argument("--draws", type=int, default=200000)
+
+    p = sub.add_parser("mc", help="批量蒙特卡洛模拟的吞吐量，并与标量引擎核对")
+    p.add_argument("--casts", type=int, default=1000000)
+    p.add_argument("--engine-casts", type=int, default=20000)
+    p.add_argument("--seed", type=int, default=7)
+
+    p = sub.add_parser("ev", help="解析期望值的耗时，并与蒙特卡洛结果核对")
+    p.add_argument("--casts", type=int, default=200000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--reaction", type=float, nargs=2, action="append", metavar=("LOW", "HIGH"),
+                   help="每键反应时间范围，可重复；默认 0.15~0.6 与 0.5~1.2")
+
+    p = sub.add_parser("progression", help="升级进度模拟的速度，并与引擎逐竿结果核对")
+    p.add_argument("--seeds", type=int, default=300)
+
+    p = sub.add_parser("rng", help="会话随机数流的可复现性与线程隔离")
+    p.add_argument("--sessions", type=int, default=16)
+    p.add_argument("--casts", type=int, default=200)
+
+    p = sub.add_parser("idle", help="离线挂机批量结算的耗时与正确性")
+    p.add_argument("--hours", type=float, default=12.0)
+    p.add_argument("--sessions", type=int, default=200)
+    p.add_argument("--seed", type=int, default=7)
+
+    p = sub.add_parser("replay", help="录制随机会话并全速回放、核对最终存档")
+    p.add_argument("--sessions", type=int, default=200)
+    p.add_argument("--steps", type=int, default=500)
+
+    args = parser.parse_args(argv)
+    if args.command == "persistence":
+        bench_persistence(args.catches, args.tick_every)
+    elif args.command == "journal":
+        bench_journal(args.bag_sizes, args.catches)
+    elif args.command == "storage":
+        bench_storage(args.profiles, args.bag_size, args.catches)
+    elif args.command == "bag":
+        bench_bag(args.size)
+    elif args.command == "startup":
+        bench_startup(args.bag_size, args.rounds)
+    elif args.command == "slots":
+        bench_slots(args.count, args.bag_size)
+    elif args.command == "sync":
+        bench_sync(args.catches, args.sync_every, args.bag_size, args.fail_rate)
+    elif args.command == "format":
+        bench_format(args.sizes, args.codecs)
+    elif args.command == "engine":
+        bench_engine(args.sessions, args.casts, args.miss_rate)
+    elif args.command == "day":
+        bench_day(args.hours, args.days)
+    elif args.command == "lines":
+        bench_lines(args.players, args.lines, args.minutes)
+    elif args.command == "commands":
+        bench_commands(args.producers, args.commands, args.readers)
+    elif args.command == "async":
+        bench_async(args.anglers, args.casts, args.idle_rate)
+    elif args.command == "timers":
+        bench_timers(args.pending, args.cancel_rate, args.sessions, args.casts, args.threads)
+    elif args.command == "cancel":
+        bench_cancel(args.cycles, args.lines)
+    elif args.command == "select":
+        bench_select(args.draws)
+    elif args.command == "mc":
+        bench_mc(args.casts, args.engine_casts, args.seed)
+    elif args.command == "replay":
+        bench_replay(args.sessions, args.steps)
+    elif args.command == "rng":
+        bench_rng(args.sessions, args.casts)
+    elif args.command == "progression":
+        bench_progression(args.seeds)
+    elif args.command == "idle":
+        bench_idle(args.hours, args.sessions, args.seed)
+    elif args.command == "ev":
+        bench_ev(args.casts, args.seed, args.reaction or [fg.QTE_REACTION_RANGE, (0.5, 1.2)])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
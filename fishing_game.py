@@ -4,15 +4,40 @@
     卖鱼赚钱，买鱼饵/鱼竿/礼物，推进林汐事件与好感。
 """
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
 import random
+import asyncio
+import selectors
 import threading
 import time
 import sys
 import ctypes
 import datetime
 import json
+import math
 import os
+import sqlite3
+import base64
+import lzma
+import struct
+import zlib
+import heapq
+import bisect
+import itertools
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from array import array
+from collections import Counter, deque, namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+from types import MappingProxyType
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖，没有时退回纯 Python 实现
+    np = None
 
 
 # ==========================
@@ -142,6 +167,8 @@ FISH_EXP_BASE = {
 }
 
 # 升级所需经验表（从当前等级升到下一级）
+MAX_LEVEL = 10
+
 LEVEL_UP_EXP = {
     1: 50,    # 1->2级
     2: 100,   # 2->3级
@@ -178,6 +205,530 @@ DAILY_REQUEST_POOL = [
 ]
 
 
+# ==========================
+# 鱼袋（列式存储）
+# ==========================
+RARITY_ORDER = [RARITY_COMMON, RARITY_UNCOMMON, RARITY_RARE, RARITY_EPIC]
+
+# 鱼种 / 稀有度编号表（存档里另存名称表，编号只在进程内有效）
+FISH_SPECIES = []
+_FISH_SPECIES_IDS = {}
+FISH_RARITIES = []
+_FISH_RARITY_IDS = {}
+
+def species_id(name: str) -> int:
+    """鱼种名称 -> 编号，未知鱼种自动登记"""
+    sid = _FISH_SPECIES_IDS.get(name)
+    if sid is None:
+        sid = len(FISH_SPECIES)
+        FISH_SPECIES.append(name)
+        _FISH_SPECIES_IDS[name] = sid
+    return sid
+
+def rarity_id(rarity: str) -> int:
+    """稀有度名称 -> 编号，未知稀有度自动登记"""
+    rid = _FISH_RARITY_IDS.get(rarity)
+    if rid is None:
+        rid = len(FISH_RARITIES)
+        FISH_RARITIES.append(rarity)
+        _FISH_RARITY_IDS[rarity] = rid
+    return rid
+
+for _rarity in RARITY_ORDER:
+    rarity_id(_rarity)
+for _fish_list in LOCATION_FISH_CONFIG.values():
+    for _fish_info in _fish_list:
+        species_id(_fish_info[0])
+
+
+def _column_to_text(column: array) -> str:
+    """数组列 -> base64 文本（统一按小端序）"""
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return base64.b64encode(column.tobytes()).decode('ascii')
+
+def _column_from_text(typecode: str, text: str) -> array:
+    column = array(typecode)
+    column.frombytes(base64.b64decode(text))
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+# 调试模式：鱼袋每次变动后都用全量扫描核对增量汇总（很慢，只用于排查问题）
+FISH_BAG_DEBUG = os.environ.get("FISHING_DEBUG") == "1"
+
+
+FISH_POLICY_OLDEST = "oldest"      # 最早钓到的
+FISH_POLICY_HEAVIEST = "heaviest"  # 最重的
+FISH_POLICY_LIGHTEST = "lightest"  # 最轻的
+FISH_POLICIES = (FISH_POLICY_OLDEST, FISH_POLICY_HEAVIEST, FISH_POLICY_LIGHTEST)
+
+_DEAD_SLOT = 0xFFFF  # 已取出的鱼：鱼种列记为该值，压缩时再真正删除
+
+
+class FishBag:
+    """列式鱼袋
+    鱼种和稀有度以 array('H') 编号存储，重量以 array('f') 存储，每条鱼 8 字节；
+    另外按 (鱼种, 稀有度) 增量维护条数与总重量，汇总和估价只与鱼种数有关。
+    取鱼不挪动数组，只把槽位标记为已取出（O(1)），已取出的槽位过多时整体压缩一次；
+    按鱼种维护先后顺序队列，最重/最轻的鱼由按需建立的堆给出，都不用扫描整袋。
+    取出单条鱼时仍返回 {name, weight, rarity} 字典，兼容原来的列表写法。
+    """
+    __slots__ = ('species', 'rarities', 'weights', '_agg', '_live', '_head', '_order', '_heaps')
+
+    def __init__(self):
+        self.species = array('H')
+        self.rarities = array('H')
+        self.weights = array('f')
+        self._agg = {}      # (鱼种编号, 稀有度编号) -> [条数, 总重量]
+        self._live = 0      # 袋中实际的鱼数
+        self._head = 0      # 最早一条可能还在袋中的槽位
+        self._order = None  # 鱼种编号 -> 槽位队列（按钓到先后，首次按鱼种取鱼时建立）
+        self._heaps = {}    # (鱼种编号, 策略) -> [(排序键, 槽位), ...]
+
+    def __len__(self):
+        return self._live
+
+    def __iter__(self):
+        species = self.species
+        for slot in range(len(species)):
+            if species[slot] != _DEAD_SLOT:
+                yield self._record(slot)
+
+    def __getitem__(self, idx: int) -> dict:
+        return self._record(self._slot_at(idx))
+
+    def _record(self, slot: int) -> dict:
+        return {
+            'name': FISH_SPECIES[self.species[slot]],
+            'weight': round(self.weights[slot], 2),
+            'rarity': FISH_RARITIES[self.rarities[slot]],
+        }
+
+    def _slot_at(self, idx: int) -> int:
+        """第 idx 条鱼所在的槽位（有已取出的槽位时先压缩）"""
+        if len(self.species) != self._live:
+            self._compact()
+        if idx < 0:
+            idx += self._live
+        if not 0 <= idx < self._live:
+            raise IndexError("鱼袋下标越界")
+        return idx
+
+    def append(self, name: str, weight: float, rarity: str):
+        sid = species_id(name)
+        rid = rarity_id(rarity)
+        slot = len(self.species)
+        self.species.append(sid)
+        self.rarities.append(rid)
+        self.weights.append(weight)
+        stored = self.weights[slot]
+        self._live += 1
+        entry = self._agg.get((sid, rid))
+        if entry is None:
+            self._agg[(sid, rid)] = [1, stored]
+        else:
+            entry[0] += 1
+            entry[1] += stored
+        if self._order is not None:
+            queue = self._order.get(sid)
+            if queue is None:
+                self._order[sid] = deque((slot,))
+            else:
+                queue.append(slot)
+        heap = self._heaps.get((sid, FISH_POLICY_HEAVIEST))
+        if heap is not None:
+            heapq.heappush(heap, (-stored, slot))
+        heap = self._heaps.get((sid, FISH_POLICY_LIGHTEST))
+        if heap is not None:
+            heapq.heappush(heap, (stored, slot))
+        if FISH_BAG_DEBUG:
+            self.assert_consistent()
+
+    def _take(self, slot: int) -> dict:
+        """取出槽位中的鱼：更新汇总并把槽位标记为已取出"""
+        fish = self._record(slot)
+        key = (self.species[slot], self.rarities[slot])
+        entry = self._agg[key]
+        entry[0] -= 1
+        entry[1] -= self.weights[slot]
+        if entry[0] == 0:
+            # 清零时删掉条目，同时丢掉累积的浮点误差
+            del self._agg[key]
+        self.species[slot] = _DEAD_SLOT
+        self._live -= 1
+        dead = len(self.species) - self._live
+        if dead > 64 and dead > self._live:
+            self._compact()
+        if FISH_BAG_DEBUG:
+            self.assert_consistent()
+        return fish
+
+    def pop(self, idx: int = -1) -> dict:
+        """按位置取出一条鱼；pop(0) 取最早钓到的一条"""
+        if idx == 0:
+            fish = self.pop_oldest()
+            if fish is None:
+                raise IndexError("鱼袋是空的")
+            return fish
+        return self._take(self._slot_at(idx))
+
+    def pop_oldest(self):
+        """取出整袋最早钓到的一条鱼，没有时返回 None"""
+        species = self.species
+        head = self._head
+        while head < len(species) and species[head] == _DEAD_SLOT:
+            head += 1
+        self._head = head
+        if head >= len(species):
+            return None
+        return self._take(head)
+
+    def pop_species(self, name: str, policy: str = FISH_POLICY_OLDEST):
+        """按策略取出一条该鱼种的鱼（最早钓到/最重/最轻），没有时返回 None"""
+        sid = _FISH_SPECIES_IDS.get(name)
+        if sid is None:
+            return None
+        species = self.species
+        if policy == FISH_POLICY_OLDEST:
+            queue = self._species_order().get(sid)
+            while queue and species[queue[0]] != sid:
+                queue.popleft()
+            if not queue:
+                return None
+            return self._take(queue.popleft())
+        heap = self._species_heap(sid, policy)
+        while heap and species[heap[0][1]] != sid:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return self._take(heapq.heappop(heap)[1])
+
+    def remove(self, name: str, weight: float) -> bool:
+        """移除该鱼种中最早一条重量匹配的鱼（日志重放用）"""
+        sid = _FISH_SPECIES_IDS.get(name)
+        if sid is None:
+            return False
+        species = self.species
+        weights = self.weights
+        for slot in self._species_order().get(sid, ()):
+            if species[slot] == sid and round(weights[slot], 2) == weight:
+                self._take(slot)
+                return True
+        return False
+
+    def _species_order(self) -> dict:
+        if self._order is None:
+            order = {}
+            for slot, sid in enumerate(self.species):
+                if sid == _DEAD_SLOT:
+                    continue
+                queue = order.get(sid)
+                if queue is None:
+                    order[sid] = deque((slot,))
+                else:
+                    queue.append(slot)
+            self._order = order
+        return self._order
+
+    def _species_heap(self, sid: int, policy: str) -> list:
+        if policy not in (FISH_POLICY_HEAVIEST, FISH_POLICY_LIGHTEST):
+            raise ValueError(f"未知的取鱼策略：{policy}")
+        key = (sid, policy)
+        heap = self._heaps.get(key)
+        if heap is None:
+            sign = -1.0 if policy == FISH_POLICY_HEAVIEST else 1.0
+            species = self.species
+            weights = self.weights
+            heap = [(sign * weights[slot], slot) for slot in self._species_order().get(sid, ())
+                    if species[slot] == sid]
+            heapq.heapify(heap)
+            self._heaps[key] = heap
+        return heap
+
+    def _live_columns(self):
+        """只含袋中鱼的三列（没有已取出的槽位时直接返回原数组）"""
+        if len(self.species) == self._live:
+            return self.species, self.rarities, self.weights
+        if np is not None:
+            species = np.frombuffer(self.species, dtype=np.uint16)
+            mask = species != _DEAD_SLOT
+            return (
+                array('H', species[mask].tobytes()),
+                array('H', np.frombuffer(self.rarities, dtype=np.uint16)[mask].tobytes()),
+                array('f', np.frombuffer(self.weights, dtype=np.float32)[mask].tobytes()),
+            )
+        keep = [slot for slot, sid in enumerate(self.species) if sid != _DEAD_SLOT]
+        return (
+            array('H', [self.species[slot] for slot in keep]),
+            array('H', [self.rarities[slot] for slot in keep]),
+            array('f', [self.weights[slot] for slot in keep]),
+        )
+
+    def _compact(self):
+        """删除已取出的槽位，重建索引"""
+        self.species, self.rarities, self.weights = self._live_columns()
+        self._head = 0
+        self._order = None
+        self._heaps = {}
+
+    def clear(self):
+        self.species = array('H')
+        self.rarities = array('H')
+        self.weights = array('f')
+        self._agg = {}
+        self._live = 0
+        self._compact()
+
+    def copy(self) -> 'FishBag':
+        bag = FishBag()
+        species, rarities, weights = self._live_columns()
+        bag.species = array('H', species)
+        bag.rarities = array('H', rarities)
+        bag.weights = array('f', weights)
+        bag._agg = {key: list(entry) for key, entry in self._agg.items()}
+        bag._live = self._live
+        return bag
+
+    def nbytes(self) -> int:
+        """三列数据占用的字节数"""
+        return sum(col.itemsize * len(col) for col in (self.species, self.rarities, self.weights))
+
+    # ---------- 汇总（增量维护，O(鱼种数)） ----------
+    def count_of(self, name: str) -> int:
+        sid = _FISH_SPECIES_IDS.get(name)
+        return sum(entry[0] for (s, _), entry in self._agg.items() if s == sid)
+
+    def total_weight(self) -> float:
+        return round(sum(entry[1] for entry in self._agg.values()), 2)
+
+    def sale_value(self, price_per_kg=None, default_price: float = 10) -> float:
+        """按稀有度单价计算整袋售价（单价在调用时读取，改价后立即生效）"""
+        price_per_kg = FISH_PRICE_PER_KG if price_per_kg is None else price_per_kg
+        value = sum(
+            price_per_kg.get(FISH_RARITIES[rid], default_price) * entry[1]
+            for (_, rid), entry in self._agg.items()
+        )
+        # 重量按 float32 存储，结果取两位小数抹掉精度噪声
+        return round(value, 2)
+
+    def summary(self) -> dict:
+        """按鱼种汇总 {鱼名: {count, total_weight, rarity}}"""
+        summary = {}
+        for (sid, rid), (count, weight) in self._agg.items():
+            name = FISH_SPECIES[sid]
+            item = summary.get(name)
+            if item is None:
+                summary[name] = {'count': count, 'total_weight': weight, 'rarity': FISH_RARITIES[rid]}
+            else:
+                item['count'] += count
+                item['total_weight'] += weight
+        for item in summary.values():
+            item['total_weight'] = round(item['total_weight'], 2)
+        return summary
+
+    # ---------- 全量扫描（加载时重建、调试时核对） ----------
+    def _scan_aggregates(self) -> dict:
+        species, rarities, weights = self._live_columns()
+        if np is not None and len(species):
+            keys = (np.frombuffer(species, dtype=np.uint16).astype(np.uint32) << 16) \
+                | np.frombuffer(rarities, dtype=np.uint16)
+            unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            weights = np.bincount(inverse, weights=np.frombuffer(weights, dtype=np.float32))
+            return {
+                (int(key) >> 16, int(key) & 0xFFFF): [int(count), float(weight)]
+                for key, count, weight in zip(unique, counts, weights)
+            }
+        agg = {}
+        for key, weight in zip(zip(species, rarities), weights):
+            entry = agg.get(key)
+            if entry is None:
+                agg[key] = [1, weight]
+            else:
+                entry[0] += 1
+                entry[1] += weight
+        return agg
+
+    def _rebuild_aggregates(self):
+        self._agg = self._scan_aggregates()
+
+    def check_consistency(self, tolerance: float = 1e-3) -> list:
+        """从头重算汇总并与增量结果比对，返回不一致的描述列表（为空表示一致）"""
+        expected = self._scan_aggregates()
+        problems = []
+        live = sum(1 for sid in self.species if sid != _DEAD_SLOT)
+        if live != self._live:
+            problems.append(f"鱼数应为 {live}，实际记录 {self._live}")
+        for key in set(expected) | set(self._agg):
+            want = expected.get(key, [0, 0.0])
+            have = self._agg.get(key, [0, 0.0])
+            if want[0] != have[0] or abs(want[1] - have[1]) > tolerance:
+                name = FISH_SPECIES[key[0]]
+                rarity = FISH_RARITIES[key[1]]
+                problems.append(f"{name}({rarity})：应为 {want[0]} 条 {want[1]:.3f}kg，"
+                                f"实际 {have[0]} 条 {have[1]:.3f}kg")
+        return problems
+
+    def assert_consistent(self):
+        problems = self.check_consistency()
+        if problems:
+            raise AssertionError("鱼袋汇总不一致：" + "；".join(problems))
+
+    @staticmethod
+    def _remap(column: array, mapping: list) -> array:
+        """按映射表批量替换编号"""
+        if np is not None and len(column):
+            lookup = np.asarray(mapping, dtype=np.uint16)
+            return array('H', lookup[np.frombuffer(column, dtype=np.uint16)].tobytes())
+        return array('H', map(mapping.__getitem__, column))
+
+    # ---------- 同步 ----------
+    def delta_ops(self, base: 'FishBag', block: int = 1024) -> list:
+        """相对 base 的鱼袋操作（日志格式）
+        鱼袋只会在末尾追加、在任意位置取出，所以按顺序对齐两边：base 中没对上的鱼记为移除，
+        多出的尾部记为追加；大段相同的部分按块整体比较跳过。移除太多时改为清空后重新追加。
+        """
+        old = base._live_columns()
+        new = self._live_columns()
+        n, m = len(old[0]), len(new[0])
+        removed = []
+        i = j = 0
+        while i < n and j < m:
+            k = min(block, n - i, m - j)
+            if old[0][i:i + k] == new[0][j:j + k] and old[2][i:i + k] == new[2][j:j + k] \
+                    and old[1][i:i + k] == new[1][j:j + k]:
+                i += k
+                j += k
+                continue
+            end = i + k
+            while i < end and j < m:
+                if old[0][i] == new[0][j] and old[1][i] == new[1][j] and old[2][i] == new[2][j]:
+                    j += 1
+                else:
+                    removed.append(i)
+                i += 1
+        removed.extend(range(i, n))
+        if len(removed) > n - len(removed):
+            ops = [['bag0']]
+            j = 0
+        else:
+            ops = [['bag-', FISH_SPECIES[old[0][slot]], round(old[2][slot], 2)] for slot in removed]
+        ops.extend(
+            ['bag+', FISH_SPECIES[new[0][slot]], round(new[2][slot], 2), FISH_RARITIES[new[1][slot]]]
+            for slot in range(j, m)
+        )
+        return ops
+
+    # ---------- 序列化 ----------
+    def to_records(self) -> list:
+        """导出为旧版存档使用的 [{name, weight, rarity}, ...] 列表"""
+        return list(self)
+
+    def to_json(self) -> dict:
+        """紧凑的列式 JSON：名称表 + base64 编码的数组列"""
+        species, rarities, weights = self._live_columns()
+        used_species = sorted(set(species))
+        used_rarities = sorted(set(rarities))
+        species_map = [0] * len(FISH_SPECIES)
+        for idx, sid in enumerate(used_species):
+            species_map[sid] = idx
+        rarity_map = [0] * len(FISH_RARITIES)
+        for idx, rid in enumerate(used_rarities):
+            rarity_map[rid] = idx
+        return {
+            'format': 'columns',
+            'species': [FISH_SPECIES[sid] for sid in used_species],
+            'rarities': [FISH_RARITIES[rid] for rid in used_rarities],
+            'species_ids': _column_to_text(self._remap(species, species_map)),
+            'rarity_ids': _column_to_text(self._remap(rarities, rarity_map)),
+            'weights': _column_to_text(weights),
+        }
+
+    def to_packed(self):
+        """紧凑存档用：返回 (鱼种名称表, 稀有度名称表, 编号列类型, 三列拼接的小端字节)"""
+        species, rarities, weights = self._live_columns()
+        used_species = sorted(set(species))
+        used_rarities = sorted(set(rarities))
+        species_map = [0] * len(FISH_SPECIES)
+        for idx, sid in enumerate(used_species):
+            species_map[sid] = idx
+        rarity_map = [0] * len(FISH_RARITIES)
+        for idx, rid in enumerate(used_rarities):
+            rarity_map[rid] = idx
+        # 名称表不超过 256 项时编号列每条只占 1 字节
+        id_type = 'B' if max(len(used_species), len(used_rarities)) <= 256 else 'H'
+        columns = [
+            array(id_type, self._remap(species, species_map)),
+            array(id_type, self._remap(rarities, rarity_map)),
+            array('f', weights),
+        ]
+        if sys.byteorder != 'little':
+            for column in columns:
+                column.byteswap()
+        return (
+            [FISH_SPECIES[sid] for sid in used_species],
+            [FISH_RARITIES[rid] for rid in used_rarities],
+            id_type,
+            b''.join(column.tobytes() for column in columns),
+        )
+
+    @classmethod
+    def from_packed(cls, species_names, rarity_names, id_type, count, payload) -> 'FishBag':
+        bag = cls()
+        id_bytes = array(id_type).itemsize * count
+        columns = [array(id_type), array(id_type), array('f')]
+        columns[0].frombytes(payload[:id_bytes])
+        columns[1].frombytes(payload[id_bytes:2 * id_bytes])
+        columns[2].frombytes(payload[2 * id_bytes:])
+        if sys.byteorder != 'little':
+            for column in columns:
+                column.byteswap()
+        bag.species = cls._remap(array('H', columns[0]), [species_id(name) for name in species_names])
+        bag.rarities = cls._remap(array('H', columns[1]), [rarity_id(rarity) for rarity in rarity_names])
+        bag.weights = columns[2]
+        bag._live = count
+        bag._rebuild_aggregates()
+        return bag
+
+    @classmethod
+    def from_records(cls, records) -> 'FishBag':
+        bag = cls()
+        for fish in records:
+            try:
+                bag.append(fish.get('name'), fish.get('weight', 0.0), fish.get('rarity', RARITY_COMMON))
+            except (AttributeError, TypeError):
+                continue
+        return bag
+
+    @classmethod
+    def from_json(cls, value) -> 'FishBag':
+        """兼容旧版的字典列表与新版的列式格式"""
+        if isinstance(value, FishBag):
+            return value
+        if isinstance(value, list):
+            return cls.from_records(value)
+        bag = cls()
+        if not isinstance(value, dict) or value.get('format') != 'columns':
+            return bag
+        species_map = [species_id(name) for name in value.get('species', [])]
+        rarity_map = [rarity_id(rarity) for rarity in value.get('rarities', [])]
+        bag.species = cls._remap(_column_from_text('H', value['species_ids']), species_map)
+        bag.rarities = cls._remap(_column_from_text('H', value['rarity_ids']), rarity_map)
+        bag.weights = _column_from_text('f', value['weights'])
+        bag._live = len(bag.species)
+        bag._rebuild_aggregates()
+        return bag
+
+
+def _json_default(value):
+    """json.dumps 的兜底序列化（鱼袋写成列式格式）"""
+    if isinstance(value, FishBag):
+        return value.to_json()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
 # ==========================
 # 统计文件管理
 # ==========================
@@ -185,7 +736,7 @@ STATS_FILE = "fishing_stats.json"
 
 def _default_inventory_state():
     return {
-        'fish_bag': [],  # 每条鱼记录 {name, weight, rarity}
+        'fish_bag': FishBag(),  # 列式鱼袋，取出时为 {name, weight, rarity}
         'money': 0,
         'exp': 0,        # 当前经验值
         'level': 1,      # 当前等级（1-10）
@@ -198,6 +749,8 @@ def _default_inventory_state():
         'gift_items': {name: 0 for name in GIFT_SHOP_ITEMS.keys()},
         'craft_items': {name: 0 for name in CRAFT_ITEMS.keys()},
         'cooked_items': {"烤鱼": 0},
+        'last_active': None,     # 最后在线的时间（游戏时钟，ISO 格式），用于离线挂机结算
+        'last_location': None,   # 离线时所在的钓鱼地点
     }
 
 def _default_student_state():
@@ -214,47 +767,1448 @@ def _default_student_state():
         'daily_request_date': None
     }
 
-def load_statistics():
-    """从文件加载统计数据"""
-    if os.path.exists(STATS_FILE):
+def _default_fish_statistics():
+    """所有已配置鱼种的空统计"""
+    stats = {}
+    for fish_list in LOCATION_FISH_CONFIG.values():
+        for fish_name, _, _, _, _, _ in fish_list:
+            stats.setdefault(fish_name, {'count': 0, 'max_weight': 0.0})
+    return stats
+
+def _merge_loaded_state(data):
+    """把读到的存档与默认值合并，返回 (鱼类统计, 背包, 林汐状态)"""
+    student_state = data.get('student_state', _default_student_state())
+    merged_state = _default_student_state()
+    merged_state.update(student_state)
+
+    inventory = data.get('inventory', _default_inventory_state())
+    merged_inventory = _default_inventory_state()
+    try:
+        # 深度合并计数字典
+        merged_inventory.update({k: v for k, v in inventory.items() if k in merged_inventory})
+        for key in ('bait_items', 'gift_items', 'craft_items', 'cooked_items'):
+            merged_inventory[key].update(inventory.get(key, {}))
+        # 鱼袋直接覆盖（兼容旧版字典列表）
+        merged_inventory['fish_bag'] = FishBag.from_json(inventory.get('fish_bag', []))
+    except Exception:
+        merged_inventory = _default_inventory_state()
+
+    return data.get('fish_statistics', {}), merged_inventory, merged_state
+
+
+# ==========================
+# 存档版本与迁移
+# ==========================
+# 存档结构（或需要补齐的默认字段）变化时：版本号加一，并登记一个从旧版本升级的迁移函数。
+# 迁移只在读到旧存档时执行一次，结果会立即写回；版本一致时直接使用文件内容，不再合并默认值。
+SAVE_SCHEMA_VERSION = 2
+SAVE_MIGRATIONS = {}  # 起始版本 -> 迁移函数（原地修改存档字典）
+
+LoadedSave = namedtuple('LoadedSave', 'fish_statistics inventory student_state seq migrated')
+
+def save_migration(from_version: int):
+    """登记从 from_version 升级到 from_version + 1 的迁移函数"""
+    def register(func):
+        SAVE_MIGRATIONS[from_version] = func
+        return func
+    return register
+
+@save_migration(0)
+def _migrate_v0_to_v1(data):
+    """v0（无版本号）：与默认值深度合并，补齐所有鱼种的统计条目"""
+    fish_statistics, inventory, student_state = _merge_loaded_state(data)
+    if not isinstance(fish_statistics, dict):
+        fish_statistics = {}
+    for fish_name, stat in _default_fish_statistics().items():
+        fish_statistics.setdefault(fish_name, stat)
+    data['fish_statistics'] = fish_statistics
+    data['inventory'] = inventory
+    data['student_state'] = student_state
+
+@save_migration(1)
+def _migrate_v1_to_v2(data):
+    """v2：背包记录最后在线时间与地点（离线挂机结算）"""
+    inventory = data.setdefault('inventory', {})
+    inventory.setdefault('last_active', None)
+    inventory.setdefault('last_location', None)
+
+def migrate_save_data(data: dict) -> bool:
+    """把存档字典升级到当前版本，返回是否执行了迁移"""
+    version = data.get('schema_version', 0)
+    if version >= SAVE_SCHEMA_VERSION:
+        return False
+    while version < SAVE_SCHEMA_VERSION:
+        SAVE_MIGRATIONS[version](data)
+        version += 1
+    data['schema_version'] = version
+    return True
+
+def _sections_from_data(data: dict):
+    """从当前版本的存档字典取出 (鱼类统计, 背包, 林汐状态)，不做任何合并"""
+    inventory = data['inventory']
+    inventory['fish_bag'] = FishBag.from_json(inventory.get('fish_bag', []))
+    return data['fish_statistics'], inventory, data['student_state']
+
+def _load_save_data(data: dict, seq: int) -> LoadedSave:
+    migrated = migrate_save_data(data)
+    return LoadedSave(*_sections_from_data(data), seq, migrated)
+
+def _new_save() -> LoadedSave:
+    return LoadedSave(_default_fish_statistics(), _default_inventory_state(), _default_student_state(), 0, False)
+
+def load_save(path=STATS_FILE) -> LoadedSave:
+    """从文件加载存档快照（必要时迁移到当前版本）"""
+    if os.path.exists(path):
         try:
-            with open(STATS_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                student_state = data.get('student_state', _default_student_state())
-                merged_state = _default_student_state()
-                merged_state.update(student_state)
-
-                inventory = data.get('inventory', _default_inventory_state())
-                merged_inventory = _default_inventory_state()
-                try:
-                    # 深度合并计数字典
-                    merged_inventory.update({k: v for k, v in inventory.items() if k in merged_inventory})
-                    for key in ('bait_items', 'gift_items', 'craft_items', 'cooked_items'):
-                        merged_inventory[key].update(inventory.get(key, {}))
-                    # 鱼袋直接覆盖
-                    merged_inventory['fish_bag'] = inventory.get('fish_bag', [])
-                except Exception:
-                    merged_inventory = _default_inventory_state()
-
-                return data.get('fish_statistics', {}), merged_inventory, merged_state
+            with open(path, 'rb') as f:
+                if f.read(len(COMPACT_MAGIC)) == COMPACT_MAGIC:
+                    f.seek(0)
+                    data = _read_compact(f, with_bag=True)
+                else:
+                    f.seek(0)
+                    data = json.loads(f.read())
+            return _load_save_data(data, data.get('journal_seq', 0))
         except Exception as e:
             print(f"加载统计数据失败: {e}")
-            return {}, _default_inventory_state(), _default_student_state()
-    return {}, _default_inventory_state(), _default_student_state()
+    return _new_save()
 
-def save_statistics(fish_statistics, inventory_state=None, student_state=None):
-    """保存统计数据到文件"""
+def load_statistics(path=STATS_FILE):
+    """从文件加载统计数据"""
+    return load_save(path)[:3]
+
+def save_statistics(fish_statistics, inventory_state=None, student_state=None, path=STATS_FILE, journal_seq=0):
+    """保存统计数据到文件（先写临时文件再替换，避免写到一半损坏存档）
+    Returns:
+        写入的字节数，失败时为 0
+    """
     try:
         data = {
             'fish_statistics': fish_statistics,
             'inventory': inventory_state or _default_inventory_state(),
             'student_state': student_state or _default_student_state(),
-            'last_update': datetime.datetime.now().isoformat()
+            'last_update': datetime.datetime.now().isoformat(),
+            'journal_seq': journal_seq,
+            'schema_version': SAVE_SCHEMA_VERSION
+        }
+        payload = json.dumps(data, ensure_ascii=False, indent=2, default=_json_default).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return len(payload)
+    except Exception as e:
+        print(f"保存统计数据失败: {e}")
+        return 0
+
+
+# ==========================
+# 紧凑存档格式（二进制 + 压缩）
+# ==========================
+# 文件布局：文件头 <4s 魔数, B 格式版本, B 压缩方式, I 头部长度>
+#           + 头部 JSON（计数、统计、林汐状态、鱼袋名称表）
+#           + 压缩后的鱼袋列（鱼种编号 | 稀有度编号 | float32 重量）
+# 头部在鱼袋之前且不压缩，读存档列表等只需要计数时不必解压鱼袋。
+SAVE_FORMAT = os.environ.get("FISHING_SAVE_FORMAT", "json")  # json / compact
+COMPACT_SUFFIX = ".sav"
+COMPACT_MAGIC = b"FSAV"
+COMPACT_VERSION = 1
+COMPACT_CODEC = "zlib"
+COMPACT_CODECS = {
+    # 名称: (编号, 压缩, 解压)
+    'none': (0, bytes, bytes),
+    'zlib': (1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (2, lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+_COMPACT_CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in COMPACT_CODECS.items()}
+_COMPACT_PREAMBLE = struct.Struct('<4sBBI')
+
+def save_compact(fish_statistics, inventory_state=None, student_state=None, path=STATS_FILE,
+                 journal_seq=0, codec=COMPACT_CODEC):
+    """以紧凑格式保存存档（同样先写临时文件再替换）
+    Returns:
+        写入的字节数，失败时为 0
+    """
+    try:
+        inventory_state = inventory_state or _default_inventory_state()
+        bag = FishBag.from_json(inventory_state.get('fish_bag', []))
+        species_names, rarity_names, id_type, columns = bag.to_packed()
+        codec_id, compress, _ = COMPACT_CODECS[codec]
+        packed = compress(columns)
+        header = {
+            'fish_statistics': fish_statistics,
+            'inventory': {key: value for key, value in inventory_state.items() if key != 'fish_bag'},
+            'student_state': student_state or _default_student_state(),
+            'last_update': datetime.datetime.now().isoformat(),
+            'journal_seq': journal_seq,
+            'schema_version': SAVE_SCHEMA_VERSION,
+            'fish_bag': {
+                'count': len(bag),
+                'species': species_names,
+                'rarities': rarity_names,
+                'id_type': id_type,
+                'size': len(packed),
+            },
         }
-        with open(STATS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_COMPACT_PREAMBLE.pack(COMPACT_MAGIC, COMPACT_VERSION, codec_id, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(packed)
+        os.replace(tmp_path, path)
+        return _COMPACT_PREAMBLE.size + len(header_bytes) + len(packed)
     except Exception as e:
         print(f"保存统计数据失败: {e}")
+        return 0
+
+def _read_compact(f, with_bag: bool) -> dict:
+    """从紧凑存档读取存档字典；with_bag=False 时只读头部，鱼袋留作名称表等元信息"""
+    magic, version, codec_id, header_size = _COMPACT_PREAMBLE.unpack(f.read(_COMPACT_PREAMBLE.size))
+    if magic != COMPACT_MAGIC or version > COMPACT_VERSION:
+        raise ValueError("不是可识别的紧凑存档")
+    data = json.loads(f.read(header_size))
+    if with_bag:
+        meta = data['inventory']['fish_bag'] = data.pop('fish_bag')
+        _, _, decompress = COMPACT_CODECS[_COMPACT_CODEC_NAMES[codec_id]]
+        payload = decompress(f.read(meta['size']))
+        data['inventory']['fish_bag'] = FishBag.from_packed(
+            meta['species'], meta['rarities'], meta['id_type'], meta['count'], payload)
+    return data
+
+def read_save_header(path) -> dict:
+    """只读取紧凑存档的头部（计数、统计、林汐状态、鱼袋条数），不解压鱼袋"""
+    with open(path, 'rb') as f:
+        return _read_compact(f, with_bag=False)
+
+
+# ==========================
+# 事件日志（追加写入 + 定期压缩）
+# ==========================
+JOURNAL_SUFFIX = ".journal"
+SYNC_STATE_SUFFIX = ".sync"  # 云端同步最近一次确认的版本向量与快照
+JOURNAL_COMPACT_BYTES = 256 * 1024  # 日志超过该大小时压缩进快照
+
+def apply_journal_ops(sections, ops):
+    """把一条日志记录里的操作重放到 {分区名: 数据} 上
+    操作格式：
+        ['set', 分区, 键, 值]        覆盖分区中的一个键
+        ['section', 分区, 值]        覆盖整个分区
+        ['bag+', 鱼名, 重量, 稀有度]  鱼袋追加一条鱼
+        ['bag-', 鱼名, 重量]         移除鱼袋中第一条匹配的鱼
+        ['bag0']                    清空鱼袋
+    """
+    for op in ops:
+        kind = op[0]
+        if kind == 'set':
+            sections[op[1]][op[2]] = op[3]
+        elif kind == 'section':
+            target = sections[op[1]]
+            target.clear()
+            target.update(op[2])
+            if op[1] == 'inventory':
+                target['fish_bag'] = FishBag.from_json(target.get('fish_bag', []))
+        elif kind == 'bag+':
+            sections['inventory']['fish_bag'].append(op[1], op[2], op[3])
+        elif kind == 'bag-':
+            sections['inventory']['fish_bag'].remove(op[1], op[2])
+        elif kind == 'bag0':
+            sections['inventory']['fish_bag'].clear()
+
+
+class SaveJournal:
+    """追加写入的事件日志文件：每行一条 JSON 记录"""
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        """读取所有完整的记录；末尾写了一半的记录会被截掉"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        records = []
+        pos = 0
+        while pos < len(data):
+            end = data.find(b'\n', pos)
+            if end < 0:
+                break
+            try:
+                records.append(json.loads(data[pos:end]))
+            except ValueError:
+                break
+            pos = end + 1
+        if pos < len(data):
+            print(f"存档日志末尾有残缺记录，已丢弃 {len(data) - pos} 字节")
+            with open(self.path, 'r+b') as f:
+                f.truncate(pos)
+        return records
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, payload: bytes):
+        with open(self.path, 'ab') as f:
+            f.write(payload)
+
+    def reset(self):
+        """快照写好后清空日志"""
+        with open(self.path, 'wb'):
+            pass
+
+
+# ==========================
+# 存档槽位索引
+# ==========================
+SLOT_INDEX_FILE = "fishing_slots.json"
+
+def slot_summary(inventory: dict, student_state: dict) -> dict:
+    """存档列表里展示的一行摘要（天数、等级、金币、林汐进度）"""
+    return {
+        'day': inventory.get('day', 1),
+        'level': inventory.get('level', 1),
+        'money': inventory.get('money', 0),
+        'last_update': datetime.datetime.now().isoformat(timespec='seconds'),
+        'student': {
+            'met': student_state.get('met', False),
+            'rescued': student_state.get('rescued', False),
+            'trust': student_state.get('trust', 0),
+        },
+    }
+
+
+class SlotIndex:
+    """所有存档槽位的摘要清单，整个清单存成一个小文件，每次更新原子替换"""
+    def __init__(self, path=SLOT_INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._slots = None  # 槽位 -> 摘要（首次访问时读取）
+
+    def _load(self) -> dict:
+        if self._slots is None:
+            self._slots = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._slots = json.load(f).get('slots', {})
+                except Exception as e:
+                    print(f"读取存档索引失败: {e}")
+        return self._slots
+
+    def entries(self) -> dict:
+        with self._lock:
+            return dict(self._load())
+
+    def update(self, profile: str, summary: dict):
+        with self._lock:
+            self._load()[profile] = summary
+            self._write()
+
+    def remove(self, profile: str):
+        with self._lock:
+            if self._load().pop(profile, None) is not None:
+                self._write()
+
+    def _write(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'slots': self._slots}, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"保存存档索引失败: {e}")
+
+
+# ==========================
+# 存档后端（JSON 文件 / SQLite）
+# ==========================
+DEFAULT_PROFILE = "default"
+
+class SaveStorage:
+    """存档后端接口
+    load 返回 LoadedSave（各分区、已落盘的日志序号、是否刚做过版本迁移）；
+    append 接收写入器合并好的日志记录 {'seq', 'ops', 'ev'}，返回写入量；
+    write_snapshot 写入完整状态。compacts 为 True 的后端需要定期压缩。
+    update_slot / list_slots 维护存档列表用的摘要，列出槽位时不读取完整存档。
+    load_sync_state / save_sync_state 保存云端同步最近一次确认的版本向量与快照（JSON 化的字典）。
+    """
+    compacts = False
+
+    def load(self, profile=DEFAULT_PROFILE):
+        raise NotImplementedError
+
+    def append(self, profile, records) -> int:
+        raise NotImplementedError
+
+    def write_snapshot(self, profile, snapshot, seq) -> int:
+        raise NotImplementedError
+
+    def pending_bytes(self, profile=DEFAULT_PROFILE) -> int:
+        """自上次快照以来累积的日志大小"""
+        return 0
+
+    def list_profiles(self):
+        raise NotImplementedError
+
+    def update_slot(self, profile, summary):
+        raise NotImplementedError
+
+    def list_slots(self) -> dict:
+        """槽位 -> 摘要"""
+        raise NotImplementedError
+
+    def delete_slot(self, profile):
+        raise NotImplementedError
+
+    def load_sync_state(self, profile=DEFAULT_PROFILE):
+        """没有记录时为 None"""
+        return None
+
+    def save_sync_state(self, profile, state):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonFileStorage(SaveStorage):
+    """文件快照 + 追加日志，每个存档档案一个文件（默认档案沿用 fishing_stats.json）
+    save_format 为 'compact' 时快照写成紧凑格式（.sav），日志仍为 JSON 行；
+    读取时两种格式都认，写出新格式的快照后删除旧格式的文件。
+    """
+    compacts = True
+
+    def __init__(self, directory=".", save_format=SAVE_FORMAT):
+        self.directory = directory
+        self.save_format = save_format
+        self.index = SlotIndex(os.path.join(directory, SLOT_INDEX_FILE))
+
+    def _json_path(self, profile) -> str:
+        if profile == DEFAULT_PROFILE:
+            return os.path.join(self.directory, STATS_FILE)
+        return os.path.join(self.directory, f"fishing_stats_{profile}.json")
+
+    def _compact_path(self, profile) -> str:
+        return os.path.splitext(self._json_path(profile))[0] + COMPACT_SUFFIX
+
+    def path_for(self, profile=DEFAULT_PROFILE) -> str:
+        if self.save_format == "compact":
+            return self._compact_path(profile)
+        return self._json_path(profile)
+
+    def _existing_path(self, profile) -> str:
+        """优先当前格式的快照，没有时退回另一种格式"""
+        path = self.path_for(profile)
+        if not os.path.exists(path):
+            for other in (self._json_path(profile), self._compact_path(profile)):
+                if os.path.exists(other):
+                    return other
+        return path
+
+    def _journal(self, profile) -> SaveJournal:
+        return SaveJournal(self._json_path(profile) + JOURNAL_SUFFIX)
+
+    def load(self, profile=DEFAULT_PROFILE):
+        loaded = load_save(self._existing_path(profile))
+        sections = {
+            'fish_statistics': loaded.fish_statistics,
+            'inventory': loaded.inventory,
+            'student_state': loaded.student_state,
+        }
+        seq = loaded.seq
+        for record in self._journal(profile).read():
+            if record.get('seq', 0) <= seq:
+                continue
+            apply_journal_ops(sections, record.get('ops', []))
+            seq = record['seq']
+        return loaded._replace(seq=seq)
+
+    def append(self, profile, records) -> int:
+        payload = b''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+            + b'\n'
+            for record in records
+        )
+        self._journal(profile).append(payload)
+        return len(payload)
+
+    def write_snapshot(self, profile, snapshot, seq) -> int:
+        save = save_compact if self.save_format == "compact" else save_statistics
+        written = save(
+            snapshot['fish_statistics'], snapshot['inventory'], snapshot['student_state'],
+            path=self.path_for(profile), journal_seq=seq
+        )
+        if written:
+            # 快照已包含这些记录；即使清空前崩溃，重放时也会按序号跳过
+            self._journal(profile).reset()
+            for other in (self._json_path(profile), self._compact_path(profile)):
+                if other != self.path_for(profile) and os.path.exists(other):
+                    os.remove(other)
+        return written
+
+    def export_json(self, profile, out_path) -> int:
+        """把档案（快照 + 日志）导出为普通 JSON 存档"""
+        loaded = self.load(profile)
+        return save_statistics(loaded.fish_statistics, loaded.inventory, loaded.student_state,
+                               path=out_path, journal_seq=loaded.seq)
+
+    def pending_bytes(self, profile=DEFAULT_PROFILE) -> int:
+        return self._journal(profile).size()
+
+    def list_profiles(self):
+        profiles = []
+        default_names = (STATS_FILE, os.path.splitext(STATS_FILE)[0] + COMPACT_SUFFIX)
+        for name in sorted(os.listdir(self.directory or ".")):
+            if name in default_names:
+                profile = DEFAULT_PROFILE
+            elif name.startswith("fishing_stats_") and name.endswith((".json", COMPACT_SUFFIX)):
+                profile = os.path.splitext(name)[0][len("fishing_stats_"):]
+            else:
+                continue
+            if profile not in profiles:
+                profiles.append(profile)
+        return profiles
+
+    def update_slot(self, profile, summary):
+        self.index.update(profile, summary)
+
+    def list_slots(self) -> dict:
+        slots = self.index.entries()
+        missing = [profile for profile in self.list_profiles() if profile not in slots]
+        for profile in missing:
+            # 索引出现之前的旧存档：读一次存档补上摘要（紧凑格式只读头部）
+            path = self._existing_path(profile)
+            if path.endswith(COMPACT_SUFFIX) and not self._journal(profile).size():
+                data = read_save_header(path)
+                slots[profile] = slot_summary(data['inventory'], data['student_state'])
+            else:
+                loaded = self.load(profile)
+                slots[profile] = slot_summary(loaded.inventory, loaded.student_state)
+            self.index.update(profile, slots[profile])
+        return slots
+
+    def delete_slot(self, profile):
+        for path in (self._json_path(profile), self._compact_path(profile),
+                     self._json_path(profile) + JOURNAL_SUFFIX, self._json_path(profile) + SYNC_STATE_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
+        self.index.remove(profile)
+
+    def load_sync_state(self, profile=DEFAULT_PROFILE):
+        path = self._json_path(profile) + SYNC_STATE_SUFFIX
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取同步状态失败: {e}")
+            return None
+
+    def save_sync_state(self, profile, state):
+        path = self._json_path(profile) + SYNC_STATE_SUFFIX
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"保存同步状态失败: {e}")
+
+
+class SqliteStorage(SaveStorage):
+    """SQLite 后端：多个档案共用一个数据库，按行存储，每次只改动变化的行"""
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS profiles ("
+        " profile TEXT PRIMARY KEY, seq INTEGER NOT NULL DEFAULT 0, last_update TEXT,"
+        " schema_version INTEGER NOT NULL DEFAULT 0)",
+        "CREATE TABLE IF NOT EXISTS fish_statistics ("
+        " profile TEXT NOT NULL, name TEXT NOT NULL, count INTEGER NOT NULL, max_weight REAL NOT NULL,"
+        " PRIMARY KEY (profile, name)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS fish_bag ("
+        " id INTEGER PRIMARY KEY, profile TEXT NOT NULL, name TEXT NOT NULL,"
+        " weight REAL NOT NULL, rarity TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS fish_bag_profile_name ON fish_bag (profile, name, weight)",
+        "CREATE TABLE IF NOT EXISTS counters ("
+        " profile TEXT NOT NULL, key TEXT NOT NULL, value TEXT,"
+        " PRIMARY KEY (profile, key)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS student_state ("
+        " profile TEXT NOT NULL, key TEXT NOT NULL, value TEXT,"
+        " PRIMARY KEY (profile, key)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS slots (profile TEXT PRIMARY KEY, summary TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS sync_state (profile TEXT PRIMARY KEY, state TEXT NOT NULL)",
+    )
+    # 固定的 SQL 文本，sqlite3 模块会缓存它们的预编译语句
+    SQL_UPSERT_PROFILE = (
+        "INSERT INTO profiles (profile, seq, last_update, schema_version) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (profile) DO UPDATE SET seq = excluded.seq, last_update = excluded.last_update,"
+        " schema_version = excluded.schema_version"
+    )
+    SQL_UPSERT_FISH_STAT = (
+        "INSERT INTO fish_statistics (profile, name, count, max_weight) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (profile, name) DO UPDATE SET count = excluded.count, max_weight = excluded.max_weight"
+    )
+    SQL_UPSERT_COUNTER = (
+        "INSERT INTO counters (profile, key, value) VALUES (?, ?, ?) "
+        "ON CONFLICT (profile, key) DO UPDATE SET value = excluded.value"
+    )
+    SQL_UPSERT_STUDENT = (
+        "INSERT INTO student_state (profile, key, value) VALUES (?, ?, ?) "
+        "ON CONFLICT (profile, key) DO UPDATE SET value = excluded.value"
+    )
+    SQL_UPSERT_SLOT = (
+        "INSERT INTO slots (profile, summary) VALUES (?, ?) "
+        "ON CONFLICT (profile) DO UPDATE SET summary = excluded.summary"
+    )
+    SQL_UPSERT_SYNC = (
+        "INSERT INTO sync_state (profile, state) VALUES (?, ?) "
+        "ON CONFLICT (profile) DO UPDATE SET state = excluded.state"
+    )
+    SQL_INSERT_FISH = "INSERT INTO fish_bag (profile, name, weight, rarity) VALUES (?, ?, ?, ?)"
+    SQL_REMOVE_FISH = (
+        "DELETE FROM fish_bag WHERE id = (SELECT id FROM fish_bag "
+        "WHERE profile = ? AND name = ? AND weight = ? ORDER BY id LIMIT 1)"
+    )
+
+    def __init__(self, path="fishing_stats.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            self._conn.execute(statement)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(profiles)")]
+        if 'schema_version' not in columns:
+            # 早期数据库没有版本列，读档时按 v0 迁移
+            self._conn.execute("ALTER TABLE profiles ADD COLUMN schema_version INTEGER NOT NULL DEFAULT 0")
+
+    def load(self, profile=DEFAULT_PROFILE):
+        with self._lock:
+            conn = self._conn
+            row = conn.execute(
+                "SELECT seq, schema_version FROM profiles WHERE profile = ?", (profile,)).fetchone()
+            if row is None:
+                return _new_save()
+            fish_statistics = {
+                name: {'count': count, 'max_weight': max_weight}
+                for name, count, max_weight in conn.execute(
+                    "SELECT name, count, max_weight FROM fish_statistics WHERE profile = ?", (profile,))
+            }
+            inventory = {key: json.loads(value) for key, value in conn.execute(
+                "SELECT key, value FROM counters WHERE profile = ?", (profile,))}
+            inventory['fish_bag'] = FishBag()
+            for name, weight, rarity in conn.execute(
+                    "SELECT name, weight, rarity FROM fish_bag WHERE profile = ? ORDER BY id", (profile,)):
+                inventory['fish_bag'].append(name, weight, rarity)
+            student_state = {key: json.loads(value) for key, value in conn.execute(
+                "SELECT key, value FROM student_state WHERE profile = ?", (profile,))}
+        data = {
+            'fish_statistics': fish_statistics,
+            'inventory': inventory,
+            'student_state': student_state,
+            'schema_version': row[1],
+        }
+        return _load_save_data(data, row[0])
+
+    def append(self, profile, records) -> int:
+        with self._lock:
+            conn = self._conn
+            before = conn.total_changes
+            conn.execute("BEGIN")
+            try:
+                for record in records:
+                    self._apply_ops(profile, record.get('ops', []))
+                conn.execute(self.SQL_UPSERT_PROFILE, (
+                    profile, records[-1]['seq'], datetime.datetime.now().isoformat(), SAVE_SCHEMA_VERSION
+                ))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return conn.total_changes - before
+
+    def write_snapshot(self, profile, snapshot, seq) -> int:
+        with self._lock:
+            conn = self._conn
+            before = conn.total_changes
+            conn.execute("BEGIN")
+            try:
+                for section in STATS_SECTIONS:
+                    self._replace_section(profile, section, snapshot[section])
+                conn.execute(self.SQL_UPSERT_PROFILE,
+                             (profile, seq, datetime.datetime.now().isoformat(), SAVE_SCHEMA_VERSION))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return conn.total_changes - before
+
+    def list_profiles(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT profile FROM profiles ORDER BY profile")]
+
+    def update_slot(self, profile, summary):
+        with self._lock:
+            self._conn.execute(self.SQL_UPSERT_SLOT, (profile, json.dumps(summary, ensure_ascii=False)))
+
+    def list_slots(self) -> dict:
+        with self._lock:
+            slots = {profile: json.loads(summary) for profile, summary in self._conn.execute(
+                "SELECT profile, summary FROM slots ORDER BY profile")}
+            missing = [row[0] for row in self._conn.execute(
+                "SELECT profile FROM profiles WHERE profile NOT IN (SELECT profile FROM slots)")]
+        for profile in missing:
+            loaded = self.load(profile)
+            slots[profile] = slot_summary(loaded.inventory, loaded.student_state)
+            self.update_slot(profile, slots[profile])
+        return slots
+
+    def delete_slot(self, profile):
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                for table in ('profiles', 'fish_statistics', 'fish_bag', 'counters', 'student_state', 'slots',
+                              'sync_state'):
+                    conn.execute(f"DELETE FROM {table} WHERE profile = ?", (profile,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def load_sync_state(self, profile=DEFAULT_PROFILE):
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM sync_state WHERE profile = ?", (profile,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_sync_state(self, profile, state):
+        text = json.dumps(state, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+        with self._lock:
+            self._conn.execute(self.SQL_UPSERT_SYNC, (profile, text))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _apply_ops(self, profile, ops):
+        conn = self._conn
+        for op in ops:
+            kind = op[0]
+            if kind == 'set':
+                self._set_value(profile, op[1], op[2], op[3])
+            elif kind == 'section':
+                self._replace_section(profile, op[1], op[2])
+            elif kind == 'bag+':
+                conn.execute(self.SQL_INSERT_FISH, (profile, op[1], op[2], op[3]))
+            elif kind == 'bag-':
+                conn.execute(self.SQL_REMOVE_FISH, (profile, op[1], op[2]))
+            elif kind == 'bag0':
+                conn.execute("DELETE FROM fish_bag WHERE profile = ?", (profile,))
+
+    def _set_value(self, profile, section, key, value):
+        if section == 'fish_statistics':
+            self._conn.execute(self.SQL_UPSERT_FISH_STAT,
+                               (profile, key, value.get('count', 0), value.get('max_weight', 0.0)))
+        elif section == 'inventory':
+            self._conn.execute(self.SQL_UPSERT_COUNTER, (profile, key, json.dumps(value, ensure_ascii=False)))
+        elif section == 'student_state':
+            self._conn.execute(self.SQL_UPSERT_STUDENT, (profile, key, json.dumps(value, ensure_ascii=False)))
+
+    def _replace_section(self, profile, section, data):
+        conn = self._conn
+        if section == 'fish_statistics':
+            conn.execute("DELETE FROM fish_statistics WHERE profile = ?", (profile,))
+            conn.executemany(self.SQL_UPSERT_FISH_STAT, [
+                (profile, name, stat.get('count', 0), stat.get('max_weight', 0.0)) for name, stat in data.items()
+            ])
+        elif section == 'inventory':
+            conn.execute("DELETE FROM counters WHERE profile = ?", (profile,))
+            conn.execute("DELETE FROM fish_bag WHERE profile = ?", (profile,))
+            conn.executemany(self.SQL_UPSERT_COUNTER, [
+                (profile, key, json.dumps(value, ensure_ascii=False))
+                for key, value in data.items() if key != 'fish_bag'
+            ])
+            conn.executemany(self.SQL_INSERT_FISH, [
+                (profile, fish.get('name'), fish.get('weight', 0.0), fish.get('rarity', RARITY_COMMON))
+                for fish in data.get('fish_bag', [])
+            ])
+        elif section == 'student_state':
+            conn.execute("DELETE FROM student_state WHERE profile = ?", (profile,))
+            conn.executemany(self.SQL_UPSERT_STUDENT, [
+                (profile, key, json.dumps(value, ensure_ascii=False)) for key, value in data.items()
+            ])
+
+
+# ==========================
+# 存档写入器（脏标记 + 合并写入）
+# ==========================
+STATS_SECTIONS = ('fish_statistics', 'inventory', 'student_state')
+SAVE_INTERVAL = 1.0   # 两次落盘之间的最短间隔（秒）
+SAVE_TICK_MS = 200    # UI 检查脏数据的节拍（毫秒）
+
+def _snapshot_value(value):
+    """复制可 JSON 化的嵌套结构，交给后台线程时不再与主线程共享可变对象"""
+    if isinstance(value, dict):
+        return {k: _snapshot_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_snapshot_value(v) for v in value]
+    if isinstance(value, FishBag):
+        return value.copy()
+    return value
+
+
+class StatsPersister:
+    """存档写入器
+    各个修改操作只登记变化的键和鱼袋操作，写入器在每个节拍（或间隔到达时）把它们合并成
+    一条日志记录交给存档后端（JSON 后端追加到日志文件，SQLite 后端只改动对应的行），
+    写入量与存档大小无关；需要压缩的后端在日志超过阈值时由后台线程写出完整快照。
+    """
+    def __init__(self, source, storage=None, profile=DEFAULT_PROFILE, interval=SAVE_INTERVAL,
+                 write_behind=True, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.source = source  # 返回 {分区名: 当前数据} 的函数
+        self.storage = storage if storage is not None else JsonFileStorage()
+        self.profile = profile
+        self.interval = interval
+        self.write_behind = write_behind  # False 时每次登记立即同步写入
+        self.compact_bytes = compact_bytes
+        self.seq = 0  # 最近一条日志记录的序号
+        self._journal_bytes = 0  # 自上次快照以来追加的写入量（由写入线程维护）
+        self._snapshot_pending = False
+        self._dirty = set()      # 整个分区变脏
+        self._dirty_keys = {}    # 分区 -> 变化的键
+        self._bag_ops = []
+        self._events = []
+        self._last_flush = None
+        self._last_slot = None  # 最近一次写进索引的槽位摘要
+        self._batch_depth = 0  # transaction() 嵌套层数，期间不立即写入
+        self._cond = threading.Condition()
+        self._tasks = []  # 等待后台执行的写入任务
+        self._writing = False
+        self._worker = None
+        # 统计信息（用于基准测试）
+        self.flush_count = 0
+        self.bytes_written = 0  # 写入量：JSON 后端为字节数，SQLite 后端为改动的行数
+        self.compactions = 0
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty or self._dirty_keys or self._bag_ops)
+
+    def load(self) -> LoadedSave:
+        """从存档后端加载（旧版本存档在此迁移）"""
+        loaded = self.storage.load(self.profile)
+        self.seq = loaded.seq
+        self._journal_bytes = self.storage.pending_bytes(self.profile)
+        return loaded
+
+    def mark_dirty(self, *sections):
+        """标记整个分区为脏，不传参数表示全部分区"""
+        self._dirty.update(sections or STATS_SECTIONS)
+        if not self.write_behind and not self._batch_depth:
+            self.flush()
+
+    def mark_keys(self, section: str, *keys):
+        """登记分区中变化的键"""
+        self._dirty_keys.setdefault(section, set()).update(keys)
+        if not self.write_behind and not self._batch_depth:
+            self.flush()
+
+    def record_bag_op(self, *op):
+        """登记一次鱼袋操作（追加/移除/清空）"""
+        self._bag_ops.append(list(op))
+        if not self.write_behind and not self._batch_depth:
+            self.flush()
+
+    def note_event(self, name: str):
+        """给下一条日志记录打上事件标签（钓到、卖出、购买等）"""
+        self._events.append(name)
+
+    @contextmanager
+    def transaction(self):
+        """期间登记的所有变化合并成一条日志记录
+        同步写入（write_behind=False）时退出后写出一次；write-behind 时照常留给节拍按 SAVE_INTERVAL 合并。
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and not self.write_behind:
+                self.flush()
+
+    def tick(self, now=None) -> bool:
+        """节拍检查：有脏数据且距上次落盘超过间隔时写入一次"""
+        if not self.dirty:
+            return False
+        now = time.monotonic() if now is None else now
+        if self._last_flush is not None and now - self._last_flush < self.interval:
+            return False
+        self.flush()
+        return True
+
+    def flush(self, wait: bool = False):
+        """立即把登记的变化写出；wait=True 时等待后台写入完成"""
+        if self.dirty:
+            tasks = [('append', self._take_record())]
+            if (self.storage.compacts and not self._snapshot_pending
+                    and self._journal_bytes >= self.compact_bytes):
+                tasks.append(self._snapshot_task())
+            slot_task = self._slot_task()
+            if slot_task is not None:
+                tasks.append(slot_task)
+            self._last_flush = time.monotonic()
+            self._submit(tasks)
+        if wait:
+            self.wait_idle()
+
+    def compact(self, wait: bool = False):
+        """把当前完整状态写成快照（JSON 后端会清空日志）"""
+        self.flush()
+        self._submit([self._snapshot_task(), self._slot_task(force=True)])
+        if wait:
+            self.wait_idle()
+
+    def wait_idle(self):
+        """等待后台线程执行完所有已提交的写入"""
+        with self._cond:
+            while self._tasks or self._writing:
+                self._cond.wait()
+
+    def close(self):
+        """最终落盘（退出游戏时调用）：写出剩余变化，日志非空时顺便压缩"""
+        self.flush(wait=True)
+        if self.storage.compacts and self._journal_bytes > 0:
+            self.compact(wait=True)
+
+    def _take_record(self):
+        sections = self.source()
+        # 鱼袋操作在前，整体覆盖的分区在最后，重放顺序与实际修改一致
+        ops = list(self._bag_ops)
+        for section, keys in self._dirty_keys.items():
+            if section in self._dirty:
+                continue
+            data = sections[section]
+            for key in keys:
+                ops.append(['set', section, key, _snapshot_value(data.get(key))])
+        for section in self._dirty:
+            ops.append(['section', section, _snapshot_value(sections[section])])
+        self.seq += 1
+        record = {'seq': self.seq, 'ops': ops}
+        if self._events:
+            record['ev'] = self._events
+        self._dirty = set()
+        self._dirty_keys = {}
+        self._bag_ops = []
+        self._events = []
+        return record
+
+    def _snapshot_task(self):
+        sections = self.source()
+        snapshot = {name: _snapshot_value(sections[name]) for name in STATS_SECTIONS}
+        self._snapshot_pending = True
+        return ('snapshot', snapshot, self.seq)
+
+    def _slot_task(self, force=False):
+        """槽位摘要有变化（不算保存时间）时才更新索引"""
+        sections = self.source()
+        summary = slot_summary(sections['inventory'], sections['student_state'])
+        key = {k: v for k, v in summary.items() if k != 'last_update'}
+        if not force and key == self._last_slot:
+            return None
+        self._last_slot = key
+        return ('slot', summary)
+
+    def _submit(self, tasks):
+        if not self.write_behind:
+            self._execute(tasks)
+            return
+        with self._cond:
+            self._tasks.extend(tasks)
+            self._ensure_worker()
+            self._cond.notify_all()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="stats-writer", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._tasks:
+                    self._cond.wait()
+                tasks, self._tasks = self._tasks, []
+                self._writing = True
+            try:
+                self._execute(tasks)
+            except Exception as e:
+                print(f"保存统计数据失败: {e}")
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _execute(self, tasks):
+        """按顺序执行写入任务，连续的日志记录合并成一次写入，槽位摘要只写最新的一份"""
+        records = []
+        summary = None
+        for task in tasks:
+            if task[0] == 'append':
+                records.append(task[1])
+                continue
+            if task[0] == 'slot':
+                summary = task[1]
+                continue
+            if records:
+                self._append(records)
+                records = []
+            _, snapshot, seq = task
+            written = self.storage.write_snapshot(self.profile, snapshot, seq)
+            with self._cond:
+                self.flush_count += 1
+                self.bytes_written += written
+                self.compactions += 1
+                self._journal_bytes = 0
+                self._snapshot_pending = False
+        if records:
+            self._append(records)
+        if summary is not None:
+            self.storage.update_slot(self.profile, summary)
+
+    def _append(self, records):
+        written = self.storage.append(self.profile, records)
+        with self._cond:
+            self.flush_count += 1
+            self.bytes_written += written
+            self._journal_bytes += written
+
+
+# ==========================
+# 云端同步（增量上传 + 版本向量）
+# ==========================
+SYNC_URL = os.environ.get("FISHING_SYNC_URL")  # 例如 http://127.0.0.1:8765，未设置时不同步
+SYNC_INTERVAL = 30.0      # 两次上传之间的最短间隔（秒），期间的改动合并成一批
+SYNC_TIMEOUT = 5.0
+SYNC_MAX_RETRIES = 5
+SYNC_BACKOFF = 0.5        # 首次重试等待（秒），之后翻倍并加随机抖动
+SYNC_BACKOFF_MAX = 30.0
+
+def compute_save_delta(base: dict, current: dict) -> list:
+    """比较上次确认的快照与当前状态，返回日志格式的操作列表（可直接交给 apply_journal_ops）
+    普通分区逐键比较，只发送变化的键；鱼袋按 FishBag.delta_ops 计算追加与移除。
+    """
+    ops = []
+    for section in STATS_SECTIONS:
+        old = base.get(section)
+        new = current[section]
+        if old is None or any(key not in new for key in old):
+            ops.append(['section', section, _snapshot_value(new)])
+            continue
+        for key, value in new.items():
+            if key == 'fish_bag':
+                continue
+            if key not in old or old[key] != value:
+                ops.append(['set', section, key, _snapshot_value(value)])
+        if section == 'inventory':
+            ops.extend(new['fish_bag'].delta_ops(old['fish_bag']))
+    return ops
+
+SYNC_MAX_KEYS = frozenset(('level', 'day', 'last_level_up_day', 'max_weight'))  # 只增不减的值，冲突时取较大者
+SYNC_MERGE_ATTEMPTS = 3  # 合并后再次上传仍冲突（又有设备写入）时最多重新合并几次
+_MISSING = object()
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _merge_value(key, base, local, server):
+    """三方合并一个值：只有一边改过时取改过的一边；两边都改过时
+    数值按「服务器 + 本机的增量」合并（SYNC_MAX_KEYS 与没有共同快照时取较大者），
+    字典逐键合并，列表取并集，布尔值任一为真即为真，其余以本机为准。
+    """
+    if local is _MISSING:
+        return server
+    if server is _MISSING or local == server:
+        return local
+    if base is not _MISSING:
+        if local == base:
+            return server
+        if server == base:
+            return local
+    if isinstance(local, dict) and isinstance(server, dict):
+        base = base if isinstance(base, dict) else {}
+        keys = list(local) + [k for k in server if k not in local]
+        return {k: _merge_value(k, base.get(k, _MISSING), local.get(k, _MISSING), server.get(k, _MISSING))
+                for k in keys}
+    if _is_number(local) and _is_number(server):
+        if key in SYNC_MAX_KEYS or not _is_number(base):
+            return max(local, server)
+        value = server + (local - base)
+        if min(local, server, base) >= 0:
+            value = max(value, 0)
+        return round(value, 2) if isinstance(value, float) else value
+    if isinstance(local, bool) and isinstance(server, bool):
+        return local or server
+    if isinstance(local, list) and isinstance(server, list):
+        return local + [item for item in server if item not in local]
+    return local
+
+def _merge_fish_bag(base, local: 'FishBag', server: 'FishBag') -> 'FishBag':
+    """以服务器的鱼袋为准，重放本机相对共同快照新钓到和取出的鱼；没有共同快照时取两边的并集"""
+    fish_key = lambda fish: (fish['name'], round(fish['weight'], 2), fish['rarity'])
+    local_counts = Counter(map(fish_key, local))
+    if base is None:
+        added, removed = local_counts - Counter(map(fish_key, server)), Counter()
+    else:
+        base_counts = Counter(map(fish_key, base))
+        added, removed = local_counts - base_counts, base_counts - local_counts
+    merged = server.copy()
+    for (name, weight, _), count in removed.items():
+        for _ in range(count):
+            merged.remove(name, weight)
+    for fish in local:
+        key = fish_key(fish)
+        if added[key] > 0:
+            added[key] -= 1
+            merged.append(key[0], key[1], key[2])
+    return merged
+
+def merge_save_states(base: dict, local: dict, server: dict) -> dict:
+    """把本机相对 base（上次确认的快照，没有时为空字典）的改动合并到服务器的存档上，返回合并后的各分区"""
+    merged = {}
+    for section in STATS_SECTIONS:
+        old = base.get(section) or {}
+        new, remote = local[section], server[section]
+        data = merged[section] = {}
+        for key in list(new) + [k for k in remote if k not in new]:
+            if key == 'fish_bag':
+                data[key] = _merge_fish_bag(old.get(key), new[key], remote.get(key, FishBag()))
+            else:
+                data[key] = _merge_value(key, old.get(key, _MISSING), new.get(key, _MISSING),
+                                         remote.get(key, _MISSING))
+    return merged
+
+def sync_sections_from_json(data: dict) -> dict:
+    """JSON 形式的各分区（服务器应答或保存的同步快照）转回内存格式（鱼袋为 FishBag）"""
+    sections = {section: dict(data.get(section) or {}) for section in STATS_SECTIONS}
+    if 'fish_bag' in sections['inventory']:
+        sections['inventory']['fish_bag'] = FishBag.from_json(sections['inventory']['fish_bag'])
+    return sections
+
+def merge_version_vectors(a: dict, b: dict) -> dict:
+    merged = dict(a)
+    for device, counter in b.items():
+        merged[device] = max(merged.get(device, 0), counter)
+    return merged
+
+def vector_dominates(a: dict, b: dict) -> bool:
+    """a 是否已包含 b 的全部更新"""
+    return all(a.get(device, 0) >= counter for device, counter in b.items())
+
+
+class SyncError(Exception):
+    pass
+
+
+class SyncClient:
+    """把存档增量同步到远端
+    每个节拍（间隔到达时）在主线程比较「上次确认的快照」与当前状态得到增量，交给后台线程
+    上传；失败时指数退避重试。服务器用版本向量判断冲突：本机看到的向量不包含服务器上的
+    全部更新时返回 409，此时取回服务器的完整存档，与本机相对上次确认快照的改动三方合并
+    （merge_save_states），只上传合并结果相对服务器的增量；合并结果在下一个节拍由主线程
+    通过 apply 回调应用到本机存档，期间本机的新改动照常保留。
+    确认的版本向量与快照随存档保存在 storage 里，重新启动后直接从增量开始。
+    """
+    def __init__(self, source, profile=DEFAULT_PROFILE, url=SYNC_URL, device_id=None,
+                 interval=SYNC_INTERVAL, max_retries=SYNC_MAX_RETRIES, backoff=SYNC_BACKOFF,
+                 timeout=SYNC_TIMEOUT, background=True, storage=None, apply=None):
+        self.source = source  # 返回 {分区名: 当前数据} 的函数
+        self.apply = apply    # apply(ops)：把合并回来的改动（日志格式）应用到本机存档，在调用 tick 的线程里执行
+        self.storage = storage  # 保存确认的版本向量与快照；None 时只保存在内存里
+        self.profile = profile
+        self.url = url.rstrip('/')
+        self.device_id = device_id or f"{uuid.getnode():012x}"  # 本机固定的设备编号
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.background = background  # False 时在调用线程里同步上传（基准测试用）
+        self.vector = {}     # 最近一次确认时服务器的版本向量
+        self._base = {}      # 最近一次确认的快照
+        self._merged = None  # (上传时的本机快照, 合并结果)，等主线程应用到本机存档
+        saved = storage.load_sync_state(profile) if storage is not None else None
+        if saved:
+            self.vector = saved.get('vector', {})
+            self._base = sync_sections_from_json(saved.get('base', {}))
+        self._last_sync = None
+        self._cond = threading.Condition()
+        self._busy = False
+        self._rng = random.Random()
+        # 统计信息（用于基准测试）
+        self.requests = 0
+        self.batches = 0
+        self.retries = 0
+        self.conflicts = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def tick(self, now=None) -> bool:
+        """节拍检查：距上次上传超过间隔且没有上传在进行时发送一批增量"""
+        now = time.monotonic() if now is None else now
+        if self._last_sync is not None and now - self._last_sync < self.interval:
+            return False
+        return self.sync()
+
+    def sync(self, wait: bool = False) -> bool:
+        """计算增量并上传；上一批还没完成时跳过，改动留到下一批"""
+        with self._cond:
+            if self._busy:
+                if wait:
+                    self.wait_idle()
+                return False
+            if self._merged is not None:
+                self._apply_merged()
+            current = {name: _snapshot_value(data) for name, data in self.source().items()}
+            ops = compute_save_delta(self._base, current)
+            self._last_sync = time.monotonic()
+            if not ops:
+                return False
+            self._busy = True
+        if self.background:
+            threading.Thread(target=self._run, args=(current, ops), name="sync-upload", daemon=True).start()
+            if wait:
+                self.wait_idle()
+        else:
+            self._run(current, ops)
+        return True
+
+    def _apply_merged(self):
+        """把冲突合并的结果应用到本机存档，上传之后本机的新改动以合并结果为基础重放"""
+        uploaded, merged = self._merged
+        self._merged = None
+        if self.apply is None:
+            return
+        current = {name: _snapshot_value(data) for name, data in self.source().items()}
+        ops = compute_save_delta(current, merge_save_states(uploaded, current, merged))
+        if ops:
+            self.apply(ops)
+
+    def wait_idle(self):
+        with self._cond:
+            while self._busy:
+                self._cond.wait()
+
+    def close(self):
+        """退出前把剩余改动同步一次"""
+        self.wait_idle()
+        self.sync(wait=True)
+
+    def _run(self, current, ops):
+        try:
+            self._upload(current, ops)
+        except SyncError as e:
+            self.failures += 1
+            print(f"同步存档失败: {e}")
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _upload(self, current, ops):
+        self.batches += 1
+        status, reply = self._post({'device': self.device_id, 'vector': self.vector, 'ops': ops})
+        merged = current
+        for _ in range(SYNC_MERGE_ATTEMPTS):
+            if status != 409:
+                break
+            # 其他设备在此期间写过：取回服务器的存档，与本机改动合并后只上传合并结果的增量
+            self.conflicts += 1
+            status, remote = self._fetch()
+            if status != 200:
+                break
+            server = sync_sections_from_json(remote.get('state', {}))
+            merged = merge_save_states(self._base, current, server)
+            status, reply = self._post({'device': self.device_id, 'vector': remote.get('vector', {}),
+                                        'ops': compute_save_delta(server, merged)})
+        if status != 200:
+            raise SyncError(f"服务器返回 {status}")
+        self.vector = reply['vector']
+        self._base = merged
+        if merged is not current:
+            self._merged = (current, merged)
+        if self.storage is not None:
+            self.storage.save_sync_state(self.profile, {'vector': self.vector, 'base': merged})
+
+    def _sync_url(self) -> str:
+        return f"{self.url}/sync/{urllib.parse.quote(self.profile)}"
+
+    def _fetch(self):
+        """取回服务器上的完整存档与版本向量，返回 (状态码, 应答)"""
+        return self._send(urllib.request.Request(self._sync_url(), method="GET"), 0)
+
+    def _post(self, payload: dict):
+        """发送一批操作，返回 (状态码, 应答)"""
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'),
+                          default=_json_default).encode('utf-8')
+        request = urllib.request.Request(
+            self._sync_url(), data=body, method="POST", headers={'Content-Type': 'application/json'}
+        )
+        return self._send(request, len(body))
+
+    def _send(self, request, size: int):
+        """发送请求，网络错误与 5xx 时指数退避重试，返回 (状态码, 应答)"""
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            self.bytes_sent += size
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    data = response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                data = e.read()
+                status = e.code
+            except (urllib.error.URLError, OSError) as e:
+                status, data = None, str(e).encode('utf-8')
+            self.bytes_received += len(data)
+            if status is not None and status < 500:
+                try:
+                    return status, json.loads(data) if data else {}
+                except ValueError:
+                    return status, {}
+            if attempt == self.max_retries:
+                break
+            self.retries += 1
+            time.sleep(delay * (1 + self._rng.random()))
+            delay = min(delay * 2, SYNC_BACKOFF_MAX)
+        raise SyncError(f"重试 {self.max_retries} 次后仍失败：{data.decode('utf-8', 'replace')[:200]}")
+
+
+# ==========================
+# 时钟（真实 / 加速 / 手动步进）
+# ==========================
+class Clock:
+    """游戏内的时间来源
+    now() 为单调递增的秒数（咬钩等待、QTE 判定），current_datetime() / today() 为游戏内的日期时间
+    （林汐的每日委托与心情），sleep() 按游戏内时间等待。存档写入和网络重试用的是真实时间，不走这里。
+    """
+    def now(self) -> float:
+        raise NotImplementedError
+
+    def current_datetime(self) -> datetime.datetime:
+        raise NotImplementedError
+
+    def today(self) -> datetime.date:
+        return self.current_datetime().date()
+
+    def sleep(self, seconds: float):
+        raise NotImplementedError
+
+    def real_seconds(self, seconds: float) -> float:
+        """游戏内 seconds 秒对应的真实秒数（给 Tk 的 after 等真实计时器用）"""
+        return seconds
+
+
+class RealClock(Clock):
+    def now(self) -> float:
+        return time.monotonic()
+
+    def current_datetime(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class ScaledClock(Clock):
+    """按倍率加速的时钟：factor=100 时真实 1 秒等于游戏内 100 秒"""
+    def __init__(self, factor: float = 100.0, start: datetime.datetime = None):
+        self.factor = factor
+        self._origin = time.monotonic()
+        self._origin_datetime = start or datetime.datetime.now()
+
+    def now(self) -> float:
+        return self._origin + (time.monotonic() - self._origin) * self.factor
+
+    def current_datetime(self) -> datetime.datetime:
+        return self._origin_datetime + datetime.timedelta(seconds=(time.monotonic() - self._origin) * self.factor)
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds / self.factor)
+
+    def real_seconds(self, seconds: float) -> float:
+        return seconds / self.factor
+
+
+class ManualClock(Clock):
+    """手动步进的时钟：只有调用 advance / advance_to 时间才会走
+    sleep 会阻塞到别的线程把时间推进到目标时刻；单线程驱动 FishingEngine 时用不到 sleep。
+    """
+    def __init__(self, start: float = 0.0, start_datetime: datetime.datetime = None):
+        self._start = start
+        self._now = start
+        self._start_datetime = start_datetime or datetime.datetime(2024, 1, 1, 6, 0)
+        self._cond = threading.Condition()
+        self._sleepers = 0  # 没有线程在 sleep 时推进时间不必加锁通知（回放时每个操作都要推进）
+
+    def now(self) -> float:
+        return self._now
+
+    def current_datetime(self) -> datetime.datetime:
+        return self._start_datetime + datetime.timedelta(seconds=self._now - self._start)
+
+    def advance(self, seconds: float) -> float:
+        return self.advance_to(self._now + seconds)
+
+    def advance_to(self, when: float) -> float:
+        if when > self._now:
+            self._now = when
+            if self._sleepers:
+                with self._cond:
+                    self._cond.notify_all()
+        return self._now
+
+    def sleep(self, seconds: float):
+        target = self._now + seconds
+        with self._cond:
+            self._sleepers += 1
+            try:
+                while self._now < target:
+                    self._cond.wait()
+            finally:
+                self._sleepers -= 1
+
+
+REAL_CLOCK = RealClock()
+TIME_SCALE = float(os.environ.get("FISHING_TIME_SCALE", "1"))  # 大于 1 时界面使用加速时钟
+
+
+# ==========================
+# 随机数流（每个会话独立、可复现）
+# ==========================
+SESSION_SEED = os.environ.get("FISHING_SEED")  # 设置后界面的随机结果可复现（提交问题时附上）
+
+class RngStreams:
+    """一个会话的随机数：按子系统拆成互不影响的独立流
+    selection（抽鱼种）、weight（重量）、wait（等待时间）、qte（按键序列）、events（委托、漂流瓶）、
+    idle（离线挂机结算）。
+    同一个种子总能得到同样的结果；某个子系统多抽或少抽几次不会打乱其他子系统。
+    """
+    STREAMS = ('selection', 'weight', 'wait', 'qte', 'events', 'idle')
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        for name in self.STREAMS:
+            setattr(self, name, self.stream(name))
+
+    def stream(self, name: str) -> random.Random:
+        """按名称派生一个新的流（字符串种子经 SHA-512 展开，与进程和哈希随机化无关）"""
+        return random.Random(f"{self.seed}/{name}")
 
 
 # ==========================
@@ -262,7 +2216,10 @@ def save_statistics(fish_statistics, inventory_state=None, student_state=None):
 # ==========================
 class GameState:
     """游戏状态管理类，为后续扩展预留接口"""
-    def __init__(self):
+    def __init__(self, storage=None, profile=DEFAULT_PROFILE, write_behind=True, clock: Clock = None, seed=None):
+        self.clock = clock or REAL_CLOCK  # 游戏内时间（每日委托、心情衰减、钓鱼计时）
+        self.rng = RngStreams(seed)  # 本会话的随机数流，seed 相同则结果可复现
+        self.recorder = None  # 录制本局操作的 SessionRecorder（见 FISHING_RECORD）
         # 当前游戏状态
         self.is_fishing = False  # 是否正在钓鱼
         self.is_waiting_for_bite = False  # 是否等待咬钩
@@ -273,61 +2230,37 @@ class GameState:
         self.current_fish = None  # 当前钓到的鱼（名称）
         self.current_fish_weight = None  # 当前钓到的鱼的重量
         
-        # 从文件加载统计数据
-        self.fish_statistics, inventory_state, student_state = load_statistics()
+        # 从存档后端加载统计数据（JSON 后端为快照 + 日志；旧版本存档在加载时迁移）
+        self.persister = StatsPersister(self._stats_sections, storage, profile, write_behind=write_behind)
+        loaded = self.persister.load()
+        self.fish_statistics = loaded.fish_statistics
         
         # 预留扩展字段
         self.current_location = "小溪"  # 当前钓鱼地点（默认小溪）
         self.home_data = {}  # 家园数据（预留）
-        self.student_state = student_state
-        self.inventory = inventory_state
-        self._ensure_student_state()
-        self._ensure_inventory_state()
-        
-        # 初始化所有鱼的统计数据（如果文件中没有）
-        self._init_fish_statistics()
-    
-    def _init_fish_statistics(self):
-        """初始化所有鱼的统计数据"""
-        for location, fish_list in LOCATION_FISH_CONFIG.items():
-            for fish_name, _, _, _, _, _ in fish_list:
-                if fish_name not in self.fish_statistics:
-                    self.fish_statistics[fish_name] = {'count': 0, 'max_weight': 0.0}
-
-    def _ensure_student_state(self):
-        """兜底补齐女高中生事件状态"""
-        merged = _default_student_state()
-        try:
-            merged.update(self.student_state or {})
-        except Exception:
-            pass
-        self.student_state = merged
-
-    def _ensure_inventory_state(self):
-        """兜底补齐背包与金钱状态"""
-        base = _default_inventory_state()
-        try:
-            inv = self.inventory or {}
-        except Exception:
-            inv = {}
-        # 基本字段
-        base.update({k: v for k, v in inv.items() if k in base})
-        # 合并计数字典
-        for key in ('bait_items', 'gift_items', 'craft_items', 'cooked_items'):
-            try:
-                base[key].update(inv.get(key, {}))
-            except Exception:
-                pass
-        # 鱼袋
-        base['fish_bag'] = inv.get('fish_bag', []) if isinstance(inv.get('fish_bag', []), list) else []
-        self.inventory = base
+        self.student_state = loaded.student_state
+        self.inventory = loaded.inventory
+        if loaded.migrated:
+            # 迁移结果立即写回，下次启动直接走快速路径
+            self.persister.compact()
+
+    def roll_drift_bottle(self) -> bool:
+        """还没遇见林汐时，每钓一条鱼判定一次能否钓起漂流瓶（次数越多概率越高，最高 60%）"""
+        state = self.student_state
+        state['encounter_rolls'] = state.get('encounter_rolls', 0) + 1
+        self._changed('student_state', 'encounter_rolls')
+        chance = min(0.6, 0.18 + 0.08 * state['encounter_rolls'])
+        if self.rng.events.random() < chance:
+            self.register_student_encounter()
+            return True
+        return False
 
     def register_student_encounter(self):
         """首次遇到林汐"""
         self.student_state['met'] = True
         self.student_state['encounter_rolls'] = self.student_state.get('encounter_rolls', 0)
         self.student_state['trust'] = max(self.student_state.get('trust', 0), 5)
-        self.save_stats()
+        self._changed('student_state', 'met', 'encounter_rolls', 'trust')
 
     def add_student_food(self, weight: float):
         """把钓到的鱼分享给林汐，返回更新信息"""
@@ -338,7 +2271,7 @@ class GameState:
         before_trust = self.student_state.get('trust', 0)
         self.student_state['trust'] = min(100, before_trust + trust_gain)
         ready = self.student_state['food_stock'] >= 8.0 and not self.student_state.get('rescued')
-        self.save_stats()
+        self._changed('student_state', 'food_stock', 'trust')
         return {
             'trust_delta': self.student_state['trust'] - before_trust,
             'trust': self.student_state['trust'],
@@ -356,7 +2289,7 @@ class GameState:
             return False
         self.student_state['rescued'] = True
         self.student_state['trust'] = max(self.student_state.get('trust', 0), 40)
-        self.save_stats()
+        self._changed('student_state', 'rescued', 'trust')
         return True
 
     def boost_student_trust(self, amount: int = 3):
@@ -365,7 +2298,7 @@ class GameState:
             return 0
         before = self.student_state.get('trust', 0)
         self.student_state['trust'] = min(100, before + amount)
-        self.save_stats()
+        self._changed('student_state', 'trust')
         return self.student_state['trust'] - before
 
     # ==========================
@@ -376,12 +2309,13 @@ class GameState:
 
     def add_money(self, amount: float):
         self.inventory['money'] = round(max(0, self.get_money() + amount), 2)
-        self.save_stats()
+        self._changed('inventory', 'money')
 
     def spend_money(self, amount: float) -> bool:
         if self.get_money() >= amount:
             self.inventory['money'] = round(self.get_money() - amount, 2)
-            self.save_stats()
+            self._changed('inventory', 'money')
+            self.persister.note_event('bought')
             return True
         return False
 
@@ -402,7 +2336,8 @@ class GameState:
         current_day = self.get_day()
         new_day = current_day + amount
         self.inventory['day'] = new_day
-        self.save_stats()
+        self._changed('inventory', 'day')
+        self.persister.note_event('day_advanced')
         return new_day
 
     # ==========================
@@ -419,7 +2354,7 @@ class GameState:
     def get_exp_for_next_level(self) -> int:
         """获取升到下一级所需的经验值"""
         current_level = self.get_level()
-        if current_level >= 10:
+        if current_level >= MAX_LEVEL:
             return 0  # 已满级
         return LEVEL_UP_EXP.get(current_level, 0)
     
@@ -433,20 +2368,7 @@ class GameState:
         Returns:
             获得的经验值
         """
-        # 基础经验值
-        base_exp = FISH_EXP_BASE.get(rarity, 5)
-        
-        # 重量加成：重量越大，经验越多（基于重量在范围内的比例）
-        # 最小重量时加成0.5，最大重量时加成1.5
-        if max_weight > min_weight:
-            weight_ratio = (weight - min_weight) / (max_weight - min_weight)
-            weight_multiplier = 0.5 + weight_ratio * 1.0  # 0.5 到 1.5
-        else:
-            weight_multiplier = 1.0
-        
-        # 最终经验值 = 基础经验 * 重量加成（向下取整）
-        exp_gain = int(base_exp * weight_multiplier)
-        return max(1, exp_gain)  # 至少1点经验
+        return fish_exp_gain(rarity, weight, min_weight, max_weight)
     
     def add_exp(self, amount: int) -> dict:
         """添加经验值，并处理升级
@@ -454,48 +2376,34 @@ class GameState:
             dict: {'exp_added': 添加的经验, 'leveled_up': 是否升级, 'new_level': 新等级, 'unlocked_location': 解锁的地点}
         """
         current_level = self.get_level()
-        current_exp = self.get_exp()
         current_day = self.get_day()
-        last_level_up_day = self.inventory.get('last_level_up_day', 0)
         
         # 如果已满级，不添加经验
-        if current_level >= 10:
+        if current_level >= MAX_LEVEL:
             return {'exp_added': 0, 'leveled_up': False, 'new_level': current_level, 'unlocked_location': None}
         
+        settled = settle_exp(current_level, self.get_exp(), amount, current_day,
+                             self.inventory.get('last_level_up_day', 0))
         # 如果今天已经升级过，不添加经验
-        if last_level_up_day >= current_day:
+        if settled is None:
             return {'exp_added': 0, 'leveled_up': False, 'new_level': current_level, 'unlocked_location': None, 'note': '今天已经升级过了，明天再来获得经验吧！'}
         
-        # 添加经验
-        new_exp = current_exp + amount
-        new_level = current_level
-        leveled_up = False
+        new_level, new_exp, leveled_up = settled
         unlocked_location = None
-        
-        # 检查是否升级（每天最多升级一次）
-        while new_level < 10:
-            exp_needed = LEVEL_UP_EXP.get(new_level, 0)
-            if exp_needed == 0:  # 已满级或配置错误
-                break
-            if new_exp >= exp_needed:
-                new_exp -= exp_needed
-                new_level += 1
-                leveled_up = True
-                # 记录升级的天数
-                self.inventory['last_level_up_day'] = current_day
-                # 检查是否解锁了新地点
-                for location, unlock_level in LOCATION_UNLOCK_LEVEL.items():
-                    if new_level == unlock_level:
-                        unlocked_location = location
-                # 每天只能升级一次，所以升级后立即退出循环
-                break
-            else:
-                break
+        if leveled_up:
+            # 记录升级的天数
+            self.inventory['last_level_up_day'] = current_day
+            # 检查是否解锁了新地点
+            for location, unlock_level in LOCATION_UNLOCK_LEVEL.items():
+                if new_level == unlock_level:
+                    unlocked_location = location
         
         # 更新状态
         self.inventory['exp'] = new_exp
         self.inventory['level'] = new_level
-        self.save_stats()
+        self._changed('inventory', 'exp', 'level', 'last_level_up_day')
+        if leveled_up:
+            self.persister.note_event('leveled')
         
         return {
             'exp_added': amount,
@@ -510,42 +2418,32 @@ class GameState:
         return self.get_level() >= required_level
 
     def add_caught_fish(self, fish_name: str, weight: float, rarity: str):
-        self.inventory.setdefault('fish_bag', []).append({
-            'name': fish_name,
-            'weight': weight,
-            'rarity': rarity
-        })
-        self.save_stats()
+        self.inventory['fish_bag'].append(fish_name, weight, rarity)
+        self.persister.record_bag_op('bag+', fish_name, weight, rarity)
 
     def sell_all_fish(self):
-        bag = self.inventory.get('fish_bag', [])
-        earnings = 0.0
-        for fish in bag:
-            rarity = fish.get('rarity', RARITY_COMMON)
-            price_per = FISH_PRICE_PER_KG.get(rarity, 10)
-            earnings += price_per * fish.get('weight', 0)
+        bag = self.inventory['fish_bag']
+        earnings = bag.sale_value(FISH_PRICE_PER_KG)
         sold_count = len(bag)
-        self.inventory['fish_bag'] = []
+        bag.clear()
+        self.persister.record_bag_op('bag0')
+        self.persister.note_event('sold')
         self.add_money(earnings)
         return earnings, sold_count
 
-    def remove_one_fish(self, fish_name: str):
-        bag = self.inventory.get('fish_bag', [])
-        for idx, fish in enumerate(bag):
-            if fish.get('name') == fish_name:
-                bag.pop(idx)
-                self.save_stats()
-                return fish
-        return None
+    def remove_one_fish(self, fish_name: str, policy: str = FISH_POLICY_OLDEST):
+        """按策略（最早钓到/最重/最轻）从鱼袋取出一条指定鱼种的鱼"""
+        fish = self.inventory['fish_bag'].pop_species(fish_name, policy)
+        if fish is not None:
+            self.persister.record_bag_op('bag-', fish_name, fish['weight'])
+        return fish
 
     def fish_bag_summary(self):
-        summary = {}
-        for fish in self.inventory.get('fish_bag', []):
-            name = fish.get('name')
-            summary.setdefault(name, {'count': 0, 'total_weight': 0.0, 'rarity': fish.get('rarity', RARITY_COMMON)})
-            summary[name]['count'] += 1
-            summary[name]['total_weight'] += fish.get('weight', 0.0)
-        return summary
+        return self.inventory['fish_bag'].summary()
+
+    def quote_fish_sale(self) -> float:
+        """整袋鱼按当前单价的估价（不卖出）"""
+        return self.inventory['fish_bag'].sale_value(FISH_PRICE_PER_KG)
 
     def get_owned_rods(self):
         return self.inventory.get('owned_rods', ['木质竿'])
@@ -553,14 +2451,14 @@ class GameState:
     def equip_rod(self, rod_name: str) -> bool:
         if rod_name in self.get_owned_rods():
             self.inventory['equipped_rod'] = rod_name
-            self.save_stats()
+            self._changed('inventory', 'equipped_rod')
             return True
         return False
 
     def select_bait(self, bait_name: str) -> bool:
         if bait_name in BAIT_CONFIG:
             self.inventory['selected_bait'] = bait_name
-            self.save_stats()
+            self._changed('inventory', 'selected_bait')
             return True
         return False
 
@@ -571,44 +2469,47 @@ class GameState:
         count = self.inventory['bait_items'].get(bait, 0)
         if count > 0:
             self.inventory['bait_items'][bait] = count - 1
-            self.save_stats()
+            self._changed('inventory', 'bait_items')
             return bait
         # 如果没货自动回退
         self.inventory['selected_bait'] = '普通鱼饵'
-        self.save_stats()
+        self._changed('inventory', 'selected_bait')
         return '普通鱼饵'
 
     def acquire_item(self, item_name: str, count: int = 1):
         if item_name in BAIT_CONFIG:
-            self.inventory['bait_items'][item_name] = self.inventory['bait_items'].get(item_name, 0) + count
+            key = 'bait_items'
         elif item_name in GIFT_SHOP_ITEMS:
-            self.inventory['gift_items'][item_name] = self.inventory['gift_items'].get(item_name, 0) + count
+            key = 'gift_items'
         elif item_name in CRAFT_ITEMS:
-            self.inventory['craft_items'][item_name] = self.inventory['craft_items'].get(item_name, 0) + count
+            key = 'craft_items'
         elif item_name == "烤鱼":
-            self.inventory['cooked_items'][item_name] = self.inventory['cooked_items'].get(item_name, 0) + count
-        self.save_stats()
+            key = 'cooked_items'
+        else:
+            return
+        self.inventory[key][item_name] = self.inventory[key].get(item_name, 0) + count
+        self._changed('inventory', key)
 
     def consume_item(self, item_name: str) -> bool:
         if item_name in BAIT_CONFIG:
             count = self.inventory['bait_items'].get(item_name, 0)
             if count > 0:
                 self.inventory['bait_items'][item_name] = count - 1
-                self.save_stats()
+                self._changed('inventory', 'bait_items')
                 return True
             return False
         if item_name in GIFT_SHOP_ITEMS:
             count = self.inventory['gift_items'].get(item_name, 0)
             if count > 0:
                 self.inventory['gift_items'][item_name] = count - 1
-                self.save_stats()
+                self._changed('inventory', 'gift_items')
                 return True
             return False
         if item_name in self.inventory.get('cooked_items', {}):
             count = self.inventory['cooked_items'].get(item_name, 0)
             if count > 0:
                 self.inventory['cooked_items'][item_name] = count - 1
-                self.save_stats()
+                self._changed('inventory', 'cooked_items')
                 return True
         return False
 
@@ -618,41 +2519,29 @@ class GameState:
             return False, "缺少卡式炉"
         if not self.inventory.get('fish_bag'):
             return False, "没有鱼可以烤"
-        fish = self.inventory['fish_bag'].pop(0)
+        fish = self.inventory['fish_bag'].pop_oldest()
+        self.persister.record_bag_op('bag-', fish['name'], fish['weight'])
         self.acquire_item('烤鱼', 1)
-        self.save_stats()
         return True, f"将 {fish.get('name', '鱼')} 烤成了热乎的烤鱼"
 
     def add_rod(self, rod_name: str):
         rods = self.inventory.setdefault('owned_rods', ['木质竿'])
         if rod_name not in rods:
             rods.append(rod_name)
-        self.save_stats()
+        self._changed('inventory', 'owned_rods')
 
     def get_catch_window(self) -> float:
-        rod = self.inventory.get('equipped_rod', '木质竿')
-        rod_bonus = ROD_CONFIG.get(rod, {}).get('window', 1.0)
-        trust_bonus = 0.1 if self.student_state.get('rescued') else 0.0
-        # 初始QTE时间为2秒，然后按鱼竿倍率增加
-        return 2.0 * rod_bonus + trust_bonus
+        return catch_window_for(self.inventory.get('equipped_rod', '木质竿'), self.student_state.get('rescued'))
 
     def get_wait_time_multiplier(self) -> float:
         """根据伙伴和天气加成调整等待时间"""
-        trust_factor = 1.0
-        if self.student_state.get('rescued'):
-            trust = self.student_state.get('trust', 0)
-            trust_factor = max(0.6, 1 - trust * 0.0025)
-        bait = self.inventory.get('selected_bait', '普通鱼饵')
-        bait_factor = BAIT_CONFIG.get(bait, {}).get('wait_multiplier', 1.0)
-        env_factor = getattr(self, 'current_environment_wait', 1.0)
-        return trust_factor * bait_factor * env_factor
+        trust = self.student_state.get('trust', 0) if self.student_state.get('rescued') else None
+        return wait_multiplier_for(
+            self.inventory.get('selected_bait', '普通鱼饵'), getattr(self, 'current_environment_wait', 1.0), trust)
 
     def roll_environment(self):
         """根据天数确定当天的固定天气，时间固定为清晨"""
-        current_day = self.get_day()
-        # 使用天数对天气数量取模，确保每天天气固定
-        weather_index = (current_day - 1) % len(WEATHER_OPTIONS)
-        weather = WEATHER_OPTIONS[weather_index]
+        weather = weather_option_for_day(self.get_day())
         time_slot = FIXED_TIME_SLOT  # 固定时间
         self.current_weather = weather[0]
         self.current_time_slot = time_slot[0]
@@ -661,25 +2550,173 @@ class GameState:
         self.current_environment_rarity_bonus.update(weather[2])
         self.current_environment_rarity_bonus.update(time_slot[2])
 
+    # ==========================
+    # 离线挂机
+    # ==========================
+    def mark_active(self, when: str = None):
+        """记下最后在线的时间（游戏时钟，ISO 格式）与地点，下次启动据此结算离线挂机"""
+        self.inventory['last_active'] = when or self.clock.current_datetime().isoformat()
+        self.inventory['last_location'] = self.current_location
+        self._changed('inventory', 'last_active', 'last_location')
+
+    def idle_seconds(self) -> float:
+        """距最后在线经过的秒数；没有记录（或已经结算过）时为 0"""
+        last_active = self.inventory.get('last_active')
+        if not last_active:
+            return 0.0
+        try:
+            elapsed = self.clock.current_datetime() - datetime.datetime.fromisoformat(last_active)
+        except (TypeError, ValueError):
+            return 0.0
+        return max(0.0, elapsed.total_seconds())
+
+    def resolve_idle(self, seconds: float = None, location: str = None, sell: bool = True):
+        """离线挂机结算：按 IDLE_RATE 折算离线时长（最多 IDLE_MAX_SECONDS），用当前装备在离线时的
+        地点一次抽出全部渔获，再把统计、鱼饵、经验（每天最多升一级）和金币作为一次事务写入存档。
+        sell=True 时渔获按单价直接卖掉，否则放进鱼袋。离线不到 IDLE_MIN_SECONDS 时不结算，返回 None。
+        """
+        seconds = self.idle_seconds() if seconds is None else seconds
+        if seconds < IDLE_MIN_SECONDS:
+            return None
+        fishing_seconds = min(seconds, IDLE_MAX_SECONDS) * IDLE_RATE
+        location = location or self.inventory.get('last_location') or self.current_location
+        if location not in LOCATION_FISH_CONFIG or not self.is_location_unlocked(location):
+            location = "小溪"
+        bait = self.inventory.get('selected_bait', '普通鱼饵')
+        stock = None if bait == '普通鱼饵' else self.inventory['bait_items'].get(bait, 0)
+        rod = self.inventory.get('equipped_rod', '木质竿')
+        trust = self.student_state.get('trust', 0) if self.student_state.get('rescued') else None
+        outcome = sample_idle_catches(location, bait, rod, weather_for_day(self.get_day()), fishing_seconds,
+                                      bait_stock=stock, seed=self.rng.idle.getrandbits(64), trust=trust)
+
+        names, weights = outcome['names'], outcome['weights']
+        with self.persister.transaction():
+            species = {}
+            for fish_name, weight in zip(names, weights):
+                stat = self.fish_statistics.setdefault(fish_name, {'count': 0, 'max_weight': 0.0})
+                stat['count'] += 1
+                if weight > stat['max_weight']:
+                    stat['max_weight'] = weight
+                species[fish_name] = species.get(fish_name, 0) + 1
+            if species:
+                self._changed('fish_statistics', *species)
+
+            if outcome['bait_used']:
+                self.inventory['bait_items'][bait] = stock - outcome['bait_used']
+                self._changed('inventory', 'bait_items')
+            if stock is not None and outcome['casts'] > outcome['bait_used']:
+                # 与 consume_bait 一样：鱼饵用完后自动换回普通鱼饵
+                self.inventory['selected_bait'] = '普通鱼饵'
+                self._changed('inventory', 'selected_bait')
+
+            level = self.get_level()
+            new_level, new_exp, leveled_up, exp_added = settle_exp_batch(
+                level, self.get_exp(), outcome['exp'], self.get_day(), self.inventory.get('last_level_up_day', 0))
+            unlocked_location = None
+            if exp_added:
+                self.inventory['exp'] = new_exp
+                self.inventory['level'] = new_level
+                if leveled_up:
+                    self.inventory['last_level_up_day'] = self.get_day()
+                    self.persister.note_event('leveled')
+                    for loc, unlock_level in LOCATION_UNLOCK_LEVEL.items():
+                        if new_level == unlock_level:
+                            unlocked_location = loc
+                self._changed('inventory', 'exp', 'level', 'last_level_up_day')
+
+            earnings = 0.0
+            if sell:
+                earnings = round(sum(outcome['gold']), 2)
+                if earnings:
+                    self.add_money(earnings)
+            else:
+                bag = self.inventory['fish_bag']
+                for fish_name, weight, rarity in zip(names, weights, outcome['rarities']):
+                    bag.append(fish_name, weight, rarity)
+                    self.persister.record_bag_op('bag+', fish_name, weight, rarity)
+
+            # 这段离线时间已经结算，避免下次启动重复计入
+            self.inventory['last_active'] = None
+            self._changed('inventory', 'last_active')
+            self.persister.note_event('idle')
+
+        return {
+            'seconds': seconds,
+            'fishing_seconds': outcome['seconds'],
+            'location': location,
+            'casts': outcome['casts'],
+            'catches': len(names),
+            'kg': round(sum(weights), 2),
+            'species': species,
+            'bait': bait,
+            'bait_used': outcome['bait_used'],
+            'exp_gained': sum(outcome['exp']),
+            'exp_added': exp_added,
+            'leveled_up': leveled_up,
+            'new_level': new_level,
+            'unlocked_location': unlocked_location,
+            'money': earnings,
+            'sold': sell,
+        }
+
     def get_rarity_weight_multiplier(self, rarity: str) -> float:
         bait = self.inventory.get('selected_bait', '普通鱼饵')
         bait_bonus = BAIT_CONFIG.get(bait, {}).get('rarity_bonus', {}).get(rarity, 1.0)
         env_bonus = self.current_environment_rarity_bonus.get(rarity, 1.0) if hasattr(self, 'current_environment_rarity_bonus') else 1.0
         return bait_bonus * env_bonus
 
+    def expected_yield(self, location: str = None, bait: str = None, rod: str = None) -> dict:
+        """当前（或指定）地点与装备在今天天气下的期望收益，见 loadout_expectation"""
+        trust = self.student_state.get('trust', 0) if self.student_state.get('rescued') else None
+        return loadout_expectation(
+            location or self.current_location,
+            bait or self.inventory.get('selected_bait', '普通鱼饵'),
+            rod or self.inventory.get('equipped_rod', '木质竿'),
+            weather_for_day(self.get_day()),
+            trust,
+        )
+
+    def purchase_advice(self, location: str = None) -> list:
+        """集市购买建议：与当前装备相比，每件鱼竿/鱼饵每分钟多赚多少金币
+        鱼竿给出回本所需的钓鱼分钟数；鱼饵一份 3 个，按每竿摊掉的价格算净收益。
+        """
+        current = self.expected_yield(location)
+        advice = []
+        for rod, data in ROD_CONFIG.items():
+            if rod in self.get_owned_rods():
+                continue
+            gain = self.expected_yield(location, rod=rod)['gold_per_minute'] - current['gold_per_minute']
+            advice.append({
+                'name': rod, 'category': 'rod', 'price': data['price'], 'gain_per_minute': gain,
+                'payback_minutes': data['price'] / gain if gain > 0 else None,
+            })
+        for bait, data in BAIT_CONFIG.items():
+            if data['price'] <= 0:
+                continue
+            expectation = self.expected_yield(location, bait=bait)
+            casts_per_minute = 60 / expectation['seconds_per_cast']
+            net = expectation['gold_per_minute'] - data['price'] / 3 * casts_per_minute
+            advice.append({
+                'name': bait, 'category': 'bait', 'price': data['price'],
+                'gain_per_minute': net - current['gold_per_minute'],
+                'exp_gain_per_minute': expectation['exp_per_minute'] - current['exp_per_minute'],
+            })
+        advice.sort(key=lambda item: item['gain_per_minute'], reverse=True)
+        return advice
+
     # ==========================
     # 林汐：礼物、委托、情绪
     # ==========================
     def _today_str(self):
-        return datetime.date.today().isoformat()
+        return self.clock.today().isoformat()
 
     def ensure_daily_request(self):
         today = self._today_str()
         if self.student_state.get('daily_request_date') != today:
-            req = random.choice(DAILY_REQUEST_POOL)
+            req = self.rng.events.choice(DAILY_REQUEST_POOL)
             self.student_state['daily_request'] = req
             self.student_state['daily_request_date'] = today
-            self.save_stats()
+            self._changed('student_state', 'daily_request', 'daily_request_date')
         return self.student_state.get('daily_request')
 
     def apply_mood_decay(self):
@@ -688,12 +2725,12 @@ class GameState:
             return 0
         try:
             last_day = datetime.date.fromisoformat(last)
-            delta = (datetime.date.today() - last_day).days
+            delta = (self.clock.today() - last_day).days
             if delta > 2:
                 decay = min(6, (delta - 2) * 2)
                 before = self.student_state.get('trust', 0)
                 self.student_state['trust'] = max(0, before - decay)
-                self.save_stats()
+                self._changed('student_state', 'trust')
                 return before - self.student_state['trust']
         except Exception:
             return 0
@@ -701,7 +2738,7 @@ class GameState:
 
     def _set_gift_timestamp(self):
         self.student_state['last_gift_date'] = self._today_str()
-        self.save_stats()
+        self._changed('student_state', 'last_gift_date')
 
     def gift_to_student(self, name: str, tags=None, weight: float = 0.0):
         if not self.student_state.get('met'):
@@ -741,7 +2778,8 @@ class GameState:
         self.student_state['last_gift_day'] = current_day
         # 同时记录实际日期（用于情绪衰减）
         self._set_gift_timestamp()
-        self.save_stats()
+        self._changed('student_state', 'trust', 'food_stock', 'last_gift_day')
+        self.persister.note_event('gifted')
         return {
             'trust_delta': self.student_state['trust'] - before,
             'trust': self.student_state['trust'],
@@ -749,9 +2787,43 @@ class GameState:
             'success': True
         }
     
-    def save_stats(self):
-        """保存统计数据到文件"""
-        save_statistics(self.fish_statistics, self.inventory, self.student_state)
+    def _stats_sections(self):
+        return {
+            'fish_statistics': self.fish_statistics,
+            'inventory': self.inventory,
+            'student_state': self.student_state,
+        }
+
+    def _changed(self, section: str, *keys):
+        """记录分区中变化的键，写入器只把这些键追加到日志"""
+        self.persister.mark_keys(section, *keys)
+
+    def save_stats(self, *sections):
+        """标记整个分区需要保存（不传参数表示全部），由写入器合并后落盘"""
+        self.persister.mark_dirty(*sections)
+
+    def apply_sync_ops(self, ops):
+        """应用云端同步合并回来的其他设备的改动（日志格式的操作，见 apply_journal_ops）"""
+        if not ops:
+            return
+        with self.persister.transaction():
+            apply_journal_ops(self._stats_sections(), ops)
+            for op in ops:
+                if op[0] == 'set':
+                    self._changed(op[1], op[2])
+                elif op[0] == 'section':
+                    self.save_stats(op[1])
+                else:
+                    self.persister.record_bag_op(*op)
+            self.persister.note_event('sync')
+
+    def tick_stats(self, now=None) -> bool:
+        """每个节拍调用一次，间隔到达时把脏数据写出"""
+        return self.persister.tick(now)
+
+    def flush_stats(self):
+        """立即同步落盘（退出或切换存档前调用）"""
+        self.persister.close()
     
     def reset_fishing_state(self):
         """重置钓鱼状态"""
@@ -775,12 +2847,13 @@ class GameState:
         self.is_waiting_for_bite = False
     
     def on_catch_success(self, fish_name: str, weight: float):
-        """成功钓到鱼"""
+        """成功钓到鱼（单竿界面的钓鱼标志；统计、鱼袋与经验由 record_catch 结算）"""
         self.catch_success = True
         self.current_fish = fish_name
         self.current_fish_weight = weight
-        
-        # 更新统计数据
+
+    def record_fish_statistics(self, fish_name: str, weight: float):
+        """图鉴统计：条数与最大重量"""
         if fish_name not in self.fish_statistics:
             self.fish_statistics[fish_name] = {'count': 0, 'max_weight': 0.0}
         
@@ -789,8 +2862,19 @@ class GameState:
             self.fish_statistics[fish_name]['max_weight'] = weight
         
         # 自动保存统计数据
-        self.save_stats()
+        self._changed('fish_statistics', fish_name)
+        self.persister.note_event('caught')
     
+    def record_catch(self, fish_info, weight: float):
+        """收获一条鱼：记录统计、放进鱼袋、结算经验，返回 (经验, 升级结果)
+        不碰单竿的钓鱼标志，多竿钓鱼也用它；单竿流程另外调用 on_catch_success。
+        """
+        fish_name, rarity, min_weight, max_weight, _, _ = fish_info
+        self.record_fish_statistics(fish_name, weight)
+        self.add_caught_fish(fish_name, weight, rarity)
+        exp_gain = self.calculate_exp_gain(rarity, weight, min_weight, max_weight)
+        return exp_gain, self.add_exp(exp_gain)
+
     def on_catch_failed(self):
         """钓鱼失败"""
         self.catch_success = False
@@ -799,176 +2883,1517 @@ class GameState:
 
 
 # ==========================
-# 钓鱼管理器
+# 单写者命令队列
+# ==========================
+GameSnapshot = namedtuple('GameSnapshot', [
+    'version', 'day', 'level', 'exp', 'money', 'selected_bait', 'equipped_rod', 'owned_rods',
+    'bait_items', 'gift_items', 'cooked_items', 'fish_count', 'bag_value', 'student', 'is_fishing',
+])
+
+def game_snapshot(game_state: GameState, version: int = 0) -> GameSnapshot:
+    """GameState 的只读快照：字典都是复制后的 MappingProxyType，之后的修改不会影响它"""
+    inventory = game_state.inventory
+    freeze = lambda data: MappingProxyType(_snapshot_value(data))
+    return GameSnapshot(
+        version=version,
+        day=game_state.get_day(),
+        level=game_state.get_level(),
+        exp=game_state.get_exp(),
+        money=game_state.get_money(),
+        selected_bait=inventory.get('selected_bait', '普通鱼饵'),
+        equipped_rod=inventory.get('equipped_rod', '木质竿'),
+        owned_rods=tuple(game_state.get_owned_rods()),
+        bait_items=freeze(inventory['bait_items']),
+        gift_items=freeze(inventory['gift_items']),
+        cooked_items=freeze(inventory['cooked_items']),
+        fish_count=len(inventory['fish_bag']),
+        bag_value=game_state.quote_fish_sale(),
+        student=freeze(game_state.student_state),
+        is_fishing=game_state.is_fishing,
+    )
+
+
+class GameCommandQueue:
+    """GameState 的单写者
+    任何线程都可以 submit 命令（GameState 的方法名，或 func(game_state, ...)），得到一个 Future；
+    只有写者线程调用 apply_pending，按提交顺序执行一批命令，这一批的改动合并成一条存档记录，
+    执行完发布新的只读快照（snapshot 属性整体替换）。读者随时读 snapshot，不需要加锁；
+    提交方只往 deque 里追加，也不加锁。写者可以是 asyncio 事件循环，或者 start() 开的一个专用线程。
+    按需使用：界面本身只在 Tk 主线程里直接修改 GameState，不需要它；要从其他线程（模拟、服务器）
+    修改同一个 GameState 时才建一个队列，并保证所有修改都经过它。
+    """
+    def __init__(self, game_state: GameState):
+        self.game_state = game_state
+        self._pending = deque()  # (命令, args, kwargs, Future)；append / popleft 本身是原子的
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self.version = 0
+        self.snapshot = game_snapshot(game_state)
+        # 统计信息（用于基准测试）
+        self.applied = 0
+        self.batches = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, command, *args, **kwargs) -> Future:
+        """提交一个命令，返回它的 Future（结果为命令的返回值，出错时为异常）"""
+        future = Future()
+        self._pending.append((command, args, kwargs, future))
+        self._wakeup.set()
+        return future
+
+    def apply_pending(self) -> int:
+        """（写者线程）按顺序执行当前排队的命令，合并成一条存档记录并发布快照，返回执行的条数"""
+        self._wakeup.clear()  # 先清再数：清之后提交的命令会重新置位，不会被漏掉
+        pending = self._pending
+        count = len(pending)
+        if not count:
+            return 0
+        game_state = self.game_state
+        applied = 0
+        with game_state.persister.transaction():
+            for _ in range(count):
+                command, args, kwargs, future = pending.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if isinstance(command, str):
+                        result = getattr(game_state, command)(*args, **kwargs)
+                    else:
+                        result = command(game_state, *args, **kwargs)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+                applied += 1
+        self.version += 1
+        self.snapshot = game_snapshot(game_state, self.version)
+        self.applied += applied
+        self.batches += 1
+        return applied
+
+    # ---------- 专用写者线程 ----------
+    def start(self, interval: float = 0.0):
+        """开一个写者线程：有命令时醒来，等 interval 秒攒一批再执行，之后给存档写入器一个节拍"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+
+        def run():
+            while True:
+                self._wakeup.wait()
+                if interval and not self._stopping:
+                    time.sleep(interval)
+                self.apply_pending()
+                self.game_state.tick_stats()
+                if self._stopping and not self._pending:
+                    return
+        self._thread = threading.Thread(target=run, name="game-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """执行完已提交的命令后结束写者线程"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+
+
+# ==========================
+# 钓鱼规则公式（GameState、模拟器与期望值计算共用）
+# ==========================
+def fish_exp_gain(rarity: str, weight: float, min_weight: float = 0.1, max_weight: float = 1.0) -> int:
+    """钓到一条鱼获得的经验"""
+    # 基础经验值
+    base_exp = FISH_EXP_BASE.get(rarity, 5)
+    
+    # 重量加成：重量越大，经验越多（基于重量在范围内的比例）
+    # 最小重量时加成0.5，最大重量时加成1.5
+    if max_weight > min_weight:
+        weight_ratio = (weight - min_weight) / (max_weight - min_weight)
+        weight_multiplier = 0.5 + weight_ratio * 1.0  # 0.5 到 1.5
+    else:
+        weight_multiplier = 1.0
+    
+    # 最终经验值 = 基础经验 * 重量加成（向下取整）
+    exp_gain = int(base_exp * weight_multiplier)
+    return max(1, exp_gain)  # 至少1点经验
+
+def catch_window_for(rod: str, rescued: bool = False) -> float:
+    """QTE 判定时间：初始 2 秒，按鱼竿倍率增加，救出林汐后再加 0.1 秒"""
+    rod_bonus = ROD_CONFIG.get(rod, {}).get('window', 1.0)
+    trust_bonus = 0.1 if rescued else 0.0
+    return 2.0 * rod_bonus + trust_bonus
+
+def environment_wait_for(weather: str, time_slot: str) -> float:
+    """天气与时间段的等待倍率（与 GameState.roll_environment 一致）"""
+    factor = 1.0
+    for name, weather_wait, _ in WEATHER_OPTIONS:
+        if name == weather:
+            factor *= weather_wait
+    if FIXED_TIME_SLOT[0] == time_slot:
+        factor *= FIXED_TIME_SLOT[1]
+    return factor
+
+def settle_exp(level: int, exp: int, amount: int, day: int, last_level_up_day: int):
+    """经验结算：满级或当天已经升过级时不加经验（返回 None）；
+    否则返回 (新等级, 新经验, 是否升级)。每天最多升一级，升级后多出的经验保留。
+    """
+    if level >= MAX_LEVEL or last_level_up_day >= day:
+        return None
+    exp += amount
+    exp_needed = LEVEL_UP_EXP.get(level, 0)
+    if exp_needed and exp >= exp_needed:
+        return level + 1, exp - exp_needed, True
+    return level, exp, False
+
+def weather_option_for_day(day: int) -> tuple:
+    """每天的天气是固定的：按天数轮换，返回 WEATHER_OPTIONS 中的一项"""
+    return WEATHER_OPTIONS[(day - 1) % len(WEATHER_OPTIONS)]
+
+def weather_for_day(day: int) -> str:
+    return weather_option_for_day(day)[0]
+
+def wait_multiplier_for(bait: str, environment_wait: float = 1.0, trust=None) -> float:
+    """等待时间倍率；trust 为 None 表示还没救出林汐"""
+    trust_factor = 1.0 if trust is None else max(0.6, 1 - trust * 0.0025)
+    bait_factor = BAIT_CONFIG.get(bait, {}).get('wait_multiplier', 1.0)
+    return trust_factor * bait_factor * environment_wait
+
+
+# ==========================
+# 按权重抽鱼（别名表）
+# ==========================
+class AliasSampler:
+    """Walker/Vose 别名表：建表 O(n)，每次抽取 O(1)"""
+    __slots__ = ('items', 'probs', 'alias', 'weights', 'total')
+
+    def __init__(self, items, weights):
+        n = len(items)
+        if n == 0:
+            raise ValueError("没有可抽取的项")
+        self.items = list(items)
+        self.weights = list(weights)
+        self.total = sum(self.weights)
+        scaled = [w * n / self.total for w in self.weights]
+        self.probs = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s_idx = small.pop()
+            l_idx = large.pop()
+            self.probs[s_idx] = scaled[s_idx]
+            self.alias[s_idx] = l_idx
+            scaled[l_idx] -= 1.0 - scaled[s_idx]
+            (small if scaled[l_idx] < 1.0 else large).append(l_idx)
+        # 剩下的（含浮点误差）概率都是 1
+
+    def draw(self, rng=random):
+        return self.items[self.draw_index(rng)]
+
+    def draw_index(self, rng=random) -> int:
+        u = rng.random() * len(self.probs)
+        idx = int(u)
+        if u - idx < self.probs[idx]:
+            return idx
+        return self.alias[idx]
+
+    def probability(self, idx: int) -> float:
+        return self.weights[idx] / self.total
+
+
+_FISH_SAMPLERS = {}  # (地点, 鱼饵, 天气, 时间段) -> AliasSampler
+
+def invalidate_fish_samplers():
+    """修改鱼类、鱼饵、鱼竿、天气或时间段配置后调用，下次抽鱼时重新建表、重算期望值"""
+    _FISH_SAMPLERS.clear()
+    _EXPECTATION_CACHE.clear()
+
+def environment_rarity_bonus(weather: str, time_slot: str) -> dict:
+    """天气与时间段对各稀有度的权重加成（与 GameState.roll_environment 一致）"""
+    bonus = {}
+    for name, _, weather_bonus in WEATHER_OPTIONS:
+        if name == weather:
+            bonus.update(weather_bonus)
+    if FIXED_TIME_SLOT[0] == time_slot:
+        bonus.update(FIXED_TIME_SLOT[2])
+    return bonus
+
+def fish_sampler(location: str, bait: str, weather: str, time_slot: str) -> AliasSampler:
+    """按地点与装备取（必要时构建）抽鱼用的别名表，权重与 get_rarity_weight_multiplier 一致"""
+    key = (location, bait, weather, time_slot)
+    sampler = _FISH_SAMPLERS.get(key)
+    if sampler is None:
+        # 如果地点不存在，默认使用小溪
+        fish_list = LOCATION_FISH_CONFIG.get(location, LOCATION_FISH_CONFIG["小溪"])
+        bait_bonus = BAIT_CONFIG.get(bait, {}).get('rarity_bonus', {})
+        env_bonus = environment_rarity_bonus(weather, time_slot)
+        weights = [
+            fish_info[4] * bait_bonus.get(fish_info[1], 1.0) * env_bonus.get(fish_info[1], 1.0)
+            for fish_info in fish_list
+        ]
+        sampler = _FISH_SAMPLERS[key] = AliasSampler(fish_list, weights)
+    return sampler
+
+
+# ==========================
+# 蒙特卡洛模拟（批量抽样）
+# ==========================
+QTE_REACTION_RANGE = (0.15, 0.6)  # 模拟玩家每个按键的反应时间（秒，均匀分布）
+SIMULATION_CHUNK = 1 << 20         # 每批抽样的竿数，控制内存占用
+SIMULATED_CAST_OVERHEAD = 3.0     # 模拟整局游戏时每竿收线、挂饵的秒数
+
+def _loadout_tables(location, bait, weather, time_slot):
+    """模拟与期望值计算共用的每鱼种参数（按别名表中的顺序）"""
+    sampler = fish_sampler(location, bait, weather, time_slot)
+    fish_list = sampler.items
+    return sampler, {
+        'names': [fish[0] for fish in fish_list],
+        'rarities': [fish[1] for fish in fish_list],
+        'min_weight': [fish[2] for fish in fish_list],
+        'max_weight': [fish[3] for fish in fish_list],
+        'wait_min': [fish[5][0] for fish in fish_list],
+        'wait_max': [fish[5][1] for fish in fish_list],
+        'price': [FISH_PRICE_PER_KG.get(fish[1], 10) for fish in fish_list],
+        'base_exp': [FISH_EXP_BASE.get(fish[1], 5) for fish in fish_list],
+        'keys': [QTE_LENGTH.get(fish[1], 1) for fish in fish_list],
+    }
+
+def simulate_catches(location: str, bait: str = '普通鱼饵', rod: str = '木质竿', weather: str = None,
+                     casts: int = 1000000, seed=None, trust=None, cast_overhead: float = 0.0,
+                     reaction_range=QTE_REACTION_RANGE) -> dict:
+    """批量模拟同一装备下的大量抛竿，返回各鱼种分布与每小时金币/经验
+    每竿：按别名表抽鱼种，等待时间与重量在配置范围内均匀抽取，QTE 每键反应时间在 reaction_range
+    内均匀抽取，总用时不超过判定时间即钓到。经验按 fish_exp_gain 计算（不考虑每天只能升一级）。
+    trust 为 None 表示还没救出林汐；cast_overhead 为每竿额外耗时（收线、挂饵）。
+    有 numpy 时整批向量化，否则逐竿用纯 Python 计算。
+    """
+    weather = weather or WEATHER_OPTIONS[0][0]
+    time_slot = FIXED_TIME_SLOT[0]
+    sampler, table = _loadout_tables(location, bait, weather, time_slot)
+    wait_mult = wait_multiplier_for(bait, environment_wait_for(weather, time_slot), trust)
+    window = catch_window_for(rod, trust is not None)
+    simulate = _simulate_numpy if np is not None else _simulate_python
+    per_species, totals = simulate(sampler, table, casts, seed, wait_mult, window, reaction_range)
+
+    hours = (totals['seconds'] + cast_overhead * casts) / 3600
+    species = {}
+    for idx, name in enumerate(table['names']):
+        weights = per_species[idx]
+        count = len(weights)
+        entry = {'probability': sampler.probability(idx), 'count': count}
+        if count:
+            ordered = sorted(weights) if np is None else np.sort(weights)
+            mean = float(sum(ordered) / count)
+            entry.update(
+                mean_weight=mean,
+                std_weight=float((sum((w - mean) ** 2 for w in ordered) / count) ** 0.5) if np is None
+                else float(np.std(ordered)),
+                p10=float(ordered[int(0.1 * (count - 1))]),
+                p50=float(ordered[int(0.5 * (count - 1))]),
+                p90=float(ordered[int(0.9 * (count - 1))]),
+            )
+        species[name] = entry
+    return {
+        'location': location, 'bait': bait, 'rod': rod, 'weather': weather,
+        'casts': casts,
+        'catches': totals['catches'],
+        'success_rate': totals['catches'] / casts,
+        'mean_wait': totals['wait'] / casts,
+        'hours': hours,
+        'kg_per_hour': totals['kg'] / hours,
+        'gold_per_hour': totals['gold'] / hours,
+        'exp_per_hour': totals['exp'] / hours,
+        'species': species,
+    }
+
+def _numpy_tables(sampler, table) -> dict:
+    """把别名表与每鱼种参数转成 numpy 数组，供批量抽样使用"""
+    arrays = {key: np.asarray(value, dtype=np.float64) for key, value in table.items()
+              if key not in ('names', 'rarities')}
+    arrays['probs'] = np.asarray(sampler.probs)
+    arrays['alias'] = np.asarray(sampler.alias)
+    arrays['keys'] = np.asarray(table['keys'], dtype=np.int64)
+    return arrays
+
+def _cast_batch_numpy(rng, arrays, n, wait_mult, window, reaction_range) -> dict:
+    """一次抽出 n 竿：鱼种、等待、QTE 是否成功、每竿用时、重量、经验与金币（均为数组）"""
+    # 向量化的别名表抽样
+    slot = rng.integers(0, len(arrays['probs']), n)
+    idx = np.where(rng.random(n) < arrays['probs'][slot], slot, arrays['alias'][slot])
+    wait_min = arrays['wait_min'][idx]
+    wait = (wait_min + (arrays['wait_max'][idx] - wait_min) * rng.random(n)) * wait_mult
+    keys = arrays['keys']
+    reaction = np.cumsum(rng.uniform(*reaction_range, (n, int(keys.max()))), axis=1)[np.arange(n), keys[idx] - 1]
+    min_w = arrays['min_weight'][idx]
+    span = arrays['max_weight'][idx] - min_w
+    weight = np.round(min_w + span * rng.random(n), 2)
+    ratio = np.divide(weight - min_w, span, out=np.full(n, 0.5), where=span > 0)
+    return {
+        'idx': idx,
+        'wait': wait,
+        'seconds': wait + np.minimum(reaction, window),
+        'caught': reaction <= window,
+        'weight': weight,
+        'exp': np.maximum(1, np.floor(arrays['base_exp'][idx] * (0.5 + ratio))),
+        'gold': weight * arrays['price'][idx],
+    }
+
+def _cast_python(rng, sampler, table, wait_mult, window, reaction_range):
+    """逐竿版本：返回 (鱼种下标, 等待, 用时, 是否钓到, 重量, 经验)"""
+    low, high = reaction_range
+    idx = sampler.draw_index(rng)
+    wait = rng.uniform(table['wait_min'][idx], table['wait_max'][idx]) * wait_mult
+    reaction = sum(rng.uniform(low, high) for _ in range(table['keys'][idx]))
+    weight = round(rng.uniform(table['min_weight'][idx], table['max_weight'][idx]), 2)
+    exp = fish_exp_gain(table['rarities'][idx], weight, table['min_weight'][idx], table['max_weight'][idx])
+    return idx, wait, wait + min(reaction, window), reaction <= window, weight, exp
+
+def _simulate_numpy(sampler, table, casts, seed, wait_mult, window, reaction_range):
+    rng = np.random.default_rng(seed)
+    arrays = _numpy_tables(sampler, table)
+    per_species = [[] for _ in table['names']]
+    totals = dict(catches=0, wait=0.0, seconds=0.0, kg=0.0, gold=0.0, exp=0.0)
+    done = 0
+    while done < casts:
+        n = min(SIMULATION_CHUNK, casts - done)
+        done += n
+        batch = _cast_batch_numpy(rng, arrays, n, wait_mult, window, reaction_range)
+        caught = batch['caught']
+        totals['catches'] += int(caught.sum())
+        totals['wait'] += float(batch['wait'].sum())
+        totals['seconds'] += float(batch['seconds'].sum())
+        totals['kg'] += float(batch['weight'][caught].sum())
+        totals['gold'] += float(batch['gold'][caught].sum())
+        totals['exp'] += float(batch['exp'][caught].sum())
+        caught_idx = batch['idx'][caught]
+        caught_weight = batch['weight'][caught]
+        for sid in range(len(per_species)):
+            per_species[sid].append(caught_weight[caught_idx == sid])
+    return [np.concatenate(chunks) for chunks in per_species], totals
+
+def _simulate_python(sampler, table, casts, seed, wait_mult, window, reaction_range):
+    rng = random.Random(seed)
+    per_species = [[] for _ in table['names']]
+    totals = dict(catches=0, wait=0.0, seconds=0.0, kg=0.0, gold=0.0, exp=0.0)
+    for _ in range(casts):
+        idx, wait, seconds, caught, weight, exp = _cast_python(rng, sampler, table, wait_mult, window, reaction_range)
+        totals['wait'] += wait
+        totals['seconds'] += seconds
+        if not caught:
+            continue
+        totals['catches'] += 1
+        totals['kg'] += weight
+        totals['gold'] += weight * table['price'][idx]
+        totals['exp'] += exp
+        per_species[idx].append(weight)
+    return per_species, totals
+
+
+# ==========================
+# 期望值（解析计算）
 # ==========================
-class FishingManager:
-    """钓鱼逻辑管理类"""
-    def __init__(self, game_state: GameState, root):
-        self.game_state = game_state
-        self.root = root
-        self.fishing_thread = None
-        self.bite_timer = None
-        self.catch_window_timer = None
-        
-        # 当前选中的鱼（用于计算时间和概率）
-        self.current_selected_fish = None
-        self.current_bait_used = '普通鱼饵'
-        self.qte_sequence = []
-        self.qte_deadline = None
-        
-        # 钓鱼参数
-        self.catch_window = 1.0  # 咬钩后的反应时间窗口（秒），后续根据鱼竿覆盖
-        
-        # 回调函数（由UI设置）
-        self.on_bite_callback = None  # 咬钩时的回调，参数(qte_sequence)
-        self.on_fishing_end_callback = None  # 钓鱼结束时的回调
-    
+_EXPECTATION_CACHE = {}  # (地点, 鱼饵, 鱼竿, 天气, 信任, 每竿额外耗时, 反应时间) -> 结果
+
+def _irwin_hall_cdf(x: float, n: int) -> float:
+    """n 个 U(0,1) 之和不超过 x 的概率"""
+    if x <= 0:
+        return 0.0
+    if x >= n:
+        return 1.0
+    total = sum((-1) ** j * math.comb(n, j) * (x - j) ** n for j in range(int(x) + 1))
+    return total / math.factorial(n)
+
+def _irwin_hall_cdf_integral(x: float, n: int) -> float:
+    """Irwin–Hall 分布函数从 0 到 x 的积分"""
+    if x <= 0:
+        return 0.0
+    if x >= n:
+        return x - n / 2
+    total = sum((-1) ** j * math.comb(n, j) * (x - j) ** (n + 1) for j in range(int(x) + 1))
+    return total / math.factorial(n + 1)
+
+def qte_success_probability(keys: int, window: float, reaction_range=QTE_REACTION_RANGE) -> float:
+    """每键反应时间 ~ U(low, high) 时，keys 个按键在 window 秒内按完的概率"""
+    low, high = reaction_range
+    if high <= low:
+        return 1.0 if keys * low <= window else 0.0
+    return _irwin_hall_cdf((window - keys * low) / (high - low), keys)
+
+def expected_qte_time(keys: int, window: float, reaction_range=QTE_REACTION_RANGE) -> float:
+    """QTE 的期望耗时（按完或超时为止）：E[min(S, window)] = window - ∫F_S"""
+    low, high = reaction_range
+    if high <= low:
+        return min(keys * low, window)
+    span = high - low
+    return window - span * _irwin_hall_cdf_integral((window - keys * low) / span, keys)
+
+def _mean_floor_at_least_one(low: float, high: float) -> float:
+    """X ~ U(low, high) 时 max(1, floor(X)) 的期望"""
+    def integral(x):  # ∫_0^x max(1, floor(t)) dt
+        if x <= 1:
+            return x
+        k = math.floor(x)
+        return 1 + k * x - k * (k + 1) / 2
+    if high <= low:
+        return max(1, math.floor(low))
+    return (integral(high) - integral(low)) / (high - low)
+
+def loadout_expectation(location: str, bait: str = '普通鱼饵', rod: str = '木质竿', weather: str = None,
+                        trust=None, cast_overhead: float = 0.0, reaction_range=QTE_REACTION_RANGE) -> dict:
+    """同一装备下长期钓鱼的精确期望（与 simulate_catches 的模型相同，不抽样）
+    每竿期望收益除以每竿期望耗时即为长期速率。重量取连续均匀分布（忽略保留两位小数），
+    经验不考虑每天只能升一级。结果按参数缓存，配置变化后调用 invalidate_fish_samplers()。
+    """
+    weather = weather or WEATHER_OPTIONS[0][0]
+    key = (location, bait, rod, weather, trust, cast_overhead, tuple(reaction_range))
+    cached = _EXPECTATION_CACHE.get(key)
+    if cached is not None:
+        return cached
+    time_slot = FIXED_TIME_SLOT[0]
+    sampler = fish_sampler(location, bait, weather, time_slot)
+    wait_mult = wait_multiplier_for(bait, environment_wait_for(weather, time_slot), trust)
+    window = catch_window_for(rod, trust is not None)
+    success = {}
+    qte_time = {}
+    species = {}
+    catch_rate = mean_wait = seconds = kg = gold = exp = 0.0
+    for idx, (name, rarity, min_weight, max_weight, _, (wait_min, wait_max)) in enumerate(sampler.items):
+        keys = QTE_LENGTH.get(rarity, 1)
+        if keys not in success:
+            success[keys] = qte_success_probability(keys, window, reaction_range)
+            qte_time[keys] = expected_qte_time(keys, window, reaction_range)
+        base = FISH_EXP_BASE.get(rarity, 5)
+        probability = sampler.probability(idx)
+        mean_weight = (min_weight + max_weight) / 2
+        mean_gold = mean_weight * FISH_PRICE_PER_KG.get(rarity, 10)
+        mean_exp = _mean_floor_at_least_one(base * 0.5, base * 1.5) if max_weight > min_weight \
+            else max(1, int(base))
+        wait = (wait_min + wait_max) / 2 * wait_mult
+        caught = probability * success[keys]
+        catch_rate += caught
+        mean_wait += probability * wait
+        seconds += probability * (wait + qte_time[keys])
+        kg += caught * mean_weight
+        gold += caught * mean_gold
+        exp += caught * mean_exp
+        species[name] = {
+            'probability': probability,
+            'catch_probability': caught,
+            'qte_success': success[keys],
+            'mean_weight': mean_weight,
+            'mean_exp': mean_exp,
+            'mean_gold': mean_gold,
+        }
+    seconds += cast_overhead
+    result = {
+        'location': location, 'bait': bait, 'rod': rod, 'weather': weather,
+        'success_rate': catch_rate,
+        'mean_wait': mean_wait,
+        'seconds_per_cast': seconds,
+        'kg_per_cast': kg,
+        'kg_per_hour': kg / seconds * 3600,
+        'gold_per_minute': gold / seconds * 60,
+        'gold_per_hour': gold / seconds * 3600,
+        'exp_per_minute': exp / seconds * 60,
+        'exp_per_hour': exp / seconds * 3600,
+        'species': species,
+    }
+    _EXPECTATION_CACHE[key] = result
+    return result
+
+
+# ==========================
+# 离线挂机（批量结算）
+# ==========================
+IDLE_RATE = 0.5                 # 离线时按这个比例折算钓鱼时间（挂机效率减半）
+IDLE_MAX_SECONDS = 12 * 3600    # 一次最多结算的离线时长（折算前）
+IDLE_MIN_SECONDS = 60           # 离线不到这么久不结算
+
+def sample_idle_catches(location: str, bait: str = '普通鱼饵', rod: str = '木质竿', weather: str = None,
+                        seconds: float = 3600.0, bait_stock=None, seed=None, trust=None,
+                        cast_overhead: float = SIMULATED_CAST_OVERHEAD,
+                        reaction_range=QTE_REACTION_RANGE) -> dict:
+    """在 seconds 秒的钓鱼时间里连续抛竿，一次抽出全部结果（模型与 simulate_catches 相同）
+    付费鱼饵最多用 bait_stock 竿（None 表示不限），用完后换普通鱼饵继续钓；
+    最后一竿超出时间预算的不算。返回抛竿数、用掉的鱼饵、实际用时，以及按先后顺序排列的
+    渔获（鱼名、稀有度、重量、经验、金币）。有 numpy 时每段整批向量化抽样。
+    """
+    weather = weather or WEATHER_OPTIONS[0][0]
+    time_slot = FIXED_TIME_SLOT[0]
+    window = catch_window_for(rod, trust is not None)
+    rng = np.random.default_rng(seed) if np is not None else random.Random(seed)
+    segments = [(bait, bait_stock)]
+    if bait != '普通鱼饵':
+        segments.append(('普通鱼饵', None))
+    result = {'casts': 0, 'bait_used': 0, 'seconds': 0.0,
+              'names': [], 'rarities': [], 'weights': [], 'exp': [], 'gold': []}
+    budget = seconds
+    for segment_bait, stock in segments:
+        if budget <= 0 or stock == 0:
+            continue
+        sampler, table = _loadout_tables(location, segment_bait, weather, time_slot)
+        wait_mult = wait_multiplier_for(segment_bait, environment_wait_for(weather, time_slot), trust)
+        if np is not None:
+            per_cast = loadout_expectation(location, segment_bait, rod, weather, trust,
+                                           cast_overhead, reaction_range)['seconds_per_cast']
+            casts, used = _idle_segment_numpy(rng, sampler, table, budget, stock, per_cast,
+                                              wait_mult, window, reaction_range, cast_overhead, result)
+        else:
+            casts, used = _idle_segment_python(rng, sampler, table, budget, stock,
+                                               wait_mult, window, reaction_range, cast_overhead, result)
+        result['casts'] += casts
+        result['seconds'] += used
+        if segment_bait == bait and bait != '普通鱼饵':
+            result['bait_used'] = casts
+        budget -= used
+        if stock is None or casts < stock:
+            break  # 时间用完了
+    return result
+
+def _idle_segment_numpy(rng, sampler, table, budget, stock, per_cast, wait_mult, window,
+                        reaction_range, cast_overhead, result):
+    """一段装备不变的挂机：按期望耗时多抽一些竿，累计用时后在预算处截断；不够再补一批"""
+    arrays = _numpy_tables(sampler, table)
+    limit = float('inf') if stock is None else stock
+    casts = 0
+    used = 0.0
+    while casts < limit:
+        n = int(min(limit - casts, (budget - used) / per_cast * 1.1 + 32, SIMULATION_CHUNK))
+        batch = _cast_batch_numpy(rng, arrays, n, wait_mult, window, reaction_range)
+        elapsed = np.cumsum(batch['seconds'] + cast_overhead)
+        done = int(np.searchsorted(elapsed, budget - used, side='right'))
+        keep = batch['caught'][:done]
+        idx = batch['idx'][:done][keep]
+        result['names'].extend(table['names'][i] for i in idx.tolist())
+        result['rarities'].extend(table['rarities'][i] for i in idx.tolist())
+        result['weights'].extend(batch['weight'][:done][keep].tolist())
+        result['exp'].extend(int(e) for e in batch['exp'][:done][keep].tolist())
+        result['gold'].extend(batch['gold'][:done][keep].tolist())
+        casts += done
+        used += float(elapsed[done - 1]) if done else 0.0
+        if done < n:
+            break
+    return casts, used
+
+def _idle_segment_python(rng, sampler, table, budget, stock, wait_mult, window,
+                         reaction_range, cast_overhead, result):
+    casts = 0
+    used = 0.0
+    while stock is None or casts < stock:
+        idx, _, seconds, caught, weight, exp = _cast_python(rng, sampler, table, wait_mult, window, reaction_range)
+        if used + seconds + cast_overhead > budget:
+            break
+        casts += 1
+        used += seconds + cast_overhead
+        if caught:
+            result['names'].append(table['names'][idx])
+            result['rarities'].append(table['rarities'][idx])
+            result['weights'].append(weight)
+            result['exp'].append(exp)
+            result['gold'].append(weight * table['price'][idx])
+    return casts, used
+
+def settle_exp_batch(level: int, exp: int, amounts, day: int, last_level_up_day: int):
+    """按顺序结算一串经验，结果与逐条调用 settle_exp 相同（每天最多升一级，之后的经验作废）
+    返回 (新等级, 新经验, 是否升级, 实际计入的经验)。
+    """
+    if level >= MAX_LEVEL or last_level_up_day >= day or not amounts:
+        return level, exp, False, 0
+    running = list(itertools.accumulate(amounts))
+    exp_needed = LEVEL_UP_EXP.get(level, 0)
+    if exp_needed:
+        # 经验都是正数，累计值单调递增：二分找到第一次够升级的那条鱼
+        cut = bisect.bisect_left(running, exp_needed - exp)
+        if cut < len(running):
+            return level + 1, exp + running[cut] - exp_needed, True, running[cut]
+    return level, exp + running[-1], False, running[-1]
+
+
+# ==========================
+# 钓鱼引擎（无界面）
+# ==========================
+QTE_KEYS = ('a', 'd', 'w', 's')
+QTE_FINAL_KEY = 'space'
+QTE_LENGTH = {
+    RARITY_COMMON: 1,
+    RARITY_UNCOMMON: 2,
+    RARITY_RARE: 3,
+    RARITY_EPIC: 4
+}
+
+class CastRules:
+    """一竿的随机规则（抽鱼种、重量、等待时间、QTE 序列），随机数取自会话的各个流
+    单竿的 FishingEngine 与多竿的 MultiLineFishing 共用；子类提供 self.game_state。
+    """
     def _select_fish_by_probability(self, location: str):
-        """根据概率选择要钓的鱼"""
-        # 如果地点不存在，默认使用小溪
-        fish_list = LOCATION_FISH_CONFIG.get(location, LOCATION_FISH_CONFIG["小溪"])
-        
-        # 计算总权重
-        weighted_list = []
-        total_weight = 0
-        for fish_info in fish_list:
-            rarity = fish_info[1]
-            base_weight = fish_info[4]
-            mult = self.game_state.get_rarity_weight_multiplier(rarity)
-            adjusted = base_weight * mult
-            weighted_list.append((fish_info, adjusted))
-            total_weight += adjusted
-        
-        # 随机选择
-        rand = random.uniform(0, total_weight)
-        cumulative = 0
-        
-        for fish_info, adj_weight in weighted_list:
-            cumulative += adj_weight
-            if rand <= cumulative:
-                return fish_info
-        
-        # 默认返回第一种
-        return weighted_list[0][0]
+        """根据概率选择要钓的鱼（别名表按地点与装备缓存，O(1) 抽取）"""
+        game_state = self.game_state
+        sampler = fish_sampler(
+            location,
+            game_state.inventory.get('selected_bait', '普通鱼饵'),
+            getattr(game_state, 'current_weather', None),
+            getattr(game_state, 'current_time_slot', None),
+        )
+        return sampler.draw(game_state.rng.selection)
     
     def _calculate_fish_weight(self, fish_info):
         """计算鱼的重量（在范围内随机）"""
         _, _, min_weight, max_weight, _, _ = fish_info
-        return round(random.uniform(min_weight, max_weight), 2)
+        return round(self.game_state.rng.weight.uniform(min_weight, max_weight), 2)
     
     def _calculate_wait_time(self, fish_info):
         """计算等待时间（根据鱼的稀有度）"""
         _, _, _, _, _, time_range = fish_info
         min_time, max_time = time_range
-        base_time = random.uniform(min_time, max_time)
+        base_time = self.game_state.rng.wait.uniform(min_time, max_time)
         return base_time * self.game_state.get_wait_time_multiplier()
 
     def _generate_qte_sequence(self, rarity: str):
-        """根据稀有度生成按键序列"""
-        pool = ['a', 'd', 'w', 's', 'space']
-        length_map = {
-            RARITY_COMMON: 1,
-            RARITY_UNCOMMON: 2,
-            RARITY_RARE: 3,
-            RARITY_EPIC: 4
-        }
-        length = length_map.get(rarity, 1)
-        seq = [random.choice(pool[:-1]) for _ in range(length - 1)] if length > 1 else []
-        seq.append('space')
+        """根据稀有度生成按键序列（最后一键总是空格）"""
+        length = QTE_LENGTH.get(rarity, 1)
+        rng = self.game_state.rng.qte
+        seq = [rng.choice(QTE_KEYS) for _ in range(length - 1)]
+        seq.append(QTE_FINAL_KEY)
         return seq
-    
-    def set_callbacks(self, on_bite, on_fishing_end):
-        """设置回调函数"""
-        self.on_bite_callback = on_bite
-        self.on_fishing_end_callback = on_fishing_end
-    
-    def start_fishing(self):
-        """开始钓鱼（在新线程中执行）"""
+
+
+class FishingEngine(CastRules):
+    """钓鱼流程：抛竿 → 等待咬钩 → QTE → 收获 → 经验 → 存档
+    不依赖 tkinter，也不自己计时：调用方用 cast / tick / press 传入当前时间推进流程，
+    结果通过回调通知。Tk 界面、基准测试和服务器都只是它的一个驱动方。
+    回调：
+        on_bite(序列)                               咬钩，开始 QTE
+        on_progress(已按对的键数)                    QTE 按对一键
+        on_end(成功, 鱼名, 重量, 经验, 升级结果)       本次钓鱼结束（失败时只有第一个参数）
+    """
+    IDLE = "idle"
+    WAITING = "waiting"  # 已抛竿，等待咬钩
+    BITE = "bite"        # 已咬钩，QTE 进行中
+
+    def __init__(self, game_state: GameState, on_bite=None, on_progress=None, on_end=None, persist=True):
+        self.game_state = game_state
+        self.clock = game_state.clock  # 不传 now 时从这里取时间
+        self.on_bite = on_bite
+        self.on_progress = on_progress
+        self.on_end = on_end
+        self.persist = persist  # 每次结束后给存档写入器一个节拍
+        self.phase = self.IDLE
+        self.generation = 0  # 每次抛竿或取消加一；驱动方据此识别过期的定时事件
+        self.current_selected_fish = None
+        self.current_bait_used = '普通鱼饵'
+        self.catch_window = 1.0  # 咬钩后的反应时间窗口（秒），抛竿时按鱼竿覆盖
+        self.bite_at = None
+        self.qte_sequence = []
+        self.qte_index = 0
+        self.qte_deadline = None
+
+    # ---------- 流程 ----------
+    def cast(self, now=None) -> bool:
+        """抛竿：消耗鱼饵、选定这一竿的鱼并安排咬钩时间"""
         if self.game_state.is_fishing:
             return False
-        
+        now = self.clock.now() if now is None else now
         self.game_state.start_fishing()
         self.game_state.roll_environment()
         self.current_bait_used = self.game_state.consume_bait()
         self.catch_window = self.game_state.get_catch_window()
         
         # 根据当前地点选择要钓的鱼
-        location = self.game_state.current_location
-        self.current_selected_fish = self._select_fish_by_probability(location)
-        
-        # 在后台线程中等待随机时间
-        self.fishing_thread = threading.Thread(target=self._wait_for_bite, daemon=True)
-        self.fishing_thread.start()
+        self.current_selected_fish = self._select_fish_by_probability(self.game_state.current_location)
+        self.bite_at = now + self._calculate_wait_time(self.current_selected_fish)
+        self.qte_sequence = []
+        self.qte_index = 0
+        self.qte_deadline = None
+        self.phase = self.WAITING
+        self.generation += 1
         return True
-    
-    def _wait_for_bite(self):
-        """等待咬钩（在后台线程中运行）"""
+
+    def next_deadline(self):
+        """下一次需要 tick 的时间（咬钩或 QTE 超时），空闲时为 None"""
+        if self.phase == self.WAITING:
+            return self.bite_at
+        if self.phase == self.BITE:
+            return self.qte_deadline
+        return None
+
+    def tick(self, now=None):
+        """推进到 now：到点咬钩，或 QTE 超时判负。返回 'bite' / 'timeout' / None"""
+        now = self.clock.now() if now is None else now
+        if self.phase == self.WAITING and not self.game_state.is_fishing:
+            # 外部重置了钓鱼状态（例如切换场景）
+            self.phase = self.IDLE
+            return None
+        if self.phase == self.WAITING and now >= self.bite_at:
+            self.game_state.on_bite()
+            self.qte_sequence = self._generate_qte_sequence(self.current_selected_fish[1])
+            self.qte_index = 0
+            self.qte_deadline = now + self.catch_window
+            self.phase = self.BITE
+            if self.on_bite:
+                self.on_bite(self.qte_sequence)
+            return 'bite'
+        if self.phase == self.BITE and now > self.qte_deadline:
+            self._fail()
+            return 'timeout'
+        return None
+
+    def press(self, key: str, now=None):
+        """QTE 按键。返回 'progress' / 'caught' / 'failed'，不在 QTE 中时为 None"""
+        if self.phase != self.BITE:
+            return None
+        now = self.clock.now() if now is None else now
+        if now > self.qte_deadline or key != self.qte_sequence[self.qte_index]:
+            self._fail()
+            return 'failed'
+        self.qte_index += 1
+        if self.qte_index < len(self.qte_sequence):
+            if self.on_progress:
+                self.on_progress(self.qte_index)
+            return 'progress'
+        self.resolve_qte_success()
+        return 'caught'
+
+    def resolve_qte_success(self) -> bool:
+        """QTE 成功，判定钓鱼成功：记录统计、放进鱼袋、结算经验"""
+        if not self.game_state.is_bite_occurred or self.game_state.catch_success:
+            return False
         if not self.current_selected_fish:
-            return
-        
-        # 根据选中的鱼计算等待时间
-        wait_time = self._calculate_wait_time(self.current_selected_fish)
-        time.sleep(wait_time)
-        
-        # 检查是否仍在钓鱼状态
+            return False
+        fish_name = self.current_selected_fish[0]
+        weight = self._calculate_fish_weight(self.current_selected_fish)
+        self.game_state.on_catch_success(fish_name, weight)
+        exp_gain, level_result = self.game_state.record_catch(self.current_selected_fish, weight)
+        self._finish(True, fish_name, weight, exp_gain, level_result)
+        return True
+
+    def cancel(self) -> bool:
+        """取消钓鱼"""
         if not self.game_state.is_fishing:
+            return False
+        self.game_state.reset_fishing_state()
+        self.phase = self.IDLE
+        self.generation += 1
+        return True
+
+    def _fail(self):
+        self.game_state.on_catch_failed()
+        self._finish(False)
+
+    def _finish(self, success: bool, *result):
+        self.phase = self.IDLE
+        self.qte_deadline = None
+        self.game_state.reset_fishing_state()
+        if self.persist:
+            self.game_state.tick_stats()
+        if self.on_end:
+            self.on_end(success, *result)
+
+
+# ==========================
+# 定时调度（单线程）
+# ==========================
+class TimerHandle:
+    """一个已登记的定时事件；触发或取消后 callback 置空，立即释放它引用的对象"""
+    __slots__ = ('when', 'callback', 'args')
+
+    def __init__(self, when: float, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+
+    @property
+    def pending(self) -> bool:
+        return self.callback is not None
+
+
+TIMER_COMPACT_MIN = 64  # 堆里已取消的条目超过这个数且多于有效条目时整体重建一次
+
+class TimerScheduler:
+    """按游戏时钟到期的定时事件（咬钩、QTE 超时）：heapq 二叉堆，登记与触发 O(log n)
+    取消只把事件标记为失效（O(1)），失效条目到堆顶时顺手弹出，过多时整体重建，
+    均摊下来每次取消 O(log n)，堆的大小始终不超过有效事件数的两倍左右。
+    同一时刻到期的事件按登记顺序触发。不自己计时，也不加锁：由驱动方在同一个线程里
+    调用 run_due（Tk 界面见 TkScheduler，模拟与基准测试配合 ManualClock 直接调用）。
+    """
+    def __init__(self, clock: Clock = None):
+        self.clock = clock or REAL_CLOCK
+        self._heap = []  # [(到期时间, 登记序号, TimerHandle)]
+        self._seq = itertools.count()
+        self._live = 0   # 尚未触发也未取消的事件数
+        self._running = False
+        self.fired = 0      # 累计触发的事件数（用于基准测试）
+        self.cancelled = 0  # 累计取消的事件数
+
+    def __len__(self):
+        return self._live
+
+    def call_at(self, when: float, callback, *args) -> TimerHandle:
+        """在游戏时间 when 调用 callback(*args)"""
+        handle = TimerHandle(when, callback, args)
+        heapq.heappush(self._heap, (when, next(self._seq), handle))
+        self._live += 1
+        if self._heap[0][2] is handle and not self._running:
+            self._head_changed()
+        return handle
+
+    def call_later(self, delay: float, callback, *args) -> TimerHandle:
+        return self.call_at(self.clock.now() + delay, callback, *args)
+
+    def cancel(self, handle: TimerHandle) -> bool:
+        """取消一个尚未触发的事件，返回是否确实取消了"""
+        if handle.callback is None:
+            return False
+        handle.callback = handle.args = None
+        self._live -= 1
+        self.cancelled += 1
+        heap = self._heap
+        dead = len(heap) - self._live
+        if dead > TIMER_COMPACT_MIN and dead > self._live:
+            self._heap = [entry for entry in heap if entry[2].callback is not None]
+            heapq.heapify(self._heap)
+            head_moved = True
+        else:
+            head_moved = heap[0][2] is handle
+            self._drop_cancelled()
+        if head_moved and not self._running:
+            self._head_changed()
+        return True
+
+    def _drop_cancelled(self):
+        heap = self._heap
+        while heap and heap[0][2].callback is None:
+            heapq.heappop(heap)
+
+    def next_deadline(self):
+        """最早的到期时间，没有事件时为 None"""
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now=None) -> int:
+        """触发所有到期（when <= now）的事件，返回触发的个数
+        本轮回调里新登记的事件留到下一轮，重新登记自己的回调不会在同一轮里空转。
+        """
+        now = self.clock.now() if now is None else now
+        heap = self._heap
+        pop = heapq.heappop
+        limit = next(self._seq)
+        deferred = []
+        fired = 0
+        self._running = True
+        try:
+            while heap and heap[0][0] <= now:
+                entry = pop(heap)
+                handle = entry[2]
+                callback = handle.callback
+                if callback is None:
+                    continue
+                if entry[1] > limit:
+                    deferred.append(entry)
+                    continue
+                args = handle.args
+                handle.callback = handle.args = None
+                self._live -= 1
+                fired += 1
+                callback(*args)
+                heap = self._heap  # 回调里的取消可能重建了堆
+        finally:
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+            self._running = False
+            self.fired += fired
+            self._drop_cancelled()
+            self._head_changed()
+        return fired
+
+    def _head_changed(self):
+        """最早的到期时间变了（子类据此重新挂真实计时器）"""
+
+
+class TkScheduler(TimerScheduler):
+    """挂在 Tk 的 after 循环上的调度器：始终只保留一个 after，指向最早的到期时间
+    所有事件都在 Tk 主线程触发，不再为每一竿开后台线程。
+    """
+    def __init__(self, root, clock: Clock = None):
+        super().__init__(clock)
+        self.root = root
+        self._after_id = None
+        self._after_when = None
+
+    def _head_changed(self):
+        when = self.next_deadline()
+        if when == self._after_when:
             return
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = self._after_when = None
+        if when is None:
+            return
+        delay = self.clock.real_seconds(max(0.0, when - self.clock.now()))
+        self._after_id = self.root.after(math.ceil(delay * 1000), self._fire)
+        self._after_when = when
+
+    def _fire(self):
+        self._after_id = self._after_when = None
+        self.run_due()
+
+    def close(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = self._after_when = None
+
+
+# ==========================
+# 钓鱼管理器（Tk 驱动）
+# ==========================
+QTE_TIMEOUT_SLACK = 0.01  # QTE 判定在截止时刻之后才算超时，定时器稍晚一点触发
+
+class CastHandle:
+    """一竿的句柄：generation 为抛竿时引擎的代数，取消或重新抛竿后旧句柄自动失效"""
+    __slots__ = ('manager', 'generation')
+
+    def __init__(self, manager, generation: int):
+        self.manager = manager
+        self.generation = generation
+
+    @property
+    def active(self) -> bool:
+        engine = self.manager.engine
+        return engine.generation == self.generation and engine.phase != FishingEngine.IDLE
+
+    def cancel(self) -> bool:
+        """只取消这一竿；已经结束或被新的一竿取代时什么也不做"""
+        return self.active and self.manager.cancel_fishing()
+
+
+class FishingManager:
+    """用定时调度器驱动 FishingEngine：咬钩与 QTE 超时都是调度器里的事件
+    Tk 界面里调度器挂在 after 循环上，事件在主线程触发；root 为 None 时（无界面）回调直接调用。
+    """
+    def __init__(self, game_state: GameState, root, scheduler: TimerScheduler = None):
+        self.game_state = game_state
+        self.root = root
+        self.scheduler = scheduler if scheduler is not None else TkScheduler(root, game_state.clock)
+        self.engine = FishingEngine(game_state, on_bite=self._bite, on_end=self._end)
+        self._timer = None  # 当前这一竿挂在调度器里的事件
         
-        # 触发咬钩事件
-        self.game_state.on_bite()
-        rarity = self.current_selected_fish[1]
-        self.qte_sequence = self._generate_qte_sequence(rarity)
-        self.qte_deadline = time.time() + self.catch_window
-        
-        # 在主线程中调用UI更新
-        if self.on_bite_callback:
-            self.root.after(0, lambda seq=self.qte_sequence: self.on_bite_callback(seq))
-        
-        # 启动反应时间窗口
-        catch_thread = threading.Thread(target=self._catch_window_timer, daemon=True)
-        catch_thread.start()
-    
-    def _catch_window_timer(self):
-        """反应时间窗口计时器"""
-        time.sleep(self.catch_window)
-        
-        # 如果超时仍未成功，判定为失败
-        # 注意：需要再次检查状态，因为用户可能在此期间成功捕获
-        if self.game_state.is_bite_occurred and not self.game_state.catch_success:
-            self.game_state.on_catch_failed()
-            if self.on_fishing_end_callback:
-                self.root.after(0, lambda: self.on_fishing_end_callback(False))
-    
-    def resolve_qte_success(self):
-        """QTE 成功，判定钓鱼成功"""
-        if self.game_state.is_bite_occurred and not self.game_state.catch_success:
-            if not self.current_selected_fish:
-                return False
-            fish_name = self.current_selected_fish[0]
-            rarity = self.current_selected_fish[1]
-            min_weight = self.current_selected_fish[2]
-            max_weight = self.current_selected_fish[3]
-            weight = self._calculate_fish_weight(self.current_selected_fish)
-            self.game_state.on_catch_success(fish_name, weight)
-            self.game_state.add_caught_fish(fish_name, weight, rarity)
-            
-            # 计算并添加经验
-            exp_gain = self.game_state.calculate_exp_gain(rarity, weight, min_weight, max_weight)
-            level_result = self.game_state.add_exp(exp_gain)
-            
-            if self.on_fishing_end_callback:
-                self.root.after(0, lambda: self.on_fishing_end_callback(
-                    True, fish_name, weight, exp_gain, level_result
-                ))
-            return True
-        return False
-    
+        # 回调函数（由UI设置）
+        self.on_bite_callback = None  # 咬钩时的回调，参数(qte_sequence)
+        self.on_fishing_end_callback = None  # 钓鱼结束时的回调
+
+    @property
+    def catch_window(self) -> float:
+        return self.engine.catch_window
+
+    def set_callbacks(self, on_bite, on_fishing_end):
+        """设置回调函数"""
+        self.on_bite_callback = on_bite
+        self.on_fishing_end_callback = on_fishing_end
+
+    def _post(self, callback, *args):
+        if not callback:
+            return
+        if self.root is None:
+            callback(*args)
+        else:
+            # 弹窗等界面操作放到下一轮事件循环，不阻塞调度器里其他到期的事件
+            self.root.after(0, lambda: callback(*args))
+
+    def _bite(self, sequence):
+        self._post(self.on_bite_callback, list(sequence))
+
+    def _end(self, success, *result):
+        self._disarm()
+        self._post(self.on_fishing_end_callback, success, *result)
+
+    def _arm(self):
+        """按引擎的下一个截止时间（咬钩或 QTE 超时）登记事件"""
+        self._disarm()
+        deadline = self.engine.next_deadline()
+        if deadline is None:
+            return
+        if self.engine.phase == FishingEngine.BITE:
+            deadline += QTE_TIMEOUT_SLACK
+        self._timer = self.scheduler.call_at(deadline, self._on_timer, self.engine.generation)
+
+    def _disarm(self):
+        if self._timer is not None:
+            self.scheduler.cancel(self._timer)
+            self._timer = None
+
+    def _on_timer(self, generation: int):
+        if generation != self.engine.generation:
+            return  # 已取消或已重新抛竿的旧事件
+        self._timer = None
+        result = self.engine.tick()
+        if result == 'bite' or (result is None and self.engine.phase != FishingEngine.IDLE):
+            # 咬钩后开始 QTE 计时。调度器与引擎共用时钟时不会出现未到点的情况，这里只是防御：
+            # 传入的调度器用的是另一个时钟时，按原截止时间重新登记，不让这一竿卡住
+            self._arm()
+
+    def start_fishing(self):
+        """开始钓鱼（咬钩时间登记到调度器），返回这一竿的 CastHandle；正在钓鱼时返回 None"""
+        if not self.engine.cast():
+            return None
+        self._arm()
+        return CastHandle(self, self.engine.generation)
+
+    def press(self, key: str):
+        """QTE 按键（Tk 主线程调用）"""
+        return self.engine.press(key)
+
     def cancel_fishing(self):
-        """取消钓鱼"""
-        if self.game_state.is_fishing:
-            self.game_state.reset_fishing_state()
-            return True
-        return False
+        """取消钓鱼：立即从调度器撤销这一竿的事件"""
+        self._disarm()
+        return self.engine.cancel()
+
+    def close(self):
+        """离开钓鱼场景时撤销挂起的事件"""
+        self._disarm()
+
+
+# ==========================
+# 多竿钓鱼
+# ==========================
+MAX_LINES = 24  # 每个钓手同时能放出的鱼竿数
+
+class FishingLine:
+    """放出去的一根线：这一竿自己的鱼、鱼饵、咬钩时刻、QTE 序列与截止时间"""
+    __slots__ = ('line_id', 'fish', 'bait', 'catch_window', 'bite_at', 'sequence', 'index', 'deadline',
+                 'phase', 'timer')
+
+    def __init__(self, line_id: int, fish, bait: str, catch_window: float, bite_at: float):
+        self.line_id = line_id
+        self.fish = fish
+        self.bait = bait
+        self.catch_window = catch_window
+        self.bite_at = bite_at
+        self.sequence = None
+        self.index = 0
+        self.deadline = None
+        self.phase = FishingEngine.WAITING
+        self.timer = None  # 调度器里这根线的下一个事件（咬钩或 QTE 超时）
+
+
+class MultiLineFishing(CastRules):
+    """一个钓手同时放出多根线，每根线是一个轻量的 FishingLine，咬钩与超时都挂在共用的调度器上
+    咬钩后各线的 QTE 判定时间照常从咬钩时刻算起；玩家一次只能拉一根，按键作用于最早咬钩、
+    仍在判定中的那根线（active），它结束后轮到下一根。不使用 GameState 上单竿的钓鱼标志。
+    回调：
+        on_bite(线)                                   某根线咬钩
+        on_progress(线)                               当前这根线按对一键
+        on_end(线, 成功, 鱼名, 重量, 经验, 升级结果)     某根线结束（失败时只有前两个参数）
+    """
+    def __init__(self, game_state: GameState, scheduler: TimerScheduler, max_lines: int = MAX_LINES,
+                 on_bite=None, on_progress=None, on_end=None, persist=True):
+        self.game_state = game_state
+        self.scheduler = scheduler
+        self.clock = scheduler.clock
+        self.max_lines = max_lines
+        self.on_bite = on_bite
+        self.on_progress = on_progress
+        self.on_end = on_end
+        self.persist = persist
+        self.lines = {}        # 线编号 -> 放出去的线
+        self._hooked = deque()  # 按咬钩先后排队的线（已结束的在队首时顺手弹出）
+        self._ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def cast(self, now=None):
+        """再放出一根线，返回 FishingLine；线已放满时返回 None"""
+        if len(self.lines) >= self.max_lines:
+            return None
+        now = self.clock.now() if now is None else now
+        game_state = self.game_state
+        game_state.roll_environment()
+        bait = game_state.consume_bait()
+        fish = self._select_fish_by_probability(game_state.current_location)
+        line = FishingLine(next(self._ids), fish, bait, game_state.get_catch_window(),
+                           now + self._calculate_wait_time(fish))
+        line.timer = self.scheduler.call_at(line.bite_at, self._bite, line)
+        self.lines[line.line_id] = line
+        return line
+
+    def active(self):
+        """当前按键作用的线：最早咬钩、仍在 QTE 判定中的那根"""
+        hooked = self._hooked
+        while hooked and hooked[0].phase != FishingEngine.BITE:
+            hooked.popleft()
+        return hooked[0] if hooked else None
+
+    def _bite(self, line: FishingLine):
+        if line.phase != FishingEngine.WAITING:
+            return  # 已收回的线
+        line.sequence = self._generate_qte_sequence(line.fish[1])
+        line.index = 0
+        line.deadline = line.bite_at + line.catch_window
+        line.phase = FishingEngine.BITE
+        line.timer = self.scheduler.call_at(line.deadline + QTE_TIMEOUT_SLACK, self._expire, line)
+        self._hooked.append(line)
+        if self.on_bite:
+            self.on_bite(line)
+
+    def _expire(self, line: FishingLine):
+        line.timer = None
+        self._finish(line, False)
+
+    def press(self, key: str, now=None):
+        """给当前这根线按键，返回 'progress' / 'caught' / 'failed'；没有咬钩的线时为 None"""
+        line = self.active()
+        if line is None:
+            return None
+        now = self.clock.now() if now is None else now
+        if now > line.deadline or key != line.sequence[line.index]:
+            self._finish(line, False)
+            return 'failed'
+        line.index += 1
+        if line.index < len(line.sequence):
+            if self.on_progress:
+                self.on_progress(line)
+            return 'progress'
+        weight = self._calculate_fish_weight(line.fish)
+        exp_gain, level_result = self.game_state.record_catch(line.fish, weight)
+        self._finish(line, True, line.fish[0], weight, exp_gain, level_result)
+        return 'caught'
+
+    def cancel(self, line: FishingLine) -> bool:
+        """收回一根线（撤销它挂在调度器里的事件）"""
+        if self.lines.pop(line.line_id, None) is None:
+            return False
+        if line.timer is not None:
+            self.scheduler.cancel(line.timer)
+            line.timer = None
+        line.phase = FishingEngine.IDLE
+        return True
+
+    def cancel_all(self) -> int:
+        lines = list(self.lines.values())
+        for line in lines:
+            self.cancel(line)
+        return len(lines)
+
+    def _finish(self, line: FishingLine, success: bool, *result):
+        if line.timer is not None:
+            self.scheduler.cancel(line.timer)
+            line.timer = None
+        line.phase = FishingEngine.IDLE
+        self.lines.pop(line.line_id, None)
+        if self.persist:
+            self.game_state.tick_stats()
+        if self.on_end:
+            self.on_end(line, success, *result)
+
+
+# ==========================
+# asyncio 驱动（服务器）
+# ==========================
+FishingEvent = namedtuple('FishingEvent', 'kind time data')  # kind: bite / progress / end / cancelled
+CastResult = namedtuple('CastResult', 'success fish weight exp level_result')
+EVENT_QUEUE_SIZE = 64  # 每个钓手的事件队列上限，消费方跟不上时丢弃最早的事件
+
+class AsyncFishingManager:
+    """在 asyncio 事件循环里驱动 FishingEngine，每个钓手一个实例，不开线程
+    start_fishing() 抛竿并返回这一竿的 Task（await 得到 CastResult，取消钓鱼时抛出 CancelledError）；
+    咬钩等待是 asyncio.sleep，QTE 判定窗口是一个可取消的 Task，按键用 press()。
+    events() 是异步事件流（FishingEvent），队列有上限，每一竿只占用一个 Task、一个 Future 和
+    最多一个计时 Task。游戏时间换算成真实秒数由 clock.real_seconds 决定；配合 VirtualTimeLoop
+    与 ManualClock 时没有真实等待。
+    """
+    def __init__(self, game_state: GameState, queue_size: int = EVENT_QUEUE_SIZE):
+        self.game_state = game_state
+        self.clock = game_state.clock
+        self.engine = FishingEngine(game_state, on_bite=self._bite, on_progress=self._progress, on_end=self._end)
+        self._events = asyncio.Queue(queue_size)
+        self._cast = None     # 当前这一竿的 Task
+        self._window = None   # QTE 判定窗口的计时 Task
+        self._outcome = None  # 这一竿结果的 Future
+        self.dropped = 0      # 因队列满被丢弃的事件数
+
+    # ---------- 事件流 ----------
+    def _emit(self, kind: str, data=None):
+        event = FishingEvent(kind, self.clock.now(), data)
+        try:
+            self._events.put_nowait(event)
+        except asyncio.QueueFull:
+            self._events.get_nowait()
+            self._events.put_nowait(event)
+            self.dropped += 1
+
+    async def events(self):
+        """异步事件流：async for event in manager.events()；close() 后结束"""
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+
+    def _bite(self, sequence):
+        self._emit('bite', list(sequence))
+        self._window = asyncio.get_running_loop().create_task(
+            self._expire(self.engine.qte_deadline + QTE_TIMEOUT_SLACK, self.engine.generation))
+
+    def _progress(self, index):
+        self._emit('progress', index)
+
+    def _end(self, success, *result):
+        if self._window is not None and self._window is not asyncio.current_task():
+            self._window.cancel()
+        self._window = None
+        outcome = CastResult(success, *result) if success else CastResult(False, None, None, 0, None)
+        self._emit('end', outcome)
+        if self._outcome is not None and not self._outcome.done():
+            self._outcome.set_result(outcome)
+
+    # ---------- 计时 ----------
+    async def _sleep_until(self, when: float):
+        # 事件循环的定时器可能提前最多一个时钟精度醒来（Windows 上约 15.6 ms），不到点就接着睡
+        while (delay := when - self.clock.now()) > 0:
+            await asyncio.sleep(self.clock.real_seconds(delay))
+
+    async def _expire(self, deadline: float, generation: int):
+        """QTE 判定窗口：到点仍未完成则判负（按键完成时这个 Task 被取消）"""
+        await self._sleep_until(deadline)
+        if generation == self.engine.generation:
+            self.engine.tick()
+
+    async def _run_cast(self):
+        generation = self.engine.generation
+        try:
+            await self._sleep_until(self.engine.bite_at)
+            if generation == self.engine.generation:
+                self.engine.tick()
+            if generation != self.engine.generation or self.engine.phase == FishingEngine.IDLE:
+                raise asyncio.CancelledError()  # 已取消，或外部重置了钓鱼状态
+            return await self._outcome
+        finally:
+            self._cast = self._outcome = None
+
+    # ---------- 操作 ----------
+    def start_fishing(self):
+        """抛竿，返回这一竿的 Task；正在钓鱼时返回 None"""
+        if not self.engine.cast():
+            return None
+        loop = asyncio.get_running_loop()
+        self._outcome = loop.create_future()
+        self._cast = loop.create_task(self._run_cast())
+        return self._cast
+
+    def press(self, key: str):
+        """QTE 按键，返回值同 FishingEngine.press"""
+        return self.engine.press(key)
+
+    def cancel_fishing(self) -> bool:
+        """取消钓鱼：撤销等待与计时 Task，这一竿的 await 抛出 CancelledError"""
+        if not self.engine.cancel():
+            return False
+        for task in (self._window, self._cast):
+            if task is not None:
+                task.cancel()
+        self._window = None
+        self._emit('cancelled')
+        return True
+
+    def close(self):
+        """取消进行中的一竿并结束事件流"""
+        self.cancel_fishing()
+        try:
+            self._events.put_nowait(None)
+        except asyncio.QueueFull:
+            self._events.get_nowait()
+            self._events.put_nowait(None)
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """不阻塞的选择器：没有就绪的 IO 时把手动时钟直接推进到下一个定时器"""
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if not events and timeout:
+            self.clock.advance(timeout)
+        return events
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """按 ManualClock 计时的事件循环：所有任务都在等待时直接跳到下一个到期时刻
+    asyncio.sleep(60) 不占用真实时间，适合模拟与基准测试里跑成千上万个钓手。
+    """
+    def __init__(self, clock: "ManualClock" = None):
+        self.clock = clock or ManualClock()
+        super().__init__(_VirtualSelector(self.clock))
+
+    def time(self) -> float:
+        return self.clock.now()
+
+
+# ==========================
+# 会话录制与回放
+# ==========================
+RECORD_PATH = os.environ.get("FISHING_RECORD")  # 设置后界面把本局操作录制到这个文件
+RECORDING_VERSION = 1
+
+# 界面会直接调用、会改变存档的 GameState 操作（录制时记下参数，回放时原样调用）
+SCENE_ACTIONS = (
+    'acquire_item', 'add_day', 'add_rod', 'apply_mood_decay', 'apply_sync_ops', 'boost_student_trust',
+    'consume_item', 'cook_one_fish', 'ensure_daily_request', 'equip_rod', 'gift_to_student',
+    'mark_active', 'register_student_encounter', 'remove_one_fish', 'reset_fishing_state', 'resolve_idle',
+    'roll_drift_bottle', 'select_bait', 'sell_all_fish', 'spend_money', 'try_rescue_student',
+)
+ENGINE_ACTIONS = ('cast', 'tick', 'press', 'cancel')
+
+
+def _state_json(game_state) -> dict:
+    """存档三个分区的 JSON 形式（鱼袋为列式格式），用于录制与比较"""
+    return json.loads(json.dumps(game_state._stats_sections(), ensure_ascii=False, default=_json_default))
+
+
+class SessionRecorder:
+    """录制一个会话的全部输入：开始时的存档与随机数种子、抛竿/按键（带游戏内时间）和界面操作
+    只记录最外层调用（引擎内部对 GameState 的调用不重复记录）；多个线程驱动时按实际执行顺序记录。
+    """
+    def __init__(self, game_state: GameState):
+        self.game_state = game_state
+        clock = game_state.clock
+        rng = game_state.rng
+        fresh = all(getattr(rng, name).getstate() == rng.stream(name).getstate() for name in rng.STREAMS)
+        game_state.recorder = self
+        self.header = {
+            'version': RECORDING_VERSION,
+            'seed': rng.seed,
+            # 随机数流已经被用过时只能保存完整状态（每个流约 2.5 KB）
+            'rng_state': None if fresh else {name: getattr(rng, name).getstate()[1] for name in rng.STREAMS},
+            'start': clock.now(),
+            'start_datetime': clock.current_datetime().isoformat(),
+            'initial': _state_json(game_state),
+        }
+        self.actions = []
+        self._lock = threading.RLock()
+        self._depth = 0
+        for name in SCENE_ACTIONS:
+            def call(method, args, kwargs, name=name):
+                entry = [clock.now(), name, list(args)] + ([kwargs] if kwargs else [])
+                return method(*args, **kwargs), entry
+            self._wrap(game_state, name, call)
+
+    def attach_engine(self, engine: FishingEngine):
+        """录制这个引擎的抛竿与按键；每个钓鱼场景各有一个引擎，回放时同样切换"""
+        clock = engine.clock
+        with self._lock:
+            self.actions.append([clock.now(), 'engine'])
+
+        def call(method, args, name):
+            # 把默认的“当前时间”换成具体时刻，回放时才能原样重现
+            if name == 'cancel':
+                now, result = clock.now(), method()
+                entry = [now, 'cancel']
+            elif name == 'press':
+                key, now = args[0], (args[1] if len(args) > 1 and args[1] is not None else clock.now())
+                result = method(key, now)
+                entry = [now, 'press', key]
+            else:
+                now = args[0] if args and args[0] is not None else clock.now()
+                location = self.game_state.current_location  # 场景直接写在 game_state 上的地点
+                result = method(now)
+                entry = [now, 'cast', location] if name == 'cast' else [now, name]
+            return result, (entry if result not in (None, False) else None)
+        for name in ENGINE_ACTIONS:
+            self._wrap(engine, name, lambda method, args, kwargs, name=name: call(method, args, name))
+
+    def _wrap(self, target, name, call):
+        """替换 target 上的方法：最外层调用时执行并记录 call 返回的条目"""
+        method = getattr(target, name)
+
+        def recorded(*args, **kwargs):
+            with self._lock:
+                if self._depth:
+                    return method(*args, **kwargs)
+                self._depth += 1
+                try:
+                    result, entry = call(method, args, kwargs)
+                finally:
+                    self._depth -= 1
+                if entry is not None:
+                    self.actions.append(entry)
+                return result
+        setattr(target, name, recorded)
+
+    def recording(self) -> dict:
+        with self._lock:
+            return dict(self.header, actions=list(self.actions), final=_state_json(self.game_state))
+
+    def save(self, path: str) -> int:
+        """写出录像（zlib 压缩的 JSON），返回字节数"""
+        payload = zlib.compress(json.dumps(self.recording(), ensure_ascii=False, separators=(',', ':'),
+                                           default=_json_default).encode('utf-8'), 6)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        return len(payload)
+
+
+def load_recording(path: str) -> dict:
+    with open(path, 'rb') as f:
+        return json.loads(zlib.decompress(f.read()))
+
+
+def replay_session(recording: dict) -> GameState:
+    """用无界面引擎与手动时钟全速回放录像，返回回放后的 GameState（不写任何存档）"""
+    clock = ManualClock(recording['start'], datetime.datetime.fromisoformat(recording['start_datetime']))
+    storage = SqliteStorage(":memory:")
+    initial = json.loads(json.dumps(recording['initial']))
+    initial['schema_version'] = SAVE_SCHEMA_VERSION
+    loaded = _load_save_data(initial, 0)
+    storage.write_snapshot(DEFAULT_PROFILE, loaded._asdict(), 0)
+    game_state = GameState(storage=storage, write_behind=True, clock=clock, seed=recording['seed'])
+    storage.close()
+    if recording.get('rng_state'):
+        for name, internal in recording['rng_state'].items():
+            getattr(game_state.rng, name).setstate((3, tuple(internal), None))
+
+    engine = None
+    for action in recording['actions']:
+        when, op = action[0], action[1]
+        if when > clock._now:
+            clock.advance_to(when)
+        if op == 'press':
+            engine.press(action[2], when)
+        elif op == 'tick':
+            engine.tick(when)
+        elif op == 'cast':
+            game_state.current_location = action[2]
+            engine.cast(when)
+        elif op == 'cancel':
+            engine.cancel()
+        elif op == 'engine':
+            engine = FishingEngine(game_state, persist=False)
+        else:
+            getattr(game_state, op)(*action[2], **(action[3] if len(action) > 3 else {}))
+    return game_state
+
+
+def diff_session_state(expected: dict, actual: dict) -> list:
+    """比较两份 _state_json 结果，返回不一致的 '分区.键' 列表"""
+    diffs = []
+    for section in STATS_SECTIONS:
+        left, right = expected.get(section, {}), actual.get(section, {})
+        for key in sorted(set(left) | set(right)):
+            if left.get(key) != right.get(key):
+                diffs.append(f"{section}.{key}")
+    return diffs
+
+
+def verify_recording(recording: dict) -> list:
+    """回放并与录制时的最终状态比较；一致时返回空列表"""
+    return diff_session_state(recording['final'], _state_json(replay_session(recording)))
 
 
 # ==========================
@@ -996,6 +4421,7 @@ class SceneManager:
         self.game_state = game_state
         self.current_scene = None
         self.scenes = {}
+        self.scheduler = TkScheduler(root, game_state.clock)  # 所有钓鱼场景共用的定时调度器
         self.main_container = None
         self.top_bar = None  # 顶部状态栏
         self.day_label = None  # 天数标签
@@ -1507,6 +4933,11 @@ class MarketScene(BaseScene):
         craft_frame.pack(fill="x", pady=(0, 5))
         self._build_buy_buttons(craft_frame, CRAFT_ITEMS, category="craft")
 
+        advice_frame = StyledLabelFrame(self.frame, text="💡 购买建议", padding="5")
+        advice_frame.pack(fill="x", pady=(0, 5))
+        self.advice_var = tk.StringVar()
+        ttk.Label(advice_frame, textvariable=self.advice_var, justify="left").pack(anchor="w")
+
         self._refresh()
 
     def _build_buy_buttons(self, parent, config, category: str, show_owned=False):
@@ -1584,9 +5015,26 @@ class MarketScene(BaseScene):
         summary = self.game_state.fish_bag_summary()
         if summary:
             parts = [f"{name} x{data['count']} (~{data['total_weight']:.2f}kg)" for name, data in summary.items()]
-            self.sell_info_var.set("库存：" + "； ".join(parts))
+            quote = self.game_state.quote_fish_sale()
+            self.sell_info_var.set("库存：" + "； ".join(parts) + f"\n全部卖出约 {quote:.0f} 金币")
         else:
             self.sell_info_var.set("库存：无鱼可卖")
+        self._refresh_advice()
+
+    def _refresh_advice(self):
+        location = self.game_state.current_location
+        lines = [f"按在{location}钓鱼估算（今天{weather_for_day(self.game_state.get_day())}）："]
+        for item in self.game_state.purchase_advice(location):
+            gain = item['gain_per_minute']
+            if item['category'] == 'rod':
+                payback = f"，约钓 {item['payback_minutes']:.0f} 分钟回本" if item['payback_minutes'] \
+                    else "（这里的鱼用不上更长的判定时间）"
+                lines.append(f"{item['name']}：每分钟多赚 {gain:.1f} 金币{payback}")
+            else:
+                lines.append(f"{item['name']}：扣除鱼饵钱后每分钟 {gain:+.1f} 金币，经验 {item['exp_gain_per_minute']:+.1f}")
+        if len(lines) == 1:
+            lines.append("鱼竿都已拥有。")
+        self.advice_var.set("\n".join(lines))
 
 
 # ==========================
@@ -1594,6 +5042,12 @@ class MarketScene(BaseScene):
 # ==========================
 class StudentScene(BaseScene):
     """林汐事件与互动"""
+    # 送鱼时挑哪一条
+    FISH_POLICY_LABELS = {
+        FISH_POLICY_OLDEST: "最早钓到",
+        FISH_POLICY_HEAVIEST: "最重的",
+        FISH_POLICY_LIGHTEST: "最轻的",
+    }
 
     def create(self):
         self.frame = ttk.Frame(self.parent)
@@ -1678,6 +5132,14 @@ class StudentScene(BaseScene):
         ttk.Label(gift_frame, text="可赠送物品：").pack(side="left")
         self.gift_combo = ttk.Combobox(gift_frame, textvariable=self.gift_choice_var, width=40, state="readonly")
         self.gift_combo.pack(side="left", padx=6)
+        self.fish_policy_combo = ttk.Combobox(
+            gift_frame,
+            values=list(self.FISH_POLICY_LABELS.values()),
+            state="readonly",
+            width=8
+        )
+        self.fish_policy_combo.set(self.FISH_POLICY_LABELS[FISH_POLICY_OLDEST])
+        self.fish_policy_combo.pack(side="left", padx=4)
         self.gift_button = ModernButton(gift_frame, text="赠送", command=self._gift)
         self.gift_button.pack(side="left", padx=4)
         ModernButton(gift_frame, text="简易烹饪（消耗1条鱼）", command=self._cook).pack(side="left", padx=4)
@@ -1808,7 +5270,9 @@ class StudentScene(BaseScene):
             return
         
         if opt['type'] == 'fish':
-            fish = self.game_state.remove_one_fish(opt['name'])
+            label = self.fish_policy_combo.get()
+            policy = next((p for p, text in self.FISH_POLICY_LABELS.items() if text == label), FISH_POLICY_OLDEST)
+            fish = self.game_state.remove_one_fish(opt['name'], policy)
             if not fish:
                 messagebox.showwarning("赠送", "鱼袋里已经没有这种鱼了。")
                 self._refresh()
@@ -1894,11 +5358,14 @@ class FishingScene(BaseScene):
         self.game_state.current_location = self.location
         
         # 钓鱼管理器
-        self.fishing_manager = FishingManager(self.game_state, self.scene_manager.root)
+        self.fishing_manager = FishingManager(self.game_state, self.scene_manager.root, self.scene_manager.scheduler)
         self.fishing_manager.set_callbacks(
             on_bite=self._on_bite,
             on_fishing_end=self._on_fishing_end
         )
+        self.engine = self.fishing_manager.engine
+        if self.game_state.recorder:
+            self.game_state.recorder.attach_engine(self.engine)
         
         # 界面变量
         self.status_var = tk.StringVar(value="🟢 就绪")
@@ -1908,10 +5375,6 @@ class FishingScene(BaseScene):
         self.environment_var = tk.StringVar(value="")
         self.money_var = tk.StringVar(value=f"金币：{self.game_state.get_money():.0f}")
         self.level_var = tk.StringVar()
-        self.qte_sequence = []
-        self.qte_index = 0
-        self.qte_deadline = None
-        self.qte_timer_id = None
         
         # 呼吸灯点相关
         self.breathing_frame = None
@@ -1981,6 +5444,11 @@ class FishingScene(BaseScene):
         self.rod_combo.bind("<<ComboboxSelected>>", lambda e: self._on_rod_change())
         self.rod_combo.pack(side="left", padx=4)
         ttk.Label(equip_frame, text="(高级鱼竿延长QTE时间)").pack(side="left", padx=6)
+
+        # 当前装备的期望收益（解析计算，切换鱼饵/鱼竿时刷新）
+        self.odds_var = tk.StringVar()
+        ttk.Label(game_frame, textvariable=self.odds_var, foreground="#666666", wraplength=500,
+                  justify="left").pack(fill="x", pady=(0, 10))
         
         # 呼吸灯点区域（钓鱼时显示）
         self.breathing_frame = ttk.Frame(game_frame)
@@ -2059,6 +5527,7 @@ class FishingScene(BaseScene):
         
         # 初始化等级显示
         self._refresh_level_display()
+        self._refresh_odds_display()
     
     def _start_breathing(self):
         """开始呼吸灯动画"""
@@ -2139,9 +5608,6 @@ class FishingScene(BaseScene):
     
     def _on_bite(self, sequence):
         """咬钩事件处理"""
-        self.qte_sequence = sequence or []
-        self.qte_index = 0
-        self.qte_deadline = time.time() + self.fishing_manager.catch_window
         self._stop_breathing()
         self.status_var.set("⚡ 上钩了！")
         self.info_var.set("按提示键完成QTE，最后一键一定是空格！")
@@ -2206,45 +5672,22 @@ class FishingScene(BaseScene):
         self.game_state.reset_fishing_state()
 
     def _on_key_pressed(self, event):
-        """键盘按下事件处理，用于QTE"""
-        if not self.game_state.is_bite_occurred:
-            return
-        if not self.qte_sequence:
-            return
-        key = event.keysym.lower()
-        if key == 'space':
-            key = 'space'
-        if time.time() > (self.qte_deadline or 0):
-            self._fail_qte()
-            return
-        expected = self.qte_sequence[self.qte_index]
-        if key == expected:
-            self.qte_index += 1
+        """键盘按下事件处理，用于QTE（判定在引擎里完成，结束时通过回调通知）"""
+        if self.fishing_manager.press(event.keysym.lower()) == 'progress':
             self._update_qte_label()
-            if self.qte_index >= len(self.qte_sequence):
-                self.fishing_manager.resolve_qte_success()
-        else:
-            self._fail_qte()
-
-    def _fail_qte(self):
-        self.game_state.on_catch_failed()
-        self._on_fishing_end(False)
-        self.game_state.reset_fishing_state()
-        self.qte_sequence = []
-        self.qte_index = 0
-        self.qte_deadline = None
 
     def _update_qte_label(self):
-        if not self.qte_sequence:
+        engine = self.engine
+        if engine.phase != FishingEngine.BITE:
             self.qte_var.set("")
             return
         parts = []
-        for idx, key in enumerate(self.qte_sequence):
-            if idx == self.qte_index:
+        for idx, key in enumerate(engine.qte_sequence):
+            if idx == engine.qte_index:
                 parts.append(f"[{key.upper()}]")
             else:
                 parts.append(key.upper())
-        remain = max(0.0, (self.qte_deadline or time.time()) - time.time())
+        remain = max(0.0, engine.qte_deadline - engine.clock.now())
         self.qte_var.set(" -> ".join(parts) + f"    剩余 {remain:.1f}s")
 
     def _refresh_environment_display(self):
@@ -2252,6 +5695,15 @@ class FishingScene(BaseScene):
         bait = self.game_state.inventory.get('selected_bait', '普通鱼饵')
         rod = self.game_state.inventory.get('equipped_rod', '木质竿')
         self.environment_var.set(f"天气：{weather}｜鱼饵：{bait}｜鱼竿：{rod}")
+        self._refresh_odds_display()
+
+    def _refresh_odds_display(self):
+        expectation = self.game_state.expected_yield(self.location)
+        odds = "｜".join(f"{name} {data['probability']:.0%}" for name, data in expectation['species'].items())
+        self.odds_var.set(
+            f"📊 每竿约 {expectation['seconds_per_cast']:.0f} 秒，{expectation['gold_per_minute']:.0f} 金币/分钟，"
+            f"{expectation['exp_per_minute']:.0f} 经验/分钟\n{odds}"
+        )
 
     def _refresh_money_display(self):
         self.money_var.set(f"金币：{self.game_state.get_money():.0f}")
@@ -2281,10 +5733,7 @@ class FishingScene(BaseScene):
         state = self.game_state.student_state
         # 首次遇见：在河流或湖泊捕鱼时概率触发
         if not state.get('met') and self.location in ("河流", "湖泊"):
-            state['encounter_rolls'] = state.get('encounter_rolls', 0) + 1
-            chance = min(0.6, 0.18 + 0.08 * state['encounter_rolls'])
-            if random.random() < chance:
-                self.game_state.register_student_encounter()
+            if self.game_state.roll_drift_bottle():
                 messagebox.showinfo(
                     "漂流瓶",
                     "你钓起了一个漂流瓶，里面的字条写着：\n\n我是附近高中的社团实习生林汐，被困在浅滩，请带上食物和绳索来帮忙！\n\n回到家中后，可以在事件里找到她的求救位置。"
@@ -2297,11 +5746,105 @@ class FishingScene(BaseScene):
     def destroy(self):
         """销毁场景（解绑按键事件）"""
         if self.frame:
+            self.fishing_manager.close()
             # 解绑空格键（避免影响其他场景）
             self.scene_manager.root.unbind('<KeyPress>')
             self.frame.destroy()
 
 
+# ==========================
+# 存档选择
+# ==========================
+class SlotPicker:
+    """启动时的存档列表，只读取槽位索引；选中后才加载完整存档"""
+    COLUMNS = (("slot", "存档", 140), ("day", "天数", 60), ("level", "等级", 60),
+               ("money", "金币", 80), ("student", "林汐", 140), ("last_update", "最后保存", 170))
+    INVALID_CHARS = set('/\\:*?"<>| ')
+
+    def __init__(self, root, storage: SaveStorage, on_pick):
+        self.root = root
+        self.storage = storage
+        self.on_pick = on_pick  # 回调：on_pick(槽位名)
+        self.frame = ttk.Frame(root, padding="15")
+        self.frame.pack(fill="both", expand=True)
+        tk.Label(
+            self.frame,
+            text="📂 选择存档",
+            font=("Microsoft YaHei", 20, "bold"),
+            fg="#4CAAB9",
+            bg="#F5F5F5"
+        ).pack(pady=(0, 20))
+        self.tree = ttk.Treeview(self.frame, columns=[c[0] for c in self.COLUMNS], show="headings", height=15)
+        for column, heading, width in self.COLUMNS:
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor="center")
+        self.tree.pack(fill="both", expand=True)
+        self.tree.bind("<Double-1>", lambda _event: self._continue())
+        button_frame = ttk.Frame(self.frame)
+        button_frame.pack(fill="x", pady=(10, 0))
+        ModernButton(button_frame, text="继续游戏", command=self._continue).pack(side="left", padx=5)
+        ModernButton(button_frame, text="新建存档", command=self._new_slot).pack(side="left", padx=5)
+        ModernButton(button_frame, text="删除存档", command=self._delete_slot).pack(side="left", padx=5)
+        self._refresh()
+
+    def _refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        slots = self.storage.list_slots()
+        # 最近保存的排在最前
+        for slot, summary in sorted(slots.items(), key=lambda item: item[1].get('last_update', ''), reverse=True):
+            student = summary.get('student', {})
+            if student.get('rescued'):
+                student_text = f"已救援 · 信任 {student.get('trust', 0)}"
+            elif student.get('met'):
+                student_text = f"已相遇 · 信任 {student.get('trust', 0)}"
+            else:
+                student_text = "未相遇"
+            self.tree.insert("", "end", iid=slot, values=(
+                "默认存档" if slot == DEFAULT_PROFILE else slot,
+                summary.get('day', 1),
+                summary.get('level', 1),
+                f"{summary.get('money', 0):.0f}",
+                student_text,
+                summary.get('last_update', '').replace('T', ' '),
+            ))
+        children = self.tree.get_children()
+        if children:
+            self.tree.selection_set(children[0])
+
+    def _continue(self):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("选择存档", "请先选择一个存档。")
+            return
+        self._pick(selection[0])
+
+    def _new_slot(self):
+        name = simpledialog.askstring("新建存档", "存档名称：", parent=self.root)
+        if name is None:
+            return
+        name = name.strip()
+        if not name or any(ch in self.INVALID_CHARS for ch in name):
+            messagebox.showwarning("新建存档", "存档名称不能为空，也不能包含空格或 / \\ : * ? \" < > |。")
+            return
+        if name in self.tree.get_children():
+            messagebox.showwarning("新建存档", f"存档「{name}」已存在。")
+            return
+        self._pick(name)
+
+    def _delete_slot(self):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        slot = selection[0]
+        if messagebox.askyesno("删除存档", f"确定删除存档「{self.tree.set(slot, 'slot')}」吗？此操作无法撤销。"):
+            self.storage.delete_slot(slot)
+            self._refresh()
+
+    def _pick(self, slot: str):
+        self.frame.destroy()
+        self.on_pick(slot)
+
+
 # ==========================
 # 游戏UI界面（主界面管理器）
 # ==========================
@@ -2314,14 +5857,34 @@ class FishingGameUI:
         self.root.geometry("960x720")
         self.root.configure(bg="#F5F5F5")
         
-        # 游戏状态
-        self.game_state = GameState()
-        
-        # 绑定窗口关闭事件，保存数据
+        # 存档：有已有存档时先显示存档列表，否则直接开始默认存档
+        self.storage = JsonFileStorage()
+        self.game_state = None
+        self.sync_client = None
+        self._stats_tick_id = None
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
+        if self.storage.list_slots():
+            SlotPicker(root, self.storage, self._start_game)
+        else:
+            self._start_game(DEFAULT_PROFILE)
+
+    def _start_game(self, profile: str):
+        """加载选中的存档并进入游戏"""
+        # 游戏状态
+        clock = ScaledClock(TIME_SCALE) if TIME_SCALE != 1 else REAL_CLOCK
+        self.game_state = GameState(storage=self.storage, profile=profile, clock=clock,
+                                    seed=int(SESSION_SEED) if SESSION_SEED else None)
+        if RECORD_PATH:
+            SessionRecorder(self.game_state)  # 录像开头记有本局种子
+            print(f"正在录制到 {RECORD_PATH}，随机种子：{self.game_state.rng.seed}")
+        elif SESSION_SEED:
+            print(f"随机种子：{self.game_state.rng.seed}（FISHING_SEED）")
+        self.sync_client = SyncClient(self.game_state._stats_sections, profile, storage=self.storage,
+                                      apply=self.game_state.apply_sync_ops) if SYNC_URL else None
+        self._stats_tick_id = self.root.after(SAVE_TICK_MS, self._tick_stats)
         
         # 场景管理器
-        self.scene_manager = SceneManager(root, self.game_state)
+        self.scene_manager = SceneManager(self.root, self.game_state)
         self.scene_manager.setup_theme()
         
         # 注册场景
@@ -2331,13 +5894,53 @@ class FishingGameUI:
         self.scene_manager.register_scene("student", StudentScene)
         self.scene_manager.register_scene("market", MarketScene)
         
+        # 结算上次关闭以来的离线挂机（传入具体秒数，录像回放时原样重现）
+        idle_result = self.game_state.resolve_idle(self.game_state.idle_seconds())
+
         # 初始化场景（家场景）
         self.scene_manager.switch_scene("home")
+        if idle_result is not None:
+            self._show_idle_result(idle_result)
+
+    def _show_idle_result(self, result: dict):
+        """离线挂机收获汇总"""
+        lines = [f"离线 {result['seconds'] / 3600:.1f} 小时，在{result['location']}挂机钓鱼 {result['casts']} 竿。"]
+        if result['catches']:
+            lines.append(f"钓到 {result['catches']} 条鱼（共 {result['kg']:.1f} kg），卖得 {result['money']:.1f} 金币。")
+        if result['bait_used']:
+            lines.append(f"用掉 {result['bait']} ×{result['bait_used']}。")
+        lines.append(f"经验 +{result['exp_added']}")
+        if result['exp_added'] < result['exp_gained']:
+            lines[-1] += "（今天已经升过级，其余经验作废）"
+        if result['leveled_up']:
+            lines.append(f"升到了 {result['new_level']} 级！")
+        if result['unlocked_location']:
+            lines.append(f"解锁了新地点：{result['unlocked_location']}")
+        messagebox.showinfo("离线收获", "\n".join(lines))
     
+    def _tick_stats(self):
+        """定时把合并后的脏数据写出"""
+        self.game_state.tick_stats()
+        if self.sync_client is not None:
+            self.sync_client.tick()
+        self._stats_tick_id = self.root.after(SAVE_TICK_MS, self._tick_stats)
+
     def _on_closing(self):
         """窗口关闭时的处理"""
-        # 保存统计数据
-        self.game_state.save_stats()
+        # 最终落盘，等待后台写入完成
+        if self._stats_tick_id:
+            self.root.after_cancel(self._stats_tick_id)
+            self._stats_tick_id = None
+        if self.game_state is not None:
+            self.game_state.mark_active(self.game_state.clock.current_datetime().isoformat())
+            self.game_state.flush_stats()
+        if self.sync_client is not None:
+            self.sync_client.close()
+        if self.game_state is not None and self.game_state.recorder:
+            try:
+                self.game_state.recorder.save(RECORD_PATH)
+            except Exception as e:
+                print(f"保存录像失败: {e}")
         self.root.destroy()
     
 
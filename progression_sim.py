@@ -0,0 +1,257 @@
+"""
+钓鱼小游戏升级进度模拟（每天最多升一级）
+用法：
+    python ./progression_sim.py --policy greedy casual bait --seeds 2000
+    python ./progression_sim.py --policy casual --casts-per-day 60 --workers 8
+
+add_exp 每天只允许升一级，升级后当天的经验全部作废，地点在 4 级、7 级解锁，
+所以“多久能去湖泊”取决于玩家怎么安排每天的钓鱼和睡觉。这里按玩家策略逐竿模拟整局游戏
+（规则与 FishingEngine 相同，但不经过 GameState，单进程每秒几十万竿），
+统计到达每个等级、每个地点解锁时的天数、竿数与钓鱼分钟数的分布。
+
+结果按“配置表 + 策略 + 种子”的哈希缓存在 .progression_cache/ 下，配置没变时直接读取。
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fishing_game as fg
+
+CACHE_DIR = ".progression_cache"
+SIM_VERSION = 1   # 模拟逻辑变化时加一，使旧缓存失效
+MAX_DAYS = 60
+
+
+# ==========================
+# 玩家策略
+# ==========================
+class PlayerPolicy:
+    """模拟玩家的行为
+    casts_per_day：每天最多钓多少竿（None 表示不限）
+    sleep_on_level_up：当天升级后立即睡觉（之后的经验当天拿不到）
+    bait：想用的鱼饵；库存用完且钱够时买一份（3 个），买不起就用普通鱼饵
+    buy_rods：钱够时按顺序买下一根更好的鱼竿
+    """
+    def __init__(self, name: str, casts_per_day=None, sleep_on_level_up=True, bait='普通鱼饵', buy_rods=False):
+        if casts_per_day is None and not sleep_on_level_up:
+            raise ValueError("策略需要每天的竿数上限，或升级后睡觉，否则一天永远不会结束")
+        self.name = name
+        self.casts_per_day = casts_per_day
+        self.sleep_on_level_up = sleep_on_level_up
+        self.bait = bait
+        self.buy_rods = buy_rods
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+POLICIES = {
+    "greedy": PlayerPolicy("greedy"),
+    "casual": PlayerPolicy("casual", casts_per_day=40, sleep_on_level_up=False),
+    "bait": PlayerPolicy("bait", bait='高级蚯蚓', buy_rods=True),
+}
+
+
+# ==========================
+# 单局模拟
+# ==========================
+def _loadout(cache, location, bait, rod, weather, reaction_range):
+    """每套装备的抽鱼表、等待倍率与 QTE 判定时间（同一批模拟内复用）"""
+    key = (location, bait, rod, weather)
+    entry = cache.get(key)
+    if entry is None:
+        time_slot = fg.FIXED_TIME_SLOT[0]
+        sampler = fg.fish_sampler(location, bait, weather, time_slot)
+        wait_mult = fg.wait_multiplier_for(bait, fg.environment_wait_for(weather, time_slot))
+        rows = [(rarity, min_w, max_w, wait_min * wait_mult, wait_max * wait_mult,
+                 fg.QTE_LENGTH.get(rarity, 1), fg.FISH_PRICE_PER_KG.get(rarity, 10))
+                for _, rarity, min_w, max_w, _, (wait_min, wait_max) in sampler.items]
+        entry = cache[key] = (sampler, rows, fg.catch_window_for(rod))
+    return entry
+
+def _best_location(level: int) -> str:
+    unlocked = [loc for loc, need in fg.LOCATION_UNLOCK_LEVEL.items() if level >= need and loc in fg.LOCATION_FISH_CONFIG]
+    return max(unlocked, key=lambda loc: fg.LOCATION_UNLOCK_LEVEL[loc])
+
+def simulate_career(policy: PlayerPolicy, seed: int, max_days: int = MAX_DAYS,
+                    reaction_range=fg.QTE_REACTION_RANGE, cache=None) -> dict:
+    """模拟一局游戏直到满级或 max_days 天，返回 {等级: [天数, 竿数, 钓鱼分钟]}"""
+    rng = random.Random(seed)
+    cache = {} if cache is None else cache
+    low, high = reaction_range
+    rods = list(fg.ROD_CONFIG)
+    rod = rods[0]
+    level, exp, money = 1, 0, 0.0
+    bait_stock = 0
+    bait_price = fg.BAIT_CONFIG.get(policy.bait, {}).get('price', 0)
+    seconds = 0.0
+    casts = 0
+    reached = {1: [1, 0, 0.0]}
+    last_level_up_day = 0
+    for day in range(1, max_days + 1):
+        weather = fg.weather_for_day(day)
+        casts_today = 0
+        while policy.casts_per_day is None or casts_today < policy.casts_per_day:
+            # 买东西
+            if policy.buy_rods and rods.index(rod) + 1 < len(rods):
+                next_rod = rods[rods.index(rod) + 1]
+                if money >= fg.ROD_CONFIG[next_rod]['price']:
+                    money -= fg.ROD_CONFIG[next_rod]['price']
+                    rod = next_rod
+            if bait_price and bait_stock == 0 and money >= bait_price:
+                money -= bait_price
+                bait_stock = 3
+            bait = policy.bait if bait_stock > 0 or not bait_price else '普通鱼饵'
+            if bait_price and bait_stock > 0:
+                bait_stock -= 1
+
+            # 钓一竿
+            sampler, rows, window = _loadout(cache, _best_location(level), bait, rod, weather, reaction_range)
+            fish = sampler.draw_index(rng)
+            rarity, min_w, max_w, wait_min, wait_max, keys, price = rows[fish]
+            reaction = 0.0
+            for _ in range(keys):
+                reaction += rng.uniform(low, high)
+            seconds += rng.uniform(wait_min, wait_max) + min(reaction, window) + fg.SIMULATED_CAST_OVERHEAD
+            casts += 1
+            casts_today += 1
+            if reaction <= window:
+                weight = round(rng.uniform(min_w, max_w), 2)
+                money += weight * price
+                settled = fg.settle_exp(level, exp, fg.fish_exp_gain(rarity, weight, min_w, max_w),
+                                        day, last_level_up_day)
+                if settled is not None:
+                    level, exp, leveled_up = settled
+                    if leveled_up:
+                        last_level_up_day = day
+                        reached[level] = [day, casts, round(seconds / 60, 2)]
+                        if level >= fg.MAX_LEVEL:
+                            return reached
+                        if policy.sleep_on_level_up:
+                            break
+    return reached
+
+def _simulate_chunk(policy, seeds, max_days, reaction_range):
+    cache = {}
+    return [simulate_career(policy, seed, max_days, reaction_range, cache) for seed in seeds]
+
+
+# ==========================
+# 汇总、并行与缓存
+# ==========================
+def config_hash(policy: PlayerPolicy, seeds: int, base_seed: int, max_days: int, reaction_range) -> str:
+    """影响结果的全部配置表、策略与种子的哈希"""
+    payload = {
+        'version': SIM_VERSION,
+        'tables': [fg.LOCATION_FISH_CONFIG, fg.LOCATION_UNLOCK_LEVEL, fg.BAIT_CONFIG, fg.ROD_CONFIG,
+                   fg.FISH_PRICE_PER_KG, fg.FISH_EXP_BASE, fg.LEVEL_UP_EXP, fg.MAX_LEVEL, fg.WEATHER_OPTIONS,
+                   fg.FIXED_TIME_SLOT, fg.QTE_LENGTH, fg.SIMULATED_CAST_OVERHEAD],
+        'policy': policy.as_dict(),
+        'seeds': [seeds, base_seed],
+        'max_days': max_days,
+        'reaction_range': list(reaction_range),
+    }
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+def _distribution(values) -> dict:
+    values = sorted(values)
+    pick = lambda q: values[int(q * (len(values) - 1))]
+    return {'mean': round(sum(values) / len(values), 2), 'p10': pick(0.1), 'p50': pick(0.5), 'p90': pick(0.9)}
+
+def summarize(careers) -> dict:
+    """每个等级与每个地点解锁：到达比例，以及天数、竿数、钓鱼分钟的分布"""
+    def milestone(level):
+        hits = [career[level] for career in careers if level in career]
+        entry = {'reached': len(hits) / len(careers)}
+        if hits:
+            entry.update(days=_distribution([h[0] for h in hits]),
+                         casts=_distribution([h[1] for h in hits]),
+                         minutes=_distribution([h[2] for h in hits]))
+        return entry
+    return {
+        'levels': {level: milestone(level) for level in range(2, fg.MAX_LEVEL + 1)},
+        'locations': {loc: milestone(need) for loc, need in fg.LOCATION_UNLOCK_LEVEL.items() if need > 1},
+    }
+
+def run_policy(policy: PlayerPolicy, seeds: int, base_seed: int = 0, max_days: int = MAX_DAYS,
+               reaction_range=fg.QTE_REACTION_RANGE, workers: int = 1, use_cache: bool = True) -> dict:
+    """多进程模拟 seeds 局，返回汇总结果（命中缓存时直接读取）"""
+    digest = config_hash(policy, seeds, base_seed, max_days, reaction_range)
+    path = os.path.join(CACHE_DIR, f"{policy.name}-{digest}.json")
+    if use_cache and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        summary['cached'] = True
+        return summary
+
+    start = time.perf_counter()
+    all_seeds = list(range(base_seed, base_seed + seeds))
+    chunk = max(1, -(-seeds // (workers * 4)))
+    chunks = [all_seeds[i:i + chunk] for i in range(0, seeds, chunk)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_simulate_chunk, [policy] * len(chunks), chunks,
+                             [max_days] * len(chunks), [reaction_range] * len(chunks))
+            careers = [career for part in parts for career in part]
+    else:
+        careers = _simulate_chunk(policy, all_seeds, max_days, reaction_range)
+    summary = summarize(careers)
+    summary.update(policy=policy.as_dict(), seeds=seeds, config_hash=digest,
+                   casts=sum(max(c[lvl][1] for lvl in c) for c in careers),
+                   seconds=round(time.perf_counter() - start, 3))
+
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+    summary['cached'] = False
+    return summary
+
+def print_summary(summary: dict):
+    policy = summary['policy']
+    source = "缓存" if summary['cached'] else f"{summary['seconds']:.2f} s"
+    print(f"策略 {policy['name']}（{summary['seeds']} 局，{source}，配置 {summary['config_hash']}）")
+    rows = [(f"{level} 级", data) for level, data in summary['levels'].items()]
+    rows += [(f"解锁{loc}", data) for loc, data in summary['locations'].items()]
+    for label, data in rows:
+        if 'days' not in data:
+            print(f"  {label:<6} 未达到")
+            continue
+        days, casts, minutes = data['days'], data['casts'], data['minutes']
+        print(f"  {label:<6} 达到 {data['reached']:6.1%}  天数 {days['p10']:>3}/{days['p50']:>3}/{days['p90']:>3}"
+              f"  竿数 {casts['p10']:>5}/{casts['p50']:>5}/{casts['p90']:>5}"
+              f"  分钟 {minutes['p50']:7.1f}（P10/P50/P90）")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="钓鱼小游戏升级进度模拟")
+    parser.add_argument("--policy", nargs="+", default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument("--casts-per-day", type=int, help="覆盖所选策略的每天竿数上限")
+    parser.add_argument("--seeds", type=int, default=1000)
+    parser.add_argument("--base-seed", type=int, default=0)
+    parser.add_argument("--max-days", type=int, default=MAX_DAYS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    for name in args.policy:
+        policy = POLICIES[name]
+        if args.casts_per_day is not None:
+            policy = PlayerPolicy(f"{name}-{args.casts_per_day}", args.casts_per_day,
+                                  policy.sleep_on_level_up, policy.bait, policy.buy_rods)
+        summary = run_policy(policy, args.seeds, args.base_seed, args.max_days,
+                             workers=args.workers, use_cache=not args.no_cache)
+        print_summary(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+钓鱼小游戏存档同步的本地替身服务器（离线测试与基准测试用）
+用法：python ./sync_server.py [--port 8765] [--fail-rate 0.1]
+存档只保存在内存中，服务器退出后丢弃。
+
+POST /sync/<档案>  请求体 {'device', 'vector', 'ops'}，ops 为日志格式的操作列表
+    客户端的版本向量包含服务器上的全部更新时应用操作，返回 200 {'vector'}；
+    否则返回 409 {'vector'}，由客户端取回完整存档、与本机改动合并后再上传合并结果的增量。
+GET  /sync/<档案>  返回 {'vector', 'state'}（完整存档，用于冲突合并与在新设备上恢复）
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fishing_game as fg
+
+
+class SyncStore:
+    """各档案的存档状态与版本向量"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = {}  # 档案 -> (分区, 版本向量)
+        self.ops_applied = 0
+
+    def _get(self, profile):
+        entry = self._profiles.get(profile)
+        if entry is None:
+            sections = {'fish_statistics': {}, 'inventory': fg._default_inventory_state(), 'student_state': {}}
+            entry = self._profiles[profile] = (sections, {})
+        return entry
+
+    def apply(self, profile, device, client_vector, ops):
+        """返回 (状态码, 应答)"""
+        with self._lock:
+            sections, vector = self._get(profile)
+            if not fg.vector_dominates(client_vector, vector):
+                return 409, {'vector': vector}
+            fg.apply_journal_ops(sections, ops)
+            vector.clear()
+            vector.update(client_vector)
+            vector[device] = vector.get(device, 0) + 1
+            self.ops_applied += len(ops)
+            return 200, {'vector': dict(vector)}
+
+    def state(self, profile):
+        with self._lock:
+            sections, vector = self._get(profile)
+            return {'vector': dict(vector), 'state': {name: fg._snapshot_value(data) for name, data in sections.items()}}
+
+
+class SyncHandler(BaseHTTPRequestHandler):
+    store = None
+    fail_rate = 0.0  # 随机返回 503 的比例，用来演练客户端重试
+
+    def log_message(self, format, *args):
+        pass
+
+    def _profile(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'sync' or not parts[1]:
+            return None
+        return urllib.parse.unquote(parts[1])
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'),
+                          default=fg._json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        profile = self._profile()
+        if profile is None:
+            self._reply(404, {'error': 'not found'})
+            return
+        self._reply(200, self.store.state(profile))
+
+    def do_POST(self):
+        profile = self._profile()
+        if profile is None:
+            self._reply(404, {'error': 'not found'})
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._reply(503, {'error': 'unavailable'})
+            return
+        try:
+            payload = json.loads(body)
+            status, reply = self.store.apply(
+                profile, payload['device'], payload.get('vector', {}), payload.get('ops', []))
+        except (ValueError, KeyError, TypeError) as e:
+            status, reply = 400, {'error': str(e)}
+        self._reply(status, reply)
+
+
+def make_server(port=8765, fail_rate=0.0, host='127.0.0.1'):
+    """创建服务器（port=0 时由系统分配端口），调用方负责 serve_forever / shutdown"""
+    handler = type('Handler', (SyncHandler,), {'store': SyncStore(), 'fail_rate': fail_rate})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="钓鱼小游戏存档同步替身服务器")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="随机返回 503 的比例")
+    args = parser.parse_args(argv)
+    server = make_server(args.port, args.fail_rate)
+    print(f"同步服务器已启动：http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())